@@ -0,0 +1,273 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Callable, List, Optional
+import numpy as np
+from camera import Camera
+from main_controller import MainController
+from pipeline import SyncPipeline
+from scheduling import policies
+from sharding import createShards
+from transport import transports, createChannels, closeChannels
+from simulator import Simulator
+from travel_time import Pathfinder, TravelTime
+from util import *
+from main import getFloormap
+
+def runMultiprocess(maxPeople: int, iterations: int, seed: int, shards: int=1, transport: str="queue") -> (float, dict):
+	floormap = getFloormap()
+
+	# Main controllers of more than one shard each have their own channels to and from the camera
+	if shards > 1:
+		shards = createShards(shards)
+		simulatorData, cameraData, mainControllerData = createChannels(transport, maxPeople, [shardCells for interIDs, shardCells in shards])
+		cameraProcess = Camera(floormap, simulatorData, cameraData, shardCells=[shardCells for interIDs, shardCells in shards])
+		mainControllerProcesses = [MainController(cameraData[i], mainControllerData[i], interIDs=interIDs, shardCells=shardCells) for i, (interIDs, shardCells) in enumerate(shards)]
+	else:
+		simulatorData, cameraData, mainControllerData = createChannels(transport, maxPeople)
+		cameraProcess = Camera(floormap, simulatorData, cameraData)
+		mainControllerProcesses = [MainController(cameraData, mainControllerData)]
+	cameraProcess.start()
+	for mainControllerProcess in mainControllerProcesses:
+		mainControllerProcess.start()
+
+	simulator = Simulator(floormap, mainControllerData, simulatorData, None, headless=True, seed=seed)
+	start = time.perf_counter()
+	results = simulator.run(maxPeople, iterations)
+	elapsed = time.perf_counter() - start
+
+	# The camera and main controllers are stopped before their channels are freed
+	for process in [cameraProcess] + mainControllerProcesses:
+		process.terminate()
+		process.join()
+	closeChannels(simulatorData, cameraData, mainControllerData)
+	return elapsed, results
+
+def runSync(maxPeople: int, iterations: int, seed: int) -> (float, dict):
+	floormap = getFloormap()
+	simulator = Simulator(floormap, None, None, None, headless=True, pipeline=SyncPipeline(floormap), seed=seed)
+	start = time.perf_counter()
+	results = simulator.run(maxPeople, iterations)
+	elapsed = time.perf_counter() - start
+	return elapsed, results
+
+def benchmarkPipelines(maxPeople: int, iterations: int, seed: int, shards: int, transport: str):
+	multiprocessElapsed, multiprocessResults = runMultiprocess(maxPeople, iterations, seed, shards, transport)
+	syncElapsed, syncResults = runSync(maxPeople, iterations, seed)
+
+	print("[INFO] Multiprocess pipeline ({} main controller processes, {} transport): {:.1f} iterations/s".format(shards, transport, iterations / multiprocessElapsed))
+	print("[INFO] Synchronous pipeline: {:.1f} iterations/s".format(iterations / syncElapsed))
+	print("[INFO] Speedup: {:.2f}x".format(multiprocessElapsed / syncElapsed))
+	print("[INFO] Identical results: {}".format(multiprocessResults == syncResults))
+
+def measure(function: Callable, repeat: int) -> dict:
+	# Latency statistics of repeated calls, in seconds
+	times = []
+	for i in range(repeat):
+		start = time.perf_counter()
+		function()
+		times.append(time.perf_counter() - start)
+	return {"calls": repeat, "min": min(times), "median": float(np.median(times)), "mean": float(np.mean(times)), "p95": float(np.percentile(times, 95))}
+
+def getFixedState(maxPeople: int=40, iterations: int=100, seed: int=0, numFloormaps: int=20) -> (List[Coord], List[np.ndarray], List[Tuple[Coord]]):
+	# People coordinates and blocked paths of the last tick of a seeded run, and camera floormaps of its last ticks, used as fixed inputs
+	floormap = getFloormap()
+	pipeline = SyncPipeline(floormap)
+	state = {"floormaps": []}
+	LEDStates = [False] * len(topology.LEDBounds)
+	def recordingPipeline(listOfCoords: List[Coord]) -> List[Tuple[int, bool]]:
+		state["coords"] = listOfCoords
+		state["floormaps"] = (state["floormaps"] + [pipeline.camera(listOfCoords).copy()])[-numFloormaps:]
+		changedLEDs = pipeline.mainController(state["floormaps"][-1])
+		for LEDID, is_on in changedLEDs:
+			LEDStates[LEDID] = is_on
+		state["blockedPaths"] = [coordBounds for coordBounds, is_on in zip(topology.LEDBounds, LEDStates) if is_on]
+		return changedLEDs
+
+	Simulator(floormap, None, None, None, headless=True, pipeline=recordingPipeline, seed=seed).run(maxPeople, iterations)
+	return state["coords"], state["floormaps"], state["blockedPaths"]
+
+def getLocationPairs() -> List[Tuple[int, int]]:
+	# Every pair of locations of the layout people travel between
+	return list(routes.pairs)
+
+def benchmarkSimulator(numOfPeople: List[int], iterations: int, seed: int, vectorized: bool) -> dict:
+	results = dict()
+	for maxPeople in numOfPeople:
+		floormap = getFloormap()
+		simulator = Simulator(floormap, None, None, None, headless=True, pipeline=SyncPipeline(floormap), vectorized=vectorized, seed=seed)
+		rerouteCache.clear()
+		start = time.perf_counter()
+		simulator.run(maxPeople, iterations)
+		elapsed = time.perf_counter() - start
+		results[str(maxPeople)] = {"iterations": iterations, "seconds": elapsed, "iterationsPerSecond": iterations / elapsed, "rerouteCache": rerouteCache.getStats()}
+	return results
+
+def benchmarkCalculatePath(blockedPaths: List[Tuple[Coord]], repeat: int) -> dict:
+	# Latency of a path calculation from the source to the destination of every pair of locations
+	floormap = getFloormap()
+	people = [SmartPerson(Location(srcLocID), Location(dstLocID), floormap, []) for srcLocID, dstLocID in getLocationPairs()]
+	def calculatePaths():
+		# Measure the search itself rather than the reroute cache
+		rerouteCache.clear()
+		for person in people:
+			person.calculatePath(blockedPaths)
+	results = measure(calculatePaths, repeat)
+	results["paths"] = len(people)
+	results["medianPerPath"] = results["median"] / len(people)
+	return results
+
+def benchmarkMainController(floormaps: List[np.ndarray], repeat: int, vectorized: bool) -> dict:
+	# Controllers only re-evaluate the intersections whose cells changed, so the floormaps of consecutive ticks are gone
+	# through in turn rather than a single one, which would only be evaluated on the first call
+	mainController = MainController(None, None, vectorized=vectorized)
+	floormaps = itertools.cycle(floormaps)
+	return measure(lambda: mainController(next(floormaps)), repeat)
+
+def compareMainControllers(maxPeople: int, iterations: int, seed: int) -> dict:
+	# Number of ticks of a seeded run on which the vectorized main controller decides differently than the object based one
+	floormap = getFloormap()
+	pipeline = SyncPipeline(floormap)
+	vectorizedController = MainController(None, None, vectorized=True)
+	mismatches = 0
+	def comparingPipeline(listOfCoords: List[Coord]) -> List[Tuple[int, bool]]:
+		nonlocal mismatches
+		floormap = pipeline.camera(listOfCoords)
+		changedLEDs = pipeline.mainController(floormap)
+		if sorted(changedLEDs) != sorted(vectorizedController(floormap)):
+			mismatches += 1
+		return changedLEDs
+
+	Simulator(floormap, None, None, None, headless=True, pipeline=comparingPipeline, seed=seed).run(maxPeople, iterations)
+	return {"iterations": iterations, "mismatches": mismatches}
+
+def benchmarkPathfinder(repeat: int) -> dict:
+	# Latency of the A* searches of the ideal travel time table
+	pathfinder = Pathfinder(TravelTime.getIdealFloormap())
+	pairs = [(Location.getCoords(srcLocID)[0], Location.getCoords(dstLocID)[1]) for srcLocID, dstLocID in getLocationPairs()]
+	def search():
+		for start, goal in pairs:
+			pathfinder.search(start, goal)
+	results = measure(search, repeat)
+	results["searches"] = len(pairs)
+	results["medianPerSearch"] = results["median"] / len(pairs)
+	return results
+
+def benchmarkDetector(prototxt: str, model: str, videos: List[str], maxFrames: int) -> dict:
+	# Per frame throughput of the preprocessing and forward pass of image_processing/objectDetector.py
+	if not os.path.isfile(model):
+		return {"skipped": "Model {} not found".format(model)}
+
+	import cv2
+	net = cv2.dnn.readNetFromCaffe(prototxt, model)
+	results = dict()
+	for video in videos:
+		vs = cv2.VideoCapture(video)
+		times = []
+		while len(times) < maxFrames:
+			grabbed, frame = vs.read()
+			if not grabbed:
+				break
+			start = time.perf_counter()
+			net.setInput(cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 0.007843, (300, 300), 127.5))
+			net.forward()
+			times.append(time.perf_counter() - start)
+		vs.release()
+		if times:
+			results[os.path.basename(video)] = {"frames": len(times), "median": float(np.median(times)), "mean": float(np.mean(times)), "framesPerSecond": len(times) / sum(times)}
+	return results
+
+def comparePolicies(names: List[str], maxPeople: int, iterations: int, seed: int, concurrent: bool) -> dict:
+	# People through the venue and through every intersection per tick, and waits at intersections, of a seeded run per policy
+	results = dict()
+	for name in names:
+		floormap = getFloormap()
+		pipeline = SyncPipeline(floormap, policy=name, concurrent=concurrent)
+		simulator = Simulator(floormap, None, None, None, headless=True, pipeline=pipeline, seed=seed, concurrent=concurrent)
+		travelTimes = simulator.run(maxPeople, iterations)
+		stats = pipeline.mainController.getSchedulingStats()
+		intersections = stats["intersections"]
+		results[name] = {"exitedPerTick": simulator.peopleExited / iterations, "meanTravelTime": float(np.mean(list(travelTimes.values()))) if travelTimes else 0.0,
+						 "meanWait": float(np.average([value["meanWait"] for value in intersections.values()], weights=[value["admissions"] for value in intersections.values()])) if any(value["admissions"] for value in intersections.values()) else 0.0,
+						 "intersections": intersections}
+
+		busiest = max(intersections, key=lambda interID: intersections[interID]["admissions"])
+		print("[INFO] {}: {:.3f} people exited per tick, mean travel time {:.1f}, mean wait {:.2f} ticks, busiest intersection {} lets in {:.3f} people per tick with a mean wait of {:.2f} ticks".format(
+			name, results[name]["exitedPerTick"], results[name]["meanTravelTime"], results[name]["meanWait"], busiest, intersections[busiest]["throughput"], intersections[busiest]["meanWait"]))
+	return results
+
+def getCommit() -> Optional[str]:
+	try:
+		return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def runSuite(numOfPeople: List[int], iterations: int, seed: int, repeat: int, prototxt: str, model: str, maxFrames: int) -> dict:
+	# Every benchmark uses fixed seeds and inputs, so results of different commits are comparable
+	coords, floormaps, blockedPaths = getFixedState(seed=seed)
+	videos = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_processing", "input_videos", "*.mp4")))
+	benchmarks = dict()
+	benchmarks["simulator"] = benchmarkSimulator(numOfPeople, iterations, seed, False)
+	benchmarks["simulatorVectorized"] = benchmarkSimulator(numOfPeople, iterations, seed, True)
+	benchmarks["calculatePath"] = benchmarkCalculatePath([], repeat)
+	benchmarks["calculatePathBlocked"] = benchmarkCalculatePath(blockedPaths, repeat)
+	benchmarks["mainControllerTick"] = benchmarkMainController(floormaps, 100 * repeat, False)
+	benchmarks["mainControllerTickVectorized"] = benchmarkMainController(floormaps, 100 * repeat, True)
+	benchmarks["mainControllerMismatches"] = compareMainControllers(max(numOfPeople), iterations, seed)
+	benchmarks["pathfinderSearch"] = benchmarkPathfinder(repeat)
+	benchmarks["idealTravelTimes"] = measure(TravelTime.getIdealTravelTimes, repeat)
+	benchmarks["detector"] = benchmarkDetector(prototxt, model, videos, maxFrames)
+	return {"commit": getCommit(), "python": platform.python_version(), "machine": platform.machine(), "layout": getLayout().name, "seed": seed, "benchmarks": benchmarks}
+
+def compareSuites(results: dict, baseline: dict, prefix: str=""):
+	# Print the ratio of every median latency and throughput to the one of the baseline
+	for key, value in results.items():
+		if isinstance(value, dict):
+			if isinstance(baseline.get(key), dict):
+				compareSuites(value, baseline[key], prefix + key + ".")
+		elif key in ["median", "iterationsPerSecond", "framesPerSecond"] and baseline.get(key):
+			print("[INFO] {}{}: {:.4g} -> {:.4g} ({:.2f}x)".format(prefix, key, baseline[key], value, value / baseline[key]))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-p", "--max-people", help="Maximum number of people in the simulation", type=int, default=40)
+	parser.add_argument("-n", "--iterations", help="Number of simulation iterations to run", type=int, default=1000)
+	parser.add_argument("-s", "--seed", help="Seed for the simulation's random number generator", type=int, default=0)
+	parser.add_argument("--suite", help="Run the benchmark suite of every hot path instead of comparing pipelines", action='store_true')
+	parser.add_argument("--suite-people", help="Crowd sizes of the simulator benchmarks of the suite", type=int, nargs='+', default=[1, 10, 40, 100])
+	parser.add_argument("-r", "--repeat", help="Number of repetitions of the latency benchmarks of the suite", type=int, default=20)
+	parser.add_argument("--prototxt", help="Caffe prototxt of the detector", type=str, default=os.path.join("image_processing", "MobileNetSSD_deploy.prototxt"))
+	parser.add_argument("--model", help="Caffe model of the detector, its benchmark is skipped if missing", type=str, default=os.path.join("image_processing", "MobileNetSSD_deploy.caffemodel"))
+	parser.add_argument("--frames", help="Maximum number of frames of every input video to run the detector on", type=int, default=100)
+	parser.add_argument("--policies", help="Compare the throughput of intersection scheduling policies instead of comparing pipelines", type=str, nargs='+', choices=list(policies), default=None)
+	parser.add_argument("--concurrent", help="Compare the policies with several people let into an intersection at once if their movements do not conflict", action='store_true')
+	parser.add_argument("--shards", help="Number of main controller processes of the multiprocess pipeline to split the intersections across", type=int, default=1)
+	parser.add_argument("--transport", help="Channels between the processes of the multiprocess pipeline", type=str, choices=transports, default="queue")
+	parser.add_argument("-o", "--output", help="Path to a JSON file to write the suite or policy results to", type=str, default=None)
+	parser.add_argument("--baseline", help="Path to the JSON results of a previous suite run to compare against", type=str, default=None)
+	parser.add_argument("--layout", help="Path to a layout file, defaults to layouts/mte380.json", type=str, default=None)
+	args = parser.parse_args()
+	if args.layout is not None:
+		useLayout(Layout.load(args.layout))
+
+	if args.suite:
+		results = runSuite(args.suite_people, args.iterations, args.seed, args.repeat, args.prototxt, args.model, args.frames)
+		print(json.dumps(results, indent=4))
+		if args.output is not None:
+			with open(args.output, 'w') as f:
+				json.dump(results, f, indent=4)
+		if args.baseline is not None:
+			with open(args.baseline) as f:
+				compareSuites(results, json.load(f))
+	elif args.policies is not None:
+		results = comparePolicies(args.policies, args.max_people, args.iterations, args.seed, args.concurrent)
+		if args.output is not None:
+			with open(args.output, 'w') as f:
+				json.dump(results, f, indent=4)
+	else:
+		benchmarkPipelines(args.max_people, args.iterations, args.seed, args.shards, args.transport)
@@ -1,8 +1,10 @@
 from util import *
 from multiprocessing import Process, Queue
+from instrumentation import TickTimer
+from transport import RingBuffer, putRecord
 
 class Camera(Process):
-	def __init__(self, floormap: np.ndarray, simulatorData: Queue, cameraData: Queue):
+	def __init__(self, floormap: np.ndarray, simulatorData: Queue, cameraData: Union[Queue, List[Queue]], timer: Optional[TickTimer] = None, shardCells: Optional[List[np.ndarray]] = None):
 		Process.__init__(self)
 		self.emptyFloormap = floormap.copy()
 		self.floormap = floormap.copy()
@@ -10,24 +12,82 @@ class Camera(Process):
 		self.simulatorData = simulatorData
 		self.listOfCoords = None
 		self.prevListOfCoords = None
+		self.prevCells = None
+		self.timer = timer
 
-	def run(self):
-		while True:
-			self.listOfCoords = self.simulatorData.get()
+		# Cameras of sharded main controllers are given a queue per shard, and send every shard the values of its cells only
+		self.shardCells = shardCells
+		self.shardCellSets = None if shardCells is None else [set(cells.tolist()) for cells in shardCells]
+
+	def __call__(self, listOfCoords: List[Coord]) -> np.ndarray:
+		self.listOfCoords = listOfCoords
+
+		# TODO: maybe check for social distancing breach?
+
+		# Coordinates read from a ring buffer are rows of (x, y), see transport.py
+		if isinstance(listOfCoords, np.ndarray):
+			cells = self.floormap.ravel()
+			if self.prevCells is not None:
+				cells[self.prevCells] = self.emptyFloormap.ravel()[self.prevCells]
+			self.prevCells = listOfCoords[:, 0] * self.floormap.shape[1] + listOfCoords[:, 1]
+			cells[self.prevCells] = 5
+			if self.timer is not None:
+				self.timer.mark('update')
+			return self.floormap
+
+		if self.prevListOfCoords is not None:
+			for coord in self.prevListOfCoords:
+				self.floormap[coord.x, coord.y] = self.emptyFloormap[coord.x, coord.y]
 
-			# TODO: maybe check for social distancing breach?
+		for coord in self.listOfCoords:
+			self.floormap[coord.x, coord.y] = 5
 
-			if self.prevListOfCoords is not None:
-				for coord in self.prevListOfCoords:
-					self.floormap[coord.x, coord.y] = self.emptyFloormap[coord.x, coord.y]
+		self.prevListOfCoords = self.listOfCoords
 
-			for coord in self.listOfCoords:
-				self.floormap[coord.x, coord.y] = 5
+		# TODO: maybe insert a delay here?
+
+		if self.timer is not None:
+			self.timer.mark('update')
+		return self.floormap
+
+	def getShardRequests(self, requests: Optional[Union[List[Tuple[int, int]], np.ndarray]], shardCells: np.ndarray, shardCellSet: Set[int]) -> Optional[Union[List[Tuple[int, int]], np.ndarray]]:
+		# Requests of the people in the cells of a shard, those read from a ring buffer are rows of (cell, exit lane ID)
+		if requests is None:
+			return None
+		if isinstance(requests, np.ndarray):
+			return requests[np.isin(requests[:, 0], shardCells)]
+		return [request for request in requests if request[0] in shardCellSet]
+
+	def run(self):
+		while True:
+			if self.timer is not None:
+				self.timer.startTick()
 
-			self.prevListOfCoords = self.listOfCoords
+			message = self.simulatorData.get()
 
-			# TODO: maybe insert a delay here?
+			# None asks for the timings of the processes, which are sent down the pipeline instead of a floormap
+			if message is None:
+				timings = [] if self.timer is None else [self.timer.getTimings()]
+				if self.shardCells is None:
+					self.cameraData.put(timings)
+				else:
+					# Those of the camera go down the pipeline of the first shard
+					for i, cameraData in enumerate(self.cameraData):
+						cameraData.put(timings if i == 0 else [])
+				continue
 
-			self.cameraData.put(self.floormap.copy())
-			
+			# Requests of the simulator are passed on to the main controller along with the floormap
+			listOfCoords, requests = message
+			if self.timer is not None:
+				self.timer.mark('receive')
+			floormap = self(listOfCoords)
+			if self.shardCells is None:
+				# Ring buffers copy the floormap into shared memory right away, queues pickle it later on
+				putRecord(self.cameraData, (floormap if isinstance(self.cameraData, RingBuffer) else floormap.copy(), requests))
+			else:
+				cells = floormap.ravel()
+				for cameraData, shardCells, shardCellSet in zip(self.cameraData, self.shardCells, self.shardCellSets):
+					putRecord(cameraData, (cells[shardCells], self.getShardRequests(requests, shardCells, shardCellSet)))
+			if self.timer is not None:
+				self.timer.mark('send')
 
@@ -0,0 +1,82 @@
+from util import *
+
+class ConflictTable():
+	# Movements through every intersection, from one of its entry lane intersections to one of its exit lanes, with the cells of
+	# the intersection they may use as a bitmask over Intersection.getCoords(interID) in topology.intersectionCells order. A
+	# movement uses the cells of the lane transition between its lanes, if any, and of every shortest path between the cells it
+	# enters and leaves the intersection at, as paths found by SmartPerson.findPath may take any of them. Two movements conflict
+	# if they share a cell. Exit lane -1 stands for people stopping at a location in the intersection, who may use every cell.
+	def __init__(self):
+		self.cellBits = dict()
+		self.neighbours = dict()
+		for interID, cells in enumerate(topology.intersectionCells):
+			for bit, cell in enumerate(cells):
+				self.cellBits[cell] = (interID, 1 << bit)
+			for cell in cells:
+				self.neighbours[cell] = [nextCell for nextCell in topology.successorCellLists[cell] if topology.intersectionIDLists[nextCell] == interID]
+
+		self.movements = []
+		self.movementIDs = []
+		self.masks = []
+		self.conflicts = []
+		self.exitLaneIDs = []
+		for interID, (entryLaneIntersections, exitLaneIntersections) in enumerate(Intersection.laneIntersections):
+			exitCells = {laneIntersection.lane.laneID: topology.encode(laneIntersection.LED.coordBounds[1]) for laneIntersection in exitLaneIntersections}
+			self.exitLaneIDs.append(exitCells)
+			movements = []
+			for entry, laneIntersection in enumerate(entryLaneIntersections):
+				entryCell = topology.encode(laneIntersection.LED.coordBounds[1])
+				for exitLaneID in list(exitCells) + [-1]:
+					movements.append((entry, exitLaneID, self.getCells(interID, entryCell, exitLaneID, laneIntersection.lane.laneID)))
+			self.movements.append(movements)
+			self.movementIDs.append({(entry, exitLaneID): movementID for movementID, (entry, exitLaneID, cells) in enumerate(movements)})
+			masks = np.array([cells for entry, exitLaneID, cells in movements], dtype=np.int64)
+			self.masks.append(masks.tolist())
+			self.conflicts.append(((masks[:, None] & masks[None, :]) != 0).tolist())
+
+		# Cells held by people in intersections, by (cell, exit lane ID)
+		self.reservations = dict()
+
+	def getMask(self, coords: List[Coord]) -> int:
+		mask = 0
+		for coord in coords:
+			mask |= self.cellBits[topology.encode(coord)][1]
+		return mask
+
+	def getDistances(self, cell: int) -> Dict[int, int]:
+		# Number of moves from a cell to every cell of its intersection, without leaving it
+		distances = {cell: 0}
+		frontier = [cell]
+		while frontier:
+			nextFrontier = []
+			for currCell in frontier:
+				for nextCell in self.neighbours[currCell]:
+					if nextCell not in distances:
+						distances[nextCell] = distances[currCell] + 1
+						nextFrontier.append(nextCell)
+			frontier = nextFrontier
+		return distances
+
+	def getCells(self, interID: int, cell: int, exitLaneID: int, entryLaneID: Optional[int]=None) -> int:
+		# Cells a person on a cell of an intersection, or entering it from entryLaneID, may still use on the way to exitLaneID
+		if exitLaneID not in self.exitLaneIDs[interID]:
+			return self.getMask(Intersection.getCoords(interID))
+
+		exitCell = self.exitLaneIDs[interID][exitLaneID]
+		srcDistances = self.getDistances(cell)
+		dstDistances = self.getDistances(exitCell)
+		if exitCell not in srcDistances:
+			return self.getMask(Intersection.getCoords(interID))
+		mask = self.getMask([topology.decode(c) for c in srcDistances if c in dstDistances and srcDistances[c] + dstDistances[c] == srcDistances[exitCell]])
+
+		# Lane transitions into exitLaneID through the cell, from the cell on
+		for (srcLaneID, dstLaneID), path in LaneTransition.laneTransitionPaths.items():
+			if dstLaneID == exitLaneID and (entryLaneID is None or srcLaneID == entryLaneID) and topology.decode(cell) in path:
+				mask |= self.getMask(path[list(path).index(topology.decode(cell)):])
+		return mask
+
+	def getReservation(self, interID: int, cell: int, exitLaneID: int) -> int:
+		key = (cell, exitLaneID)
+		if key not in self.reservations:
+			self.reservations[key] = self.getCells(interID, cell, exitLaneID)
+		return self.reservations[key]
@@ -0,0 +1,68 @@
+from util import *
+
+# Key of entry lane intersections that are not in the queue of their intersection
+NOT_QUEUED = np.iinfo(np.int64).max
+
+class ControllerKernel():
+	# Array based version of the decisions of the MainController, for every intersection at once. The cells of intersections
+	# and the entry and exit lane intersections are flattened in intersection order into label arrays of the topology: the
+	# cell, intersection ID and LED ID of each. The queue of every intersection is kept as a key per entry lane intersection,
+	# the tick it was enqueued on followed by its index, so the first in a queue is the one with the lowest key, as in the
+	# first in, first out scheduling policy of the object based controller. Kernels of sharded controllers only keep the entry
+	# and exit lane intersections of the intersections of their shard, in the same order.
+	def __init__(self, interIDs: Optional[List[int]] = None):
+		self.numIntersections = len(topology.intersectionCells)
+		self.intersectionCells = np.array([cell for cells in topology.intersectionCells for cell in cells], dtype=np.int64)
+		self.intersectionCellIDs = np.array([interID for interID, cells in enumerate(topology.intersectionCells) for cell in cells], dtype=np.int64)
+
+		entryLaneIntersections = [(interID, laneIntersection) for interID, (entry, exit) in enumerate(Intersection.laneIntersections) for laneIntersection in entry]
+		exitLaneIntersections = [(interID, laneIntersection) for interID, (entry, exit) in enumerate(Intersection.laneIntersections) for laneIntersection in exit]
+		self.entryCells = np.array([cell for cells in topology.entryLaneCells for cell in cells], dtype=np.int64)
+		self.entryIntersectionIDs = np.array([interID for interID, laneIntersection in entryLaneIntersections], dtype=np.int64)
+		self.entryLEDIDs = np.array([laneIntersection.LED.LEDID for interID, laneIntersection in entryLaneIntersections], dtype=np.int64)
+		self.exitCells = np.array([cell for cells in topology.exitLaneCells for cell in cells], dtype=np.int64)
+		self.exitIntersectionIDs = np.array([interID for interID, laneIntersection in exitLaneIntersections], dtype=np.int64)
+		self.exitLEDIDs = np.array([laneIntersection.LED.LEDID for interID, laneIntersection in exitLaneIntersections], dtype=np.int64)
+
+		if interIDs is not None:
+			isEntryOwned = np.isin(self.entryIntersectionIDs, interIDs)
+			isExitOwned = np.isin(self.exitIntersectionIDs, interIDs)
+			isCellOwned = np.isin(self.intersectionCellIDs, interIDs)
+			self.entryCells, self.entryIntersectionIDs, self.entryLEDIDs = self.entryCells[isEntryOwned], self.entryIntersectionIDs[isEntryOwned], self.entryLEDIDs[isEntryOwned]
+			self.exitCells, self.exitIntersectionIDs, self.exitLEDIDs = self.exitCells[isExitOwned], self.exitIntersectionIDs[isExitOwned], self.exitLEDIDs[isExitOwned]
+			self.intersectionCells, self.intersectionCellIDs = self.intersectionCells[isCellOwned], self.intersectionCellIDs[isCellOwned]
+		self.clear()
+
+	def clear(self):
+		self.tick = 0
+		self.queueKeys = np.full(len(self.entryCells), NOT_QUEUED, dtype=np.int64)
+		self.LEDStates = np.zeros(len(topology.LEDBounds), dtype=bool)
+
+	def __call__(self, floormap: np.ndarray) -> List[Tuple[int, bool]]:
+		# Decide the LEDs of every intersection and return the changes of LED states as (LED ID, is_on), LEDs start off
+		cells = floormap.ravel()
+		isOccupied = np.bincount(self.intersectionCellIDs, weights=cells[self.intersectionCells] == 5, minlength=self.numIntersections) > 0
+		entryOccupied = cells[self.entryCells] == 5
+		exitOccupied = cells[self.exitCells] == 5
+
+		# Enqueue people waiting at entry lane intersections to get into the intersection if not already in queue
+		enqueued = entryOccupied & (self.queueKeys == NOT_QUEUED)
+		self.queueKeys[enqueued] = self.tick * len(self.entryCells) + np.flatnonzero(enqueued)
+		self.tick += 1
+
+		# Empty intersections dequeue the first of their queue, if any
+		firstKeys = np.full(self.numIntersections, NOT_QUEUED, dtype=np.int64)
+		np.minimum.at(firstKeys, self.entryIntersectionIDs, self.queueKeys)
+		isQueued = firstKeys[self.entryIntersectionIDs] != NOT_QUEUED
+		entryIntersectionOccupied = isOccupied[self.entryIntersectionIDs]
+		dequeued = ~entryIntersectionOccupied & isQueued & (self.queueKeys == firstKeys[self.entryIntersectionIDs])
+		self.queueKeys[dequeued] = NOT_QUEUED
+
+		# Entry LEDs are on while the intersection is occupied, otherwise for everyone but the dequeued person if the queue was not empty
+		# Exit LEDs are on while the intersection is empty, otherwise if their exit lane intersection is blocked
+		prevLEDStates = self.LEDStates.copy()
+		self.LEDStates[self.entryLEDIDs] = entryIntersectionOccupied | (isQueued & ~dequeued)
+		self.LEDStates[self.exitLEDIDs] = ~isOccupied[self.exitIntersectionIDs] | exitOccupied
+
+		changed = np.flatnonzero(self.LEDStates != prevLEDStates)
+		return list(zip(changed.tolist(), self.LEDStates[changed].tolist()))
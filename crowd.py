@@ -0,0 +1,207 @@
+from util import *
+import random
+
+class Crowd():
+	# Struct-of-arrays representation of the people in the simulator. The arrays are kept in the same order as Simulator.people,
+	# so a step processes people in the same order as the object based simulator. Cells are encoded as x * yLim + y and all
+	# paths live in a single flattened path buffer that each person indexes with an offset, a length and a current index.
+	# The arrays of people are views of the first len(self) entries of preallocated arrays, which double in size when full.
+	# A step costs a fixed number of NumPy calls, so Person objects stay faster for small crowds, like the 40 people of main.py,
+	# and the arrays pay off with crowds of hundreds of people.
+	fields = ["personIDs", "pathOffsets", "pathLengths", "pathIdxs", "iterations", "blockedCounts", "srcLocIDs", "dstLocIDs", "dstCells"]
+
+	def __init__(self, floormap: np.ndarray, rng: random.Random=random):
+		self.rng = rng
+		self.emptyFloormap = floormap.copy()
+		self.xLim, self.yLim = floormap.shape
+		self.numCells = self.xLim * self.yLim
+		self.isIntersection = (floormap == 4).flatten()
+		# Edge every LED blocks, in topology.LEDBounds order
+		self.LEDEdges = np.array([self.encode(laneCoord) * self.numCells + self.encode(intersectionCoord) for laneCoord, intersectionCoord in topology.LEDBounds], dtype=np.int64)
+		self.clear()
+
+	def clear(self):
+		self.size = 0
+		self.storage = {field: np.empty(64, dtype=np.int64) for field in self.fields}
+		self.updateViews()
+
+		# Number of people on every cell
+		self.occupancy = np.zeros(self.numCells, dtype=np.int64)
+
+		self.pathBuffer = np.empty(1024, dtype=np.int64)
+		self.pathBufferSize = 0
+		self.blockedCountLim = 3
+
+	def __len__(self) -> int:
+		return self.size
+
+	def updateViews(self):
+		for field in self.fields:
+			setattr(self, field, self.storage[field][:self.size])
+
+	def encode(self, coord: Coord) -> int:
+		return coord.x * self.yLim + coord.y
+
+	def decode(self, cell: int) -> Coord:
+		return Coord(*divmod(int(cell), self.yLim))
+
+	def cells(self) -> np.ndarray:
+		return self.pathBuffer[self.pathOffsets + self.pathIdxs]
+
+	def coords(self) -> List[Coord]:
+		xs, ys = np.divmod(self.cells(), self.yLim)
+		return list(map(Coord, xs.tolist(), ys.tolist()))
+
+	def isOccupied(self, coord: Coord) -> bool:
+		return self.occupancy[self.encode(coord)] > 0
+
+	def appendPath(self, path: List[Coord]) -> int:
+		# Compact the path buffer once most of it is taken up by paths of people who exited or rerouted
+		if self.pathBufferSize + len(path) > len(self.pathBuffer):
+			self.compactPaths()
+		if self.pathBufferSize + len(path) > len(self.pathBuffer):
+			newPathBuffer = np.empty(max(2 * len(self.pathBuffer), self.pathBufferSize + len(path)), dtype=np.int64)
+			newPathBuffer[:self.pathBufferSize] = self.pathBuffer[:self.pathBufferSize]
+			self.pathBuffer = newPathBuffer
+
+		offset = self.pathBufferSize
+		self.pathBuffer[offset:offset + len(path)] = [self.encode(coord) for coord in path]
+		self.pathBufferSize += len(path)
+		return offset
+
+	def compactPaths(self):
+		if len(self) == 0:
+			self.pathBufferSize = 0
+			return
+
+		pathCells = np.repeat(self.pathOffsets - np.cumsum(self.pathLengths) + self.pathLengths, self.pathLengths) + np.arange(self.pathLengths.sum())
+		self.pathBufferSize = len(pathCells)
+		self.pathBuffer[:self.pathBufferSize] = self.pathBuffer[pathCells]
+		self.pathOffsets[:] = np.cumsum(self.pathLengths) - self.pathLengths
+
+	def add(self, person: "Person"):
+		offset = self.appendPath(person.path)
+		if self.size == len(self.storage["personIDs"]):
+			for field in self.fields:
+				storage = np.empty(2 * self.size, dtype=np.int64)
+				storage[:self.size] = self.storage[field][:self.size]
+				self.storage[field] = storage
+
+		values = [person.personID, offset, len(person.path), person.pathIdx, person.iterations, 0, person.srcLoc.locID, person.dstLoc.locID, self.encode(person.dstLoc.dstCoord)]
+		for field, value in zip(self.fields, values):
+			self.storage[field][self.size] = value
+		self.size += 1
+		self.updateViews()
+		self.occupancy[self.pathBuffer[offset + person.pathIdx]] += 1
+
+	def select(self, indices: np.ndarray):
+		for field in self.fields:
+			self.storage[field][:len(indices)] = getattr(self, field)[indices]
+		self.size = len(indices)
+		self.updateViews()
+
+	def shuffle(self):
+		# Shuffle a list of indices so the random number generator is used exactly like when shuffling Simulator.people
+		order = list(range(len(self)))
+		self.rng.shuffle(order)
+		self.select(np.array(order, dtype=np.int64))
+
+	def isBlocked(self, edges: np.ndarray, blockedEdges: np.ndarray) -> np.ndarray:
+		if len(blockedEdges) == 0:
+			return np.zeros(len(edges), dtype=bool)
+		return blockedEdges[np.minimum(np.searchsorted(blockedEdges, edges), len(blockedEdges) - 1)] == edges
+
+	def resolveFreeMoves(self, currCells: np.ndarray, nextCells: np.ndarray, ranks: np.ndarray, free: np.ndarray, leaves: np.ndarray) -> np.ndarray:
+		# A person moving within a lane or an intersection advances if nobody is on their next cell at the moment they are processed.
+		# People are processed in rank order, so the cell is taken if one of its occupants is processed later, if an occupant processed
+		# earlier stays, or if someone processed earlier moves onto it. Decisions only depend on people with a lower rank, so repeatedly
+		# deciding everyone whose lower ranked neighbours are already decided terminates.
+		numPeople = len(ranks)
+		decided = ~free
+		leaves = leaves.copy()
+
+		maxOccupantRanks = np.full(self.numCells, -1, dtype=np.int64)
+		np.maximum.at(maxOccupantRanks, currCells, ranks)
+
+		while True:
+			undecided = np.flatnonzero(~decided)
+			if len(undecided) == 0:
+				return leaves
+
+			stays = decided & ~leaves
+			minStayingOccupantRanks = np.full(self.numCells, numPeople, dtype=np.int64)
+			np.minimum.at(minStayingOccupantRanks, currCells[stays], ranks[stays])
+
+			minUndecidedOccupantRanks = np.full(self.numCells, numPeople, dtype=np.int64)
+			np.minimum.at(minUndecidedOccupantRanks, currCells[undecided], ranks[undecided])
+
+			# Only people who move are entrants, people who leave by exiting are not
+			enters = decided & leaves & (currCells != nextCells)
+			minEnteringRanks = np.full(self.numCells, numPeople, dtype=np.int64)
+			np.minimum.at(minEnteringRanks, nextCells[enters], ranks[enters])
+
+			minUndecidedEnteringRanks = np.full(self.numCells, numPeople, dtype=np.int64)
+			np.minimum.at(minUndecidedEnteringRanks, nextCells[undecided], ranks[undecided])
+
+			targets = nextCells[undecided]
+			undecidedRanks = ranks[undecided]
+			isBlocked = (maxOccupantRanks[targets] > undecidedRanks) | (minStayingOccupantRanks[targets] < undecidedRanks) | (minEnteringRanks[targets] < undecidedRanks)
+			isWaiting = (minUndecidedOccupantRanks[targets] < undecidedRanks) | (minUndecidedEnteringRanks[targets] < undecidedRanks)
+
+			decided[undecided[isBlocked | ~isWaiting]] = True
+			leaves[undecided[~isBlocked & ~isWaiting]] = True
+
+	def step(self, blockedPaths: List[Tuple[Coord]], LEDStates: List[bool]) -> Tuple[List[Tuple[int, Tuple[Coord], int]], int]:
+		# blockedPaths are the coord bounds of the LEDs that are on in LEDStates
+		numPeople = len(self)
+		self.iterations += 1
+
+		currCells = self.cells()
+		exiting = currCells == self.dstCells
+		nextCells = np.where(exiting, currCells, self.pathBuffer[self.pathOffsets + np.minimum(self.pathIdxs + 1, self.pathLengths - 1)])
+
+		# People are processed in reverse order, like the object based simulator
+		ranks = np.arange(numPeople - 1, -1, -1, dtype=np.int64)
+
+		currIntersection = self.isIntersection[currCells]
+		nextIntersection = self.isIntersection[nextCells]
+		intoIntersection = ~exiting & ~currIntersection & nextIntersection
+		outOfIntersection = ~exiting & currIntersection & ~nextIntersection
+		free = ~exiting & ~intoIntersection & ~outOfIntersection
+
+		# Moves into and out of intersections only depend on the LEDs
+		# Sorted, to look edges up with a binary search
+		blockedEdges = np.sort(self.LEDEdges[np.array(LEDStates, dtype=bool)])
+		intoAllowed = ~self.isBlocked(currCells * self.numCells + nextCells, blockedEdges)
+		outOfAllowed = ~self.isBlocked(nextCells * self.numCells + currCells, blockedEdges)
+		leaves = exiting | (intoIntersection & intoAllowed) | (outOfIntersection & outOfAllowed)
+
+		# Moves within lanes and intersections depend on everyone else
+		leaves = self.resolveFreeMoves(currCells, nextCells, ranks, free, leaves)
+		advances = leaves & ~exiting
+
+		# People blocked on their way out of an intersection wait, and reroute after waiting too long
+		waiting = outOfIntersection & ~outOfAllowed
+		self.blockedCounts[waiting] += 1
+		for i in np.flatnonzero(waiting & (self.blockedCounts > self.blockedCountLim)):
+			path = rerouteCache.findPath(self.decode(currCells[i]), Location(int(self.dstLocIDs[i])), self.emptyFloormap, blockedPaths)
+			if path is None:
+				self.blockedCounts[i] = 0
+				continue
+
+			self.pathOffsets[i] = self.appendPath(path)
+			self.pathLengths[i] = len(path)
+			self.pathIdxs[i] = 0
+
+		self.pathIdxs[advances] += 1
+		self.blockedCounts[advances] = 0
+		np.subtract.at(self.occupancy, currCells[leaves], 1)
+		np.add.at(self.occupancy, nextCells[advances], 1)
+
+		# Collect travel times of people who have reached their destination, in the order they were processed
+		exited = np.flatnonzero(exiting)[::-1]
+		results = [(int(self.personIDs[i]), (Location.getCoords(int(self.srcLocIDs[i]))[0], Location.getCoords(int(self.dstLocIDs[i]))[1]), int(self.iterations[i])) for i in exited]
+		if len(exited) > 0:
+			self.select(np.flatnonzero(~exiting))
+
+		return results, int(np.count_nonzero(advances))
@@ -0,0 +1,116 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import cv2
+from util import *
+from simulation_trace import TraceReader
+from replay import getTicks, getSprites
+
+# Each worker process keeps a single off-screen renderer
+renderer = None
+
+def initWorker(floormap: np.ndarray, layout: Layout):
+	global renderer
+	useLayout(layout)
+	# Render to an off-screen surface, without opening a window
+	os.environ['SDL_VIDEODRIVER'] = 'dummy'
+	import pygame
+	from renderer import Renderer
+	renderer = Renderer(floormap)
+
+	# Draw onto a 32 bit surface whose pixels are stored as B, G, R, X bytes, so frames are read without going through pygame
+	renderer.screen = pygame.Surface(renderer.screen.get_size(), 0, 32, (0xFF0000, 0x00FF00, 0x0000FF, 0))
+
+def renderTicks(ticks: List[Tuple], animationLoops: int) -> np.ndarray:
+	# Render every animation frame of a range of ticks, as BGR frames ready for cv2.VideoWriter
+	renderer.invalidate()
+	width, height = renderer.screen.get_size()
+	frames = np.empty((len(ticks) * animationLoops, height, width, 3), dtype=np.uint8)
+	for i, (people, LEDStates, peopleCount, peopleEntered, peopleExited) in enumerate(ticks):
+		for animationLoop in range(1, animationLoops + 1):
+			renderer.drawFrame(getSprites(people, animationLoop, animationLoops), LEDStates, peopleCount, peopleEntered, peopleExited)
+			readFrame(frames[i * animationLoops + animationLoop - 1])
+	return frames
+
+def readFrame(frame: np.ndarray):
+	# The surface stays locked while its pixel buffer is referenced, so only hold on to it while copying
+	screen = renderer.screen
+	pixels = np.frombuffer(screen.get_buffer(), dtype=np.uint8).reshape(screen.get_height(), screen.get_pitch() // 4, 4)
+	cv2.cvtColor(pixels[:, :screen.get_width()], cv2.COLOR_BGRA2BGR, dst=frame)
+
+def getChunks(trace: TraceReader, start: int, end: Optional[int], chunkSize: int):
+	chunk = []
+	for tick in getTicks(trace, start, end):
+		chunk.append(tick)
+		if len(chunk) == chunkSize:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+def export(trace: TraceReader, floormap: np.ndarray, outputPath: str, start: int, end: Optional[int], fps: int, animationLoops: int, chunkSize: int, processes: Optional[int]) -> int:
+	# Ranges of ticks are rendered across a process pool while this process encodes the frames in order
+	processes = processes if processes is not None else os.cpu_count()
+	chunks = getChunks(trace, start, end, chunkSize)
+	writer = None
+	numFrames = 0
+	def write(frames: np.ndarray):
+		nonlocal writer, numFrames
+		if writer is None:
+			fourcc = cv2.VideoWriter_fourcc('m', 'p', '4', 'v')
+			writer = cv2.VideoWriter(outputPath, fourcc, fps, (frames.shape[2], frames.shape[1]), True)
+		for frame in frames:
+			writer.write(frame)
+		numFrames += len(frames)
+
+	if processes == 1:
+		# Sending frames to another process costs more than rendering them with a single CPU
+		initWorker(floormap, getLayout())
+		for chunk in chunks:
+			write(renderTicks(chunk, animationLoops))
+	else:
+		with ProcessPoolExecutor(max_workers=processes, initializer=initWorker, initargs=(floormap, getLayout())) as executor:
+			# Bound the number of rendered chunks waiting to be encoded
+			pending = deque()
+			while True:
+				for chunk in chunks:
+					pending.append(executor.submit(renderTicks, chunk, animationLoops))
+					if len(pending) >= 2 * processes:
+						break
+				if not pending:
+					break
+				write(pending.popleft().result())
+
+	if writer is not None:
+		writer.release()
+	return numFrames
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("trace", help="Path to a trace recorded with main.py --trace", type=str)
+	parser.add_argument("-o", "--output", help="Path to the MP4 file to write", type=str, required=True)
+	parser.add_argument("--start", help="First step to export", type=int, default=0)
+	parser.add_argument("--end", help="Step to stop exporting at", type=int, default=None)
+	parser.add_argument("--fps", help="Frame rate of the video", type=int, default=100)
+	parser.add_argument("--frames-per-tick", help="Number of animation frames between two ticks", type=int, default=20)
+	parser.add_argument("--chunk-size", help="Number of ticks rendered by a worker at a time", type=int, default=2)
+	parser.add_argument("-j", "--processes", help="Number of render processes, defaults to the number of CPUs", type=int, default=None)
+	parser.add_argument("--layout", help="Path to a layout file, defaults to layouts/mte380.json", type=str, default=None)
+	args = parser.parse_args()
+	if args.layout is not None:
+		useLayout(Layout.load(args.layout))
+
+	from main import getFloormap
+	with TraceReader(args.trace) as trace:
+		try:
+			trace.checkSteps(args.start, args.end)
+		except IndexError as e:
+			parser.error(str(e))
+
+		start = time.perf_counter()
+		numFrames = export(trace, getFloormap(), args.output, args.start, args.end, args.fps, args.frames_per_tick, args.chunk_size, args.processes)
+		elapsed = time.perf_counter() - start
+
+	print("[INFO] Exported {} frames to {} in {:.1f}s ({:.1f} frames/s)".format(numFrames, args.output, elapsed, numFrames / elapsed))
@@ -0,0 +1,75 @@
+from typing import List, Tuple, Optional
+import json
+import time
+import numpy as np
+
+# Per stage tick timing of the Simulator, Camera and MainController. Each process counts the ticks it handles, which line up
+# across processes since every tick goes through the pipeline exactly once, and records the start and end of every stage
+# of a tick in nanoseconds of time.perf_counter_ns, which is a system wide monotonic clock.
+
+class TickTimer():
+	def __init__(self, process: str):
+		self.process = process
+		self.tick = -1
+		self.last = 0
+		self.records = []
+
+	def startTick(self):
+		self.tick += 1
+		self.last = time.perf_counter_ns()
+
+	def mark(self, stage: str):
+		# The stage started at the previous mark, or at the start of the tick
+		now = time.perf_counter_ns()
+		self.records.append((self.tick, stage, self.last, now))
+		self.last = now
+
+	def record(self, stage: str, start: int, tick: Optional[int]=None):
+		# Stages that do not follow the previous mark, e.g. nested stages or stages of another thread
+		self.records.append((self.tick if tick is None else tick, stage, start, time.perf_counter_ns()))
+
+	def getTimings(self) -> Tuple[str, List[Tuple[int, str, int, int]]]:
+		return self.process, self.records
+
+
+# Time between a stage of one process ending (or starting) and a stage of the next process ending, for the same tick. Processes
+# of sharded main controllers are numbered, mainController0 and so on, and have transits of their own
+transits = [("simulator->camera", ("simulator", "pipeline", "start"), ("camera", "receive")),
+			("camera->mainController", ("camera", "update", "end"), ("mainController", "receive")),
+			("mainController->simulator", ("mainController", "localControllers", "end"), ("simulator", "pipeline"))]
+
+def summarize(durations: np.ndarray) -> dict:
+	# Durations in nanoseconds, statistics and histogram in microseconds with 4 logarithmic bins per decade from 1us to 10s
+	durations = durations / 1000
+	edges = np.logspace(0, 7, 29)
+	counts, _ = np.histogram(np.clip(durations, edges[0], edges[-1]), bins=edges)
+	p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+	return {"count": len(durations), "mean": float(np.mean(durations)), "p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(np.max(durations)),
+			"histogram": {"edges": edges.tolist(), "counts": counts.tolist()}}
+
+def exportTimings(path: str, timings: List[Tuple[str, List[Tuple[int, str, int, int]]]]) -> dict:
+	# Latency statistics of every stage of every process, and of the transits between processes, written as JSON
+	stages = dict()
+	ends = dict()
+	for process, records in timings:
+		for tick, stage, start, end in records:
+			stages.setdefault("{}.{}".format(process, stage), []).append(end - start)
+			ends[(process, stage, tick)] = (start, end)
+
+	summaries = {stage: summarize(np.array(durations)) for stage, durations in sorted(stages.items())}
+	processes = [process for process, records in timings]
+	def getProcesses(name: str) -> List[str]:
+		return [process for process in processes if process == name or (process.startswith(name) and process[len(name):].isdigit())]
+
+	for name, (srcName, srcStage, srcPoint), (dstName, dstStage) in transits:
+		for srcProcess in getProcesses(srcName):
+			for dstProcess in getProcesses(dstName):
+				durations = [ends[(dstProcess, dstStage, tick)][1] - (start if srcPoint == "start" else end)
+							 for (process, stage, tick), (start, end) in ends.items()
+							 if (process, stage) == (srcProcess, srcStage) and (dstProcess, dstStage, tick) in ends]
+				if durations:
+					summaries["transit.{}->{}".format(srcProcess, dstProcess)] = summarize(np.array(durations))
+
+	with open(path, 'w') as f:
+		json.dump(summaries, f, indent=4)
+	return summaries
@@ -0,0 +1,95 @@
+import argparse
+import time
+from util import *
+
+# Synthetic layouts of a grid of intersections, for testing how the simulator and the main controller scale with the size of a venue.
+# Every intersection is a 2x2 block. Neighbouring intersections are joined by a street of two opposite one way lanes, and the
+# intersections on the border of the grid get a location, whose lanes lead in from and out to the edge of the floormap.
+
+def generateLayout(columns: int, rows: int, laneLength: int=3, name: Optional[str]=None) -> Layout:
+	if columns < 1 or rows < 1 or laneLength < 1:
+		raise ValueError("Layouts need at least one intersection and lanes of at least one coord")
+
+	spacing = laneLength + 2
+	width = columns * spacing + laneLength
+	height = rows * spacing + laneLength
+	floormap = np.full((width, height), -1, dtype=np.int64)
+
+	lanes = []
+	intersections = [(set(), [], []) for i in range(columns * rows)]
+	locations = []
+
+	def getOrigin(column: int, row: int) -> Coord:
+		return Coord(laneLength + column * spacing, laneLength + row * spacing)
+
+	def addLane(path: List[Coord], direction: int, srcInterID: Optional[int], dstInterID: Optional[int]):
+		# Lanes leave srcInterID through their first coord and enter dstInterID through their last coord, floormap values
+		# 0 and 1 are eastbound and westbound lanes, 2 and 3 southbound and northbound lanes
+		laneID = len(lanes)
+		lanes.append(path)
+		for coord in path:
+			floormap[coord] = direction
+		step = Coord(path[-1].x - path[-2].x, path[-1].y - path[-2].y) if len(path) > 1 else [Coord(1, 0), Coord(-1, 0), Coord(0, 1), Coord(0, -1)][direction]
+		if srcInterID is not None:
+			intersections[srcInterID][2].append(((path[0], Coord(path[0].x - step.x, path[0].y - step.y)), laneID))
+		if dstInterID is not None:
+			intersections[dstInterID][1].append(((path[-1], Coord(path[-1].x + step.x, path[-1].y + step.y)), laneID))
+
+	def getInterID(column: int, row: int) -> Optional[int]:
+		return row * columns + column if 0 <= column < columns and 0 <= row < rows else None
+
+	for row in range(rows):
+		for column in range(columns):
+			interID = getInterID(column, row)
+			x, y = getOrigin(column, row)
+			for coord in [Coord(x, y), Coord(x + 1, y), Coord(x, y + 1), Coord(x + 1, y + 1)]:
+				intersections[interID][0].add(coord)
+				floormap[coord] = 4
+
+	for row in range(rows):
+		for column in range(columns + 1):
+			# Streets west of every intersection, and east of the last column. Eastbound on the top row, westbound on the bottom row
+			x, y = getOrigin(column, row)
+			westInterID, eastInterID = getInterID(column - 1, row), getInterID(column, row)
+			xs = list(range(x - laneLength, x))
+			addLane([Coord(lx, y) for lx in xs], 0, westInterID, eastInterID)
+			addLane([Coord(lx, y + 1) for lx in reversed(xs)], 1, eastInterID, westInterID)
+			if westInterID is None or eastInterID is None:
+				# Locations enter and exit through the lanes at the edge of the floormap
+				locations.append((lanes[-2][0], lanes[-1][-1]) if westInterID is None else (lanes[-1][0], lanes[-2][-1]))
+
+	for column in range(columns):
+		for row in range(rows + 1):
+			# Streets north of every intersection, and south of the last row. Southbound on the left column, northbound on the right column
+			x, y = getOrigin(column, row)
+			northInterID, southInterID = getInterID(column, row - 1), getInterID(column, row)
+			ys = list(range(y - laneLength, y))
+			addLane([Coord(x, ly) for ly in ys], 2, northInterID, southInterID)
+			addLane([Coord(x + 1, ly) for ly in reversed(ys)], 3, southInterID, northInterID)
+			if northInterID is None or southInterID is None:
+				locations.append((lanes[-2][0], lanes[-1][-1]) if northInterID is None else (lanes[-1][0], lanes[-2][-1]))
+
+	# Without explicit routes, people take the shortest path between every pair of locations
+	routes = {(srcLocID, dstLocID): None for srcLocID in range(1, len(locations) + 1) for dstLocID in range(1, len(locations) + 1)}
+	layout = Layout(name if name is not None else "grid{}x{}".format(columns, rows), floormap, np.where(floormap != -1, 0, -1), locations, lanes,
+					dict(), intersections, routes, set(), dict())
+	layout.validate()
+	return layout
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-o", "--output", help="Path to the layout file to write", type=str, required=True)
+	parser.add_argument("-c", "--columns", help="Number of columns of intersections", type=int, default=10)
+	parser.add_argument("-r", "--rows", help="Number of rows of intersections", type=int, default=10)
+	parser.add_argument("-l", "--lane-length", help="Number of coords of every lane", type=int, default=3)
+	parser.add_argument("--name", help="Name of the layout, defaults to gridCxR", type=str, default=None)
+	args = parser.parse_args()
+
+	layout = generateLayout(args.columns, args.rows, args.lane_length, args.name)
+	layout.save(args.output)
+
+	# Check that the layout loads and builds
+	start = time.perf_counter()
+	useLayout(Layout.load(args.output))
+	print("[INFO] Wrote layout {} to {}: {}x{} floormap, {} intersections, {} lanes, {} LEDs, {} locations, {} routes (built in {:.2f}s)".format(
+		layout.name, args.output, *layout.floormap.shape, len(layout.intersections), len(layout.lanes), len(topology.LEDBounds), len(layout.locations), len(routes.pairs), time.perf_counter() - start))
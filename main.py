@@ -1,9 +1,16 @@
 from typing import List
+import argparse
+import sys
 from multiprocessing import Process, Queue
 from camera import Camera
 from main_controller import MainController
+from pipeline import SyncPipeline
 from simulator import Simulator
 from travel_time import TravelTime
+from instrumentation import TickTimer
+from scheduling import policies
+from sharding import createShards
+from transport import transports, createChannels, closeChannels
 import numpy as np
 from util import *
 
@@ -11,31 +18,15 @@ def emptyQueue(queue: Queue) -> None:
 	while not queue.empty():
 		queue.get()
 
-def main():
-    # Initialize floormap
-	grid = [[-1,  0,  1, -1, -1, -1, -1,  0,  0, -1, -1, -1, -1, -1, -1,  1, -1, -1, -1,  1],
-			[-1,  0,  1,  1,  1, -1, -1, -1,  0,  2,  2,  2,  2,  2,  4,  4, -1, -1, -1,  1],
-			[-1,  0,  0,  0,  1,  4,  2,  2,  4,  2,  3,  3,  3,  3,  4,  2,  2,  4,  1,  1],
-			[-1, -1, -1,  0,  0,  4, -1, -1,  4,  3,  3, -1, -1, -1,  3,  3,  4,  4,  2, -1],
-			[-1, -1, -1, -1, -1,  2, -1, -1,  3, -1, -1, -1, -1, -1, -1, -1,  3,  3,  2,  2],
-			[-1, -1, -1, -1, -1,  4,  4,  3,  3, -1, -1, -1, -1, -1, -1, -1, -1,  3,  3,  2],
-			[-1, -1, -1, -1, -1,  2,  3, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[-1, -1, -1, -1,  2,  2,  3, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[-1, -1, -1, -1,  2,  3,  3, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  4,  4],
-			[-1, -1, -1, -1,  2,  3, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[-1, -1, -1, -1,  2,  3, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[ 1,  1,  1,  1,  4,  4, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[-1, -1,  0,  0,  4,  4, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[ 0,  0,  0, -1,  2,  3,  3, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[-1, -1, -1, -1,  2,  4,  4,  3, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  3,  2],
-			[-1, -1, -1, -1,  1,  4,  2,  3,  3, -1, -1, -1, -1, -1, -1, -1, -1,  3,  3,  2],
-			[-1, -1, -1, -1,  1,  0,  2,  2,  4,  3,  3,  3,  4,  3, -1, -1,  3,  3,  2,  2],
-			[-1, -1, -1,  1,  1,  0, -1,  4,  4,  2,  2,  2,  4,  3,  3,  4,  3,  2,  2, -1],
-			[-1,  1,  1,  1,  0,  0, -1,  1, -1, -1, -1, -1,  2,  2,  2,  4,  2,  2, -1, -1],
-			[-1,  1,  0,  0,  0, -1, -1,  1, -1, -1, -1, -1, -1, -1, -1,  0, -1, -1, -1, -1],
-			[-1,  1,  0, -1, -1, -1, -1,  1, -1, -1, -1, -1, -1, -1, -1,  0, -1, -1, -1, -1]]
+def getFloormap() -> np.ndarray:
+	# Floormap of the layout in use, see util.useLayout
+	return getLayout().floormap.copy()
 
-	floormap = np.array(grid).transpose(1,0)
+def main(args):
+	# The layout must be in use before any process is started
+	if args.layout is not None:
+		useLayout(Layout.load(args.layout))
+	floormap = getFloormap()
 
 	# Set up queues for interprocess data
 	cameraData = Queue()
@@ -43,28 +34,72 @@ def main():
 	simulatorData = Queue()
 	travelTimeData = Queue()
 
-	# Initialize processes
-	cameraProcess = Camera(floormap, simulatorData, cameraData)
-	mainControllerProcess = MainController(cameraData, mainControllerData)
-	simulator = Simulator(floormap, mainControllerData, simulatorData, travelTimeData, debug=False)
-	travelTime = TravelTime(travelTimeData)
+	# Ring buffers hold the coordinates of up to maxPeople people
+	maxPeople = 40
 
-	cameraProcess.start()
-	mainControllerProcess.start()
-	travelTime.start()
+	# Initialize processes, or call the camera and main controller in this process when running synchronously
+	if args.sync:
+		pipeline = SyncPipeline(floormap, timed=args.timings is not None, vectorizedController=args.vectorized_controller, policy=args.policy, concurrent=args.concurrent)
+		controlProcesses = []
+	elif args.shards > 1:
+		# A main controller process per shard of intersections, with its own channels to and from the camera
+		pipeline = None
+		shards = createShards(args.shards, args.policy)
+		simulatorData, cameraData, mainControllerData = createChannels(args.transport, maxPeople, [shardCells for interIDs, shardCells in shards])
+		cameraProcess = Camera(floormap, simulatorData, cameraData, TickTimer('camera') if args.timings is not None else None, shardCells=[shardCells for interIDs, shardCells in shards])
+		mainControllerProcesses = [MainController(cameraData[i], mainControllerData[i], TickTimer('mainController{}'.format(i)) if args.timings is not None else None, vectorized=args.vectorized_controller, policy=args.policy, concurrent=args.concurrent, interIDs=interIDs, shardCells=shardCells) for i, (interIDs, shardCells) in enumerate(shards)]
+		controlProcesses = [cameraProcess] + mainControllerProcesses
+	else:
+		pipeline = None
+		simulatorData, cameraData, mainControllerData = createChannels(args.transport, maxPeople)
+		cameraProcess = Camera(floormap, simulatorData, cameraData, TickTimer('camera') if args.timings is not None else None)
+		mainControllerProcess = MainController(cameraData, mainControllerData, TickTimer('mainController') if args.timings is not None else None, vectorized=args.vectorized_controller, policy=args.policy, concurrent=args.concurrent)
+		controlProcesses = [cameraProcess, mainControllerProcess]
+	# The simulator checks its options before any process is started
+	try:
+		simulator = Simulator(floormap, mainControllerData, simulatorData, travelTimeData, debug=args.debug, headless=args.headless, pipeline=pipeline, vectorized=args.vectorized, seed=args.seed, fps=args.fps, tickRate=args.tick_rate, concurrent=args.concurrent)
+	except ValueError:
+		closeChannels(simulatorData, cameraData, mainControllerData)
+		raise
+	travelTime = TravelTime(travelTimeData, headless=args.headless)
+
+	for process in controlProcesses + [travelTime]:
+		process.start()
 
 	numOfPeople = [1, 5, 10, 25, 40, 50, 100]
 
-	simulator.run(40)
-	# emptyQueue(cameraData)
-	# emptyQueue(mainControllerData)
-	# emptyQueue(simulatorData)
-	# emptyQueue(travelTimeData)
+	try:
+		simulator.run(maxPeople, tracePath=args.trace, timingPath=args.timings)
+	finally:
+		# The camera and main controllers wait for the next tick forever, they are stopped before their channels are freed
+		for process in controlProcesses:
+			process.terminate()
+			process.join()
+		closeChannels(simulatorData, cameraData, mainControllerData)
 
-	# cameraProcess.terminate()
-	# mainControllerProcess.terminate()
-	# travelTime.terminate()
+		# Travel time stops once it reported the results of the run, after its plot is closed with a window
+		travelTimeData.put(None)
+		travelTime.join()
+	return travelTime.exitcode
 
 
 if __name__ == "__main__":
-	main()
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--debug", help="Advance the simulation one tick per mouse click", action='store_true')
+	parser.add_argument("--headless", help="Run the simulation without a pygame window or animation", action='store_true')
+	parser.add_argument("--vectorized", help="Simulate people with the array based crowd, only available with --headless", action='store_true')
+	parser.add_argument("--vectorized-controller", help="Decide the LEDs of all intersections with array operations instead of Intersection objects", action='store_true')
+	parser.add_argument("--policy", help="Scheduling policy letting people into intersections", type=str, choices=list(policies), default="fifo")
+	parser.add_argument("--concurrent", help="Let several people into an intersection at once if their movements do not conflict", action='store_true')
+	parser.add_argument("--sync", help="Run the camera and main controller in the simulator process instead of separate processes", action='store_true')
+	parser.add_argument("--shards", help="Number of main controller processes to split the intersections across, not with --sync", type=int, default=1)
+	parser.add_argument("--transport", help="Channels between the simulator, camera and main controller processes: queues, or shared memory ring buffers of binary records", type=str, choices=transports, default="queue")
+	parser.add_argument("--seed", help="Seed for the simulation's random number generator, for reproducible runs", type=int, default=None)
+	parser.add_argument("--fps", help="Frame rate of the pygame window", type=int, default=100)
+	parser.add_argument("--tick-rate", help="Simulation ticks per second with a window, 0 to step as fast as possible", type=float, default=5)
+	parser.add_argument("--trace", help="Path to an optional binary trace file to record the run to, see replay.py", type=str, default=None)
+	parser.add_argument("--timings", help="Path to an optional JSON file to write per stage tick latency statistics of every process to", type=str, default=None)
+	parser.add_argument("--layout", help="Path to a layout file, defaults to layouts/mte380.json", type=str, default=None)
+	args = parser.parse_args()
+
+	sys.exit(main(args))
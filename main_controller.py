@@ -1,11 +1,47 @@
 from util import *
 from multiprocessing import Process, Queue
+from instrumentation import TickTimer
+from controller_kernel import ControllerKernel
+from scheduling import policies
+from conflicts import ConflictTable
+from transport import putRecord
 
 class MainController(Process):
-	def __init__(self, cameraData: Queue, mainControllerData: Queue):
+	# Concurrent controllers let people bypass the first in the queue of an intersection until it waited this many ticks
+	bypassLimit = 8
+
+	def __init__(self, cameraData: Queue, mainControllerData: Queue, timer: Optional[TickTimer] = None, vectorized: bool = False, policy: str = "fifo", concurrent: bool = False, interIDs: Optional[List[int]] = None, shardCells: Optional[np.ndarray] = None):
 		Process.__init__(self)
 		self.cameraData = cameraData
 		self.mainControllerData = mainControllerData
+		self.intersections = None
+		self.timer = timer
+
+		# Name of the scheduling policy deciding who is let into every intersection, see scheduling.py
+		if policy not in policies:
+			raise ValueError("Unknown scheduling policy {}, expected one of {}".format(policy, ", ".join(policies)))
+		self.policy = policy
+
+		# Vectorized controllers decide the LEDs of all intersections with array operations instead of Intersection objects,
+		# which stay the reference for the decisions
+		if vectorized and policy != "fifo":
+			raise ValueError("The vectorized controller only lets people into intersections first in, first out")
+		self.vectorized = vectorized
+		self.kernel = None
+
+		# Concurrent controllers let several people into an intersection at once if their movements do not conflict, see
+		# conflicts.py. They are given the lane every person waiting at or in an intersection heads to
+		if vectorized and concurrent:
+			raise ValueError("The vectorized controller only lets one person into an intersection at a time")
+		self.concurrent = concurrent
+
+		# Sharded controllers only decide the LEDs of the intersections of their shard, all of them by default. Their processes
+		# are sent the values of the cells of the shard instead of the floormap, see sharding.py
+		self.interIDs = interIDs
+		self.shardCells = shardCells
+
+		# Processes that are not forked import the default layout, so they are given the one in use
+		self.layout = getLayout()
 
 		'''
 		logger = logging.getLogger('main_controller_logger')
@@ -22,64 +58,199 @@ class MainController(Process):
 		self.logger = logger
 		'''
 
+	def __call__(self, floormap: np.ndarray, requests: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, bool]]:
+		# requests are the (cell, exit lane ID) of people at entry lane intersections and in intersections, for concurrent controllers
+		if self.vectorized:
+			return self.callKernel(floormap)
+
+		# Intersections and their scheduling policies are only created in the process that uses them
+		if self.intersections is None:
+			self.intersections = [Intersection(i) for i in range(len(Intersection.intersectionCoords))]
+			self.policies = [policies[self.policy](i) for i in range(len(self.intersections))]
+			self.tick = 0
+			self.ownedIDs = list(range(len(self.intersections))) if self.interIDs is None else sorted(self.interIDs)
+			self.isOwned = set(self.ownedIDs)
+			# Cells every intersection reads, its own followed by those of its entry and exit lane intersections, gathered in one go
+			self.watchedRanges = [None] * len(self.intersections)
+			watchedCells = []
+			for i in self.ownedIDs:
+				cells = topology.intersectionCells[i] + topology.entryLaneCells[i] + topology.exitLaneCells[i]
+				self.watchedRanges[i] = (len(watchedCells), len(watchedCells) + len(cells))
+				watchedCells += cells
+			self.watchedCells = np.array(watchedCells, dtype=np.int64)
+			self.prevCells = None
+			self.prevRequests = dict()
+			self.pending = []
+			self.conflictTable = ConflictTable() if self.concurrent else None
+			# LEDs are shared by every controller of the process, changes are sent relative to those of its intersections being off
+			for interID in self.ownedIDs:
+				for laneIntersection in self.intersections[interID].entry_lane_intersections + self.intersections[interID].exit_lane_intersections:
+					laneIntersection.LED.power_off()
+
+		# Only intersections with a changed cell or that let someone in on their last tick can decide differently,
+		# the others would turn their LEDs to the states they already are in
+		cells = floormap.ravel()
+		isFirstTick = self.prevCells is None
+		if isFirstTick:
+			dirty = self.ownedIDs
+		else:
+			dirty = set(self.pending)
+			for cell in np.flatnonzero(cells != self.prevCells).tolist():
+				dirty.update(topology.cellIntersectionIDs[cell])
+			dirty = sorted(dirty & self.isOwned)
+		self.prevCells = cells.copy()
+		self.pending = []
+
+		# People who changed the lane they head to count as changed cells, every intersection is evaluated on the first tick anyway
+		requests = dict(requests.tolist() if isinstance(requests, np.ndarray) else requests) if requests is not None else dict()
+		if self.concurrent and not isFirstTick and requests != self.prevRequests:
+			dirty = set(dirty)
+			for cell in set(requests.items()) ^ set(self.prevRequests.items()):
+				dirty.update(topology.cellIntersectionIDs[cell[0]])
+			dirty = sorted(dirty & self.isOwned)
+		self.prevRequests = requests
+
+		# Set up dictionary to store LEDs and their new power states for each local controller
+		controllersLEDs = dict()
+		occupied = (cells[self.watchedCells] == 5).tolist() if dirty else []
+
+		# Number of people on every lane, for policies that look at them
+		laneCounts = None
+		if dirty and policies[self.policy].usesLanes:
+			laneIDs = topology.laneIDs[np.flatnonzero(cells == 5)]
+			laneCounts = np.bincount(laneIDs[laneIDs != -1], minlength=len(Lane.lanePaths)).tolist()
+
+		# Look at the intersections whose cells changed
+		for interID in dirty:
+			intersection = self.intersections[interID]
+			# Start with an empty list
+			controllersLEDs[intersection.local_controller] = []
+
+			# Occupancy of the intersection, then of its entry and exit lane intersections
+			startOffset, endOffset = self.watchedRanges[interID]
+			entryOffset = startOffset + len(topology.intersectionCells[interID])
+			exitOffset = entryOffset + len(intersection.entry_lane_intersections)
+			entryOccupied = occupied[entryOffset:exitOffset]
+			exitOccupied = occupied[exitOffset:endOffset]
+
+			# Enqueue people waiting at entry lane intersections to get into the intersection if not already in queue
+			policy = self.policies[interID]
+			for entry, isOccupied in enumerate(entryOccupied):
+				if isOccupied:
+					policy.enqueue(entry, self.tick)
+ 
+			# Let the scheduling policy determine which people can enter the intersection, if any. Only one person is let into an
+			# empty intersection, unless the controller is concurrent
+			isOccupied = any(occupied[startOffset:entryOffset])
+			if self.concurrent:
+				admittedEntries = self.admitConcurrent(interID, policy, occupied[startOffset:entryOffset], requests, laneCounts)
+			elif isOccupied or policy.isEmpty():
+				admittedEntries = []
+			else:
+				admittedEntries = [policy.admit(self.tick, laneCounts)]
+			if admittedEntries:
+				self.pending.append(interID)
+
+			# Turn off LEDs of entry lane intersections for admitted people and turn on the others. Without anyone admitted, turn on
+			# all LEDs of entry lane intersections to prevent exit if there is anyone in the intersection, turn off otherwise
+			for entry, entryLaneIntersection in enumerate(intersection.entry_lane_intersections):
+				powerState = entry not in admittedEntries if admittedEntries else isOccupied
+				controllersLEDs[intersection.local_controller].append((entryLaneIntersection.LED, powerState))
+
+			# Turn on all LEDs of exit lane intersections that are blocked if there is anyone in the intersection, turn off otherwise.
+			# Turn on all LEDs of exit lane intersections to prevent entry if the intersection is empty
+			for exitLaneIntersection, isBlocked in zip(intersection.exit_lane_intersections, exitOccupied):
+				controllersLEDs[intersection.local_controller].append((exitLaneIntersection.LED, isBlocked or not isOccupied))
+
+		self.tick += 1
+		if self.timer is not None:
+			self.timer.mark('intersections')
+
+		# Changes of LED states as (LED ID, is_on), LEDs start off
+		changedLEDs = []
+
+		# Local controller turns on or off LEDs accordingly
+		for localController in controllersLEDs:
+			localLEDs = [i[0] for i in controllersLEDs[localController]]
+			localPowerStates = [i[1] for i in controllersLEDs[localController]]
+			changedLEDs += [(LED.LEDID, powerState) for LED, powerState in controllersLEDs[localController] if LED.is_on != powerState]
+			localController.power_LEDs(localLEDs, localPowerStates)
+
+		if self.timer is not None:
+			self.timer.mark('localControllers')
+		return changedLEDs
+
+	def admitConcurrent(self, interID: int, policy: "SchedulingPolicy", occupied: List[bool], requests: Dict[int, int], laneCounts: Optional[List[int]]) -> List[int]:
+		# People in the intersection hold the cells they may still use on the way to the lane they head to
+		reserved = 0
+		for cell, isOccupied in zip(topology.intersectionCells[interID], occupied):
+			if isOccupied:
+				reserved |= self.conflictTable.getReservation(interID, cell, requests.get(cell, -1))
+
+		# Let in people in the order of the policy as long as their movement conflicts with none of the people in the intersection
+		# and of the people let in before them. Nobody bypasses the first in the queue once it waited bypassLimit ticks
+		movementIDs = self.conflictTable.movementIDs[interID]
+		masks = self.conflictTable.masks[interID]
+		conflicts = self.conflictTable.conflicts[interID]
+		entryCells = topology.entryLaneCells[interID]
+		admittedEntries = []
+		admittedMovementIDs = []
+		while not policy.isEmpty():
+			candidates = []
+			for entry in policy.waitingSince:
+				movementID = movementIDs.get((entry, requests.get(entryCells[entry], -1)), movementIDs[(entry, -1)])
+				if masks[movementID] & reserved == 0 and not any(conflicts[movementID][admittedMovementID] for admittedMovementID in admittedMovementIDs):
+					candidates.append((entry, movementID))
+
+			first = next(iter(policy.waitingSince))
+			if not candidates or (candidates[0][0] != first and self.tick - policy.waitingSince[first] >= self.bypassLimit):
+				break
+			entry = policy.admit(self.tick, laneCounts, [entry for entry, movementID in candidates])
+			admittedEntries.append(entry)
+			admittedMovementIDs.append(dict(candidates)[entry])
+		return admittedEntries
+
+	def getSchedulingStats(self) -> dict:
+		# Throughput and waits of every intersection since the controller started, see SchedulingPolicy.getStats
+		if self.intersections is None:
+			return {"policy": self.policy, "ticks": 0, "intersections": dict()}
+		return {"policy": self.policy, "ticks": self.tick, "intersections": {str(interID): self.policies[interID].getStats(self.tick) for interID in self.ownedIDs}}
+
+	def callKernel(self, floormap: np.ndarray) -> List[Tuple[int, bool]]:
+		# Like intersections, the kernel is only created in the process that uses it
+		if self.kernel is None:
+			self.kernel = ControllerKernel(self.interIDs)
+
+		changedLEDs = self.kernel(floormap)
+		if self.timer is not None:
+			# There are no local controllers to go through, the stage is kept to line up with the object based controller
+			self.timer.mark('intersections')
+			self.timer.mark('localControllers')
+		return changedLEDs
+
 	def run(self):
-		self.intersections = [Intersection(i) for i in range(11)]
+		useLayout(self.layout)
+		# Sharded controllers put the values of the cells of their shard into a floormap of their own
+		floormap = self.layout.floormap.copy()
 		while True:
-			# Get floormap from camera data
-			floormap = self.cameraData.get()
-
-			# Set up dictionary to store LEDs and their new power states for each local controller
-			controllersLEDs = dict()
-
-			# Look at all intersections
-			for intersection in self.intersections:
-				# Start with an empty list
-				controllersLEDs[intersection.local_controller] = []
-
-				# Enqueue people waiting at entry lane intersections to get into the intersection if not already in queue
-				for entryLaneIntersection in intersection.entry_lane_intersections:
-					if floormap[entryLaneIntersection.coord.x, entryLaneIntersection.coord.y] == 5:
-						if entryLaneIntersection not in intersection.queue.queue:
-							intersection.queue.put(entryLaneIntersection)
- 
-				# Check if there is anyone in the intersection and deal with it accordingly
-				if intersection.is_occupied(floormap):
-					# Turn on all LEDs of entry lane intersections to prevent exit
-					for entryLaneIntersection in intersection.entry_lane_intersections:
-						controllersLEDs[intersection.local_controller].append((entryLaneIntersection.LED, True))
-
-					# Turn on all LEDs of exit lane intersections that are blocked, turn off otherwise
-					for exitLaneIntersection in intersection.exit_lane_intersections:
-						powerState = floormap[exitLaneIntersection.coord.x, exitLaneIntersection.coord.y] == 5
-						controllersLEDs[intersection.local_controller].append((exitLaneIntersection.LED, powerState))
-				else:
-					# Turn on all LEDs of exit lane intersections to prevent entry
-					for exitLaneIntersection in intersection.exit_lane_intersections:
-						controllersLEDs[intersection.local_controller].append((exitLaneIntersection.LED, True))
-
-					# Dequeue intersection queue to determine which person can enter the intersection, if any
-					if intersection.queue.empty():
-						# Turn off all LEDs of entry lane intersections if the queue is empty
-						for entryLaneIntersection in intersection.entry_lane_intersections:
-							controllersLEDs[intersection.local_controller].append((entryLaneIntersection.LED, False))
-					else:
-						# Turn off LED of entry lane intersection for dequeued person, turn on LED for other entry lane intersections
-						dequeuedEntryLaneIntersection = intersection.queue.get()
-						for entryLaneIntersection in intersection.entry_lane_intersections:
-							powerState = entryLaneIntersection != dequeuedEntryLaneIntersection
-							controllersLEDs[intersection.local_controller].append((entryLaneIntersection.LED, powerState))
-
-			# List of all LEDs, initialize as empty
-			LEDs = []
-
-			# Local controller turns on or off LEDs accordingly
-			for localController in controllersLEDs:
-				localLEDs = [i[0] for i in controllersLEDs[localController]]
-				localPowerStates = [i[1] for i in controllersLEDs[localController]]
-				localController.power_LEDs(localLEDs, localPowerStates)
-
-				# Add list of local LEDs to list of all LEDs after their states have been updated
-				LEDs += localLEDs
-
-			# Enqueue mainControllerData, which consists of the new LEDs
-			self.mainControllerData.put(LEDs.copy())
+			if self.timer is not None:
+				self.timer.startTick()
+
+			# Get floormap and requests from camera data, enqueue mainControllerData, which consists of the changes of LED states
+			message = self.cameraData.get()
+
+			# Forward the timings sent by the camera along with those of the main controller
+			if isinstance(message, list):
+				self.mainControllerData.put(message if self.timer is None else message + [self.timer.getTimings()])
+				continue
+
+			if self.shardCells is None:
+				floormap, requests = message
+			else:
+				values, requests = message
+				floormap.ravel()[self.shardCells] = values
+			if self.timer is not None:
+				self.timer.mark('receive')
+			putRecord(self.mainControllerData, self(floormap, requests))
+			if self.timer is not None:
+				self.timer.mark('send')
@@ -0,0 +1,48 @@
+from util import *
+from multiprocessing import Queue
+from camera import Camera
+from main_controller import MainController
+from instrumentation import TickTimer
+from transport import putRecord
+
+# Pipelines take the list of people coordinates of a tick and return the changes of LED states decided by the main controller
+# for it, as (LED ID, is_on) records of the LEDs of topology.LEDBounds that turned on or off. LEDs start off. Simulators of
+# concurrent controllers also give them the (cell, exit lane ID) of every person at or in an intersection. Sharded main
+# controllers each decide the LEDs of their own intersections, their changes are merged into those of a single controller.
+
+class QueuePipeline():
+	def __init__(self, simulatorData: Queue, mainControllerData: Union[Queue, List[Queue]]):
+		self.simulatorData = simulatorData
+		self.mainControllerData = mainControllerData
+
+	def __call__(self, listOfCoords: List[Coord], requests: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, bool]]:
+		# Enqueue simulator data (list of coordinates and requests) and wait for the Camera and MainController processes
+		putRecord(self.simulatorData, (listOfCoords, requests))
+		if isinstance(self.mainControllerData, list):
+			return [changedLED for mainControllerData in self.mainControllerData for changedLED in mainControllerData.get()]
+		return self.mainControllerData.get()
+
+	def getTimings(self) -> List[Tuple[str, List]]:
+		# Ask the Camera and MainController processes for the timings they recorded, if they were given a timer
+		self.simulatorData.put(None)
+		if isinstance(self.mainControllerData, list):
+			return [timings for mainControllerData in self.mainControllerData for timings in mainControllerData.get()]
+		return self.mainControllerData.get()
+
+
+class SyncPipeline():
+	def __init__(self, floormap: np.ndarray, timed: bool = False, vectorizedController: bool = False, policy: str = "fifo", concurrent: bool = False):
+		# Camera and MainController are never started, they are called in this process instead
+		self.camera = Camera(floormap, None, None, TickTimer('camera') if timed else None)
+		self.mainController = MainController(None, None, TickTimer('mainController') if timed else None, vectorized=vectorizedController, policy=policy, concurrent=concurrent)
+
+	def __call__(self, listOfCoords: List[Coord], requests: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, bool]]:
+		if self.camera.timer is not None:
+			self.camera.timer.startTick()
+		floormap = self.camera(listOfCoords)
+		if self.mainController.timer is not None:
+			self.mainController.timer.startTick()
+		return self.mainController(floormap, requests)
+
+	def getTimings(self) -> List[Tuple[str, List]]:
+		return [component.timer.getTimings() for component in [self.camera, self.mainController] if component.timer is not None]
@@ -0,0 +1,196 @@
+from util import *
+from collections import Counter
+import pygame
+
+class Renderer():
+	def __init__(self, floormap: np.ndarray, dirtyRects: bool=True):
+		self.emptyFloormap = floormap.copy()
+		self.dirtyRects = dirtyRects
+
+		# Initialize pygame
+		pygame.init()
+
+		# Define colors
+		self.black  = (0x00, 0x00, 0x00)
+		self.white  = (0xDD, 0xDD, 0xDD)
+		self.grey   = (0x33, 0x33, 0x33)
+		self.red    = (0xFF, 0x00, 0x00)
+		self.green  = (0x00, 0xFF, 0x00)
+		self.pink   = (0xFF, 0x77, 0x77)
+		self.purple = (0xDD, 0xAF, 0xFF)
+		self.blue   = (0x77, 0x77, 0xFF)
+		self.cyan   = (0x77, 0xFF, 0xFF)
+		self.yellow = (0xFF, 0xF8, 0x60)
+		self.floormapColors = [self.white, self.pink, self.purple, self.cyan, self.blue, self.yellow]
+
+		# Define block dimensions and margins
+		self.blockWidth = 20
+		self.blockHeight = 20
+		self.blockMargin = 3
+
+		# Define point dimensions
+		self.pointRadius = 7
+
+		# Set the dimensions of the screen
+		screenWidth = (self.blockMargin + self.blockWidth) * self.emptyFloormap.shape[0] + self.blockMargin
+		screenHeight = (self.blockMargin + self.blockHeight) * (self.emptyFloormap.shape[1] + 1) + self.blockMargin
+		self.screen = pygame.display.set_mode([screenWidth, screenHeight])
+
+		# Fonts and rendered texts are cached, keyed by (size, bold) and (text, size, color, bold)
+		self.fonts = dict()
+		self.texts = dict()
+		self.textsLim = 1024
+
+		# Pre-render the static floormap layout once, every frame starts by blitting it
+		self.background = self.renderBackground()
+
+		# Sprites, LED states, statistics and the regions they were drawn in on the last frame, to only redraw what changed
+		self.statsRect = pygame.Rect(0, 0, screenWidth, 2 * self.blockMargin + self.blockHeight)
+		self.invalidate()
+
+	def getPygameCoords(self, x: int, y: int) -> "Coord":
+		return Coord((self.blockMargin + self.blockWidth) * x + self.blockMargin + (self.blockWidth / 2),
+			    	 (self.blockMargin + self.blockHeight) * (y + 1) + self.blockMargin + (self.blockHeight / 2))
+
+	def drawBlock(self, color: Tuple[int], x: int, y: int):
+		pygameCoords = self.getPygameCoords(x, y)
+		blockLocation = (pygameCoords.x - (self.blockWidth / 2),
+    					 pygameCoords.y - (self.blockHeight / 2),
+    					 self.blockWidth,
+    					 self.blockHeight)
+		pygame.draw.rect(self.screen, color, blockLocation)
+
+	def drawPerson(self, color: Tuple[int], x: int, y: int, dstLocID: int) -> pygame.Rect:
+		personLocation = self.getPygameCoords(x, y)
+		rect = pygame.draw.circle(self.screen, color, personLocation, self.pointRadius)
+		return rect.union(self.drawText("%d" % dstLocID, 10, self.white, x, y))
+
+	def drawLED(self, color: Tuple[int], coordBounds: Tuple["Coords"], is_vertical: bool) -> pygame.Rect:
+		pygameCoords1 = self.getPygameCoords(coordBounds[0].x, coordBounds[0].y)
+		pygameCoords2 = self.getPygameCoords(coordBounds[1].x, coordBounds[1].y)
+		midpoint = Coord((pygameCoords1.x + pygameCoords2.x) / 2, (pygameCoords1.y + pygameCoords2.y) / 2)
+		LEDLocation = [(midpoint.x, midpoint.y - (self.blockHeight / 2)), (midpoint.x, midpoint.y + (self.blockHeight / 2))] if is_vertical else \
+					  [(midpoint.x - (self.blockWidth / 2), midpoint.y), (midpoint.x + (self.blockWidth / 2), midpoint.y)]
+		return pygame.draw.lines(self.screen, color, False, LEDLocation, self.blockMargin)
+
+	def getFont(self, size: int, bold: bool=False) -> pygame.font.Font:
+		if (size, bold) not in self.fonts:
+			self.fonts[(size, bold)] = pygame.font.SysFont('arial', size, bold=bold)
+		return self.fonts[(size, bold)]
+
+	def renderText(self, text: str, size: int, color: Tuple[int], bold: bool=False) -> pygame.Surface:
+		key = (text, size, color, bold)
+		if key not in self.texts:
+			# Statistics texts change every tick, so drop the cache once it grows too large
+			if len(self.texts) >= self.textsLim:
+				self.texts.clear()
+			self.texts[key] = self.getFont(size, bold).render(text, True, color)
+		return self.texts[key]
+
+	def drawText(self, text: str, size: int, color: Tuple[int], x: int, y: int, bold: bool=False, anchor: str='center') -> pygame.Rect:
+		text = self.renderText(text, size, color, bold)
+		rect = text.get_rect()
+		center = self.getPygameCoords(x, y)
+		if anchor == 'center':
+			rect.center = center
+		elif anchor == 'left':
+			rect.center = (center.x + (rect.width / 2), center.y)
+		elif anchor == 'right':
+			rect.center = (center.x - (rect.width / 2), center.y)
+		return self.screen.blit(text, rect)
+
+	def renderBackground(self) -> pygame.Surface:
+		# Draw the static layout onto the screen, then keep a copy of it
+		# Set the screen background to black
+		self.screen.fill(self.black)
+
+		# Draw the empty floormap
+		for x, y in np.ndindex(self.emptyFloormap.shape):
+			color = self.floormapColors[self.emptyFloormap[x, y] + 1]
+			self.drawBlock(color, x, y)
+
+		# Draw dstLoc texts
+		for i in range(1, len(Location.locCoords) + 1):
+			dstCoord = Location.getCoords(i)[1]
+			self.drawText("%d" % i, 15, self.grey, dstCoord.x, dstCoord.y, bold=True)
+
+		return self.screen.copy()
+
+	def invalidate(self):
+		# Force the next frame to be fully redrawn
+		self.sprites = None
+		self.spriteRects = dict()
+		self.LEDStates = dict()
+		self.LEDRects = dict()
+		self.stats = None
+
+	def drawStats(self, stats: Tuple[int]):
+		# Display people statistics
+		peopleCount, peopleEntered, peopleExited = stats
+		self.drawText("People Count: %d" % peopleCount, 17, self.white, 0, -1, bold=True, anchor='left')
+		self.drawText("People Entered: %d" % peopleEntered, 17, self.white, (self.emptyFloormap.shape[0] - 1) / 2, -1, bold=True, anchor='center')
+		self.drawText("People Exited: %d" % peopleExited, 17, self.white, self.emptyFloormap.shape[0] - 1, -1, bold=True, anchor='right')
+
+	def drawLEDState(self, coordBounds: Tuple[Coord], is_on: bool):
+		color = self.red if is_on else self.green
+		self.LEDRects[coordBounds] = self.drawLED(color, coordBounds, abs(coordBounds[0].x - coordBounds[1].x) == 1)
+		self.LEDStates[coordBounds] = is_on
+
+	def drawSprite(self, sprite: Tuple[float, float, int]):
+		x, y, dstLocID = sprite
+		self.spriteRects[sprite] = self.drawPerson(self.grey, x, y, dstLocID)
+
+	def drawFrame(self, people: List[Tuple[float, float, int]], LEDs: List[Tuple[Tuple[Coord], bool]], peopleCount: int, peopleEntered: int, peopleExited: int) -> List[pygame.Rect]:
+		# people are (x, y, dstLocID) and LEDs are (coordBounds, is_on)
+		# Returns the regions of the screen that changed, to be passed to pygame.display.update
+		stats = (peopleCount, peopleEntered, peopleExited)
+		sprites = Counter(people)
+
+		if not self.dirtyRects or self.sprites is None:
+			# Draw the pre-rendered floormap, then everything on top of it
+			self.screen.blit(self.background, (0, 0))
+			self.drawStats(stats)
+			for coordBounds, is_on in LEDs:
+				self.drawLEDState(coordBounds, is_on)
+			self.spriteRects = dict()
+			for sprite in sprites:
+				self.drawSprite(sprite)
+
+			self.sprites = sprites
+			self.stats = stats
+			return [self.screen.get_rect()]
+
+		# Erase people that moved or left, toggled LEDs and the statistics row if they changed by restoring the background
+		dirtyRects = [self.spriteRects.pop(sprite) for sprite in self.sprites - sprites if sprite not in sprites]
+		toggledLEDs = set(coordBounds for coordBounds, is_on in LEDs if self.LEDStates.get(coordBounds) != is_on)
+		dirtyRects += [self.LEDRects[coordBounds] for coordBounds in toggledLEDs if coordBounds in self.LEDRects]
+		if stats != self.stats:
+			dirtyRects.append(self.statsRect)
+
+		for rect in dirtyRects:
+			self.screen.blit(self.background, rect, rect)
+
+		# Redraw whatever was erased, in the same order as a full redraw
+		if stats != self.stats:
+			self.drawStats(stats)
+
+		for coordBounds, is_on in LEDs:
+			if coordBounds in toggledLEDs or coordBounds not in self.LEDRects or self.LEDRects[coordBounds].collidelist(dirtyRects) != -1:
+				self.drawLEDState(coordBounds, is_on)
+				dirtyRects.append(self.LEDRects[coordBounds])
+
+		for sprite in sprites:
+			if sprite not in self.spriteRects:
+				self.drawSprite(sprite)
+				dirtyRects.append(self.spriteRects[sprite])
+			elif self.spriteRects[sprite].collidelist(dirtyRects) != -1:
+				self.drawSprite(sprite)
+
+		self.sprites = sprites
+		self.stats = stats
+		return dirtyRects
+
+	@staticmethod
+	def interpolate(oldCoord: Coord, newCoord: Coord, animationLoop: int, animationLoops: int=20) -> Tuple[float, float]:
+		return (oldCoord.x + ((newCoord.x - oldCoord.x) * animationLoop / animationLoops),
+				oldCoord.y + ((newCoord.y - oldCoord.y) * animationLoop / animationLoops))
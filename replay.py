@@ -0,0 +1,123 @@
+import argparse
+import os
+from util import *
+from simulation_trace import TraceReader
+from travel_time import TravelTime
+
+def analyze(trace: TraceReader) -> dict:
+	# Rebuild the averaged travel times of a run from its spawns and exits
+	locIDs = dict()
+	results = dict()
+	steps = 0
+	for traceStep in trace:
+		steps += 1
+		for personID, srcLocID, dstLocID in traceStep.spawns:
+			locIDs[personID] = (srcLocID, dstLocID)
+		for personID, iterations in traceStep.exits:
+			srcLocID, dstLocID = locIDs.pop(personID)
+			results.setdefault((Location.getCoords(srcLocID)[0], Location.getCoords(dstLocID)[1]), []).append(int(iterations))
+
+	for path, travelTimes in sorted(results.items()):
+		print("[INFO] {} -> {}: {:.2f} ({} people)".format(tuple(path[0]), tuple(path[1]), sum(travelTimes) / len(travelTimes), len(travelTimes)))
+	print("[INFO] Steps: {}, people still inside at the end: {}".format(steps, len(locIDs)))
+
+	results = {path: sum(travelTimes) / len(travelTimes) for path, travelTimes in results.items()}
+	if results:
+		print("[INFO] Response time: {:.2f}".format(TravelTime.getResponseTime(results, TravelTime.getIdealTravelTimes())))
+	return results
+
+def snapshot(trace: TraceReader, step: int):
+	trace.seek(step)
+	traceStep = trace.readStep()
+	print("[INFO] Step {}, {} people advanced".format(traceStep.step, traceStep.numAdvanced))
+	print("[INFO] LEDs on: {}".format([trace.LEDBounds[i] for i in np.flatnonzero(traceStep.LEDStates)]))
+	for personID, x, y in traceStep.people:
+		print("[INFO] Person {} at {}".format(personID, (int(x), int(y))))
+	print("[INFO] Spawned: {}".format(traceStep.spawns['id'].tolist()))
+	print("[INFO] Exited: {}".format(traceStep.exits['id'].tolist()))
+
+def getTicks(trace: TraceReader, start: int, end: Optional[int]):
+	# Yield the people (prevCoord, coord, dstLocID, isNew), LED states and statistics of every step to render
+	dstLocIDs = dict()
+	coords = dict()
+	peopleEntered = 0
+	peopleExited = 0
+	for traceStep in trace:
+		if end is not None and traceStep.step >= end:
+			break
+
+		for personID, srcLocID, dstLocID in traceStep.spawns:
+			dstLocIDs[personID] = dstLocID
+		peopleEntered += len(traceStep.spawns)
+		peopleExited += len(traceStep.exits)
+		prevCoords = coords
+		coords = {personID: Coord(int(x), int(y)) for personID, x, y in traceStep.people}
+
+		# Fast forward to the first step to render, and skip steps where nobody moved like the simulator does
+		if traceStep.step < start or traceStep.numAdvanced == 0:
+			continue
+
+		newPeople = set(traceStep.spawns['id'].tolist())
+		people = [(prevCoords.get(personID, coord), coord, int(dstLocIDs[personID]), personID in newPeople) for personID, coord in coords.items()]
+		yield people, list(zip(trace.LEDBounds, traceStep.LEDStates.tolist())), len(coords), peopleEntered, peopleExited
+
+def getSprites(people: List[Tuple[Coord, Coord, int, bool]], animationLoop: int, animationLoops: int=20) -> List[Tuple[float, float, int]]:
+	# Draw all previously existing people, and new people in last iteration
+	from renderer import Renderer
+	sprites = []
+	for prevCoord, coord, dstLocID, isNew in people:
+		if not isNew:
+			sprites.append(Renderer.interpolate(prevCoord, coord, animationLoop, animationLoops) + (dstLocID,))
+		elif animationLoop == animationLoops:
+			sprites.append((coord.x, coord.y, dstLocID))
+	return sprites
+
+def render(trace: TraceReader, floormap: np.ndarray, start: int, end: Optional[int]):
+	import pygame
+	from renderer import Renderer
+
+	renderer = Renderer(floormap)
+	clock = pygame.time.Clock()
+
+	for people, LEDStates, peopleCount, peopleEntered, peopleExited in getTicks(trace, start, end):
+		for event in pygame.event.get():
+			if event.type == pygame.QUIT:
+				pygame.quit()
+				os._exit(1)
+
+		for animationLoop in range(1, 21):
+			dirtyRects = renderer.drawFrame(getSprites(people, animationLoop), LEDStates, peopleCount, peopleEntered, peopleExited)
+
+			clock.tick(100)
+			pygame.display.update(dirtyRects)
+
+	pygame.quit()
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("trace", help="Path to a trace recorded with main.py --trace", type=str)
+	parser.add_argument("--step", help="Print the state of the run at this step", type=int, default=None)
+	parser.add_argument("--render", help="Re-render the run in a pygame window", action='store_true')
+	parser.add_argument("--start", help="First step to render", type=int, default=0)
+	parser.add_argument("--end", help="Step to stop rendering at", type=int, default=None)
+	parser.add_argument("--layout", help="Path to a layout file, defaults to layouts/mte380.json", type=str, default=None)
+	args = parser.parse_args()
+	if args.layout is not None:
+		useLayout(Layout.load(args.layout))
+
+	with TraceReader(args.trace) as trace:
+		try:
+			if args.step is not None:
+				trace.checkSteps(args.step)
+			elif args.render:
+				trace.checkSteps(args.start, args.end)
+		except IndexError as e:
+			parser.error(str(e))
+
+		if args.step is not None:
+			snapshot(trace, args.step)
+		elif args.render:
+			from main import getFloormap
+			render(trace, getFloormap(), args.start, args.end)
+		else:
+			analyze(trace)
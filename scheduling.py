@@ -0,0 +1,112 @@
+from util import *
+
+# Scheduling policies decide which person waiting at an entry lane intersection of an intersection is let in next. Every
+# intersection has its own policy, which refers to its entry lane intersections by their index in
+# Intersection.getLaneIntersections(interID)[0]. Policies also keep the number of people they let in and the number of ticks
+# each of them waited, from the tick they were first seen at the entry lane intersection to the tick they were let in.
+
+class SchedulingPolicy():
+	name = None
+	# Policies that look at the number of people on every lane are given them, the others are given None
+	usesLanes = False
+
+	def __init__(self, interID: int):
+		self.interID = interID
+		entryLaneIntersections, exitLaneIntersections = Intersection.getLaneIntersections(interID)
+		self.entryLaneIDs = [laneIntersection.lane.laneID for laneIntersection in entryLaneIntersections]
+		self.exitLaneIDs = [laneIntersection.lane.laneID for laneIntersection in exitLaneIntersections]
+
+		# Tick every waiting entry lane intersection was enqueued on, in the order they were enqueued
+		self.waitingSince = dict()
+		self.admissions = 0
+		self.waits = []
+
+	def enqueue(self, entry: int, tick: int):
+		if entry not in self.waitingSince:
+			self.waitingSince[entry] = tick
+
+	def isEmpty(self) -> bool:
+		return not self.waitingSince
+
+	def admit(self, tick: int, laneCounts: Optional[List[int]], candidates: Optional[List[int]]=None) -> int:
+		# Let in one of the waiting entry lane intersections, or of the candidates among them, which must not be empty
+		entry = self.choose(list(self.waitingSince) if candidates is None else candidates, laneCounts)
+		self.waits.append(tick - self.waitingSince.pop(entry))
+		self.admissions += 1
+		return entry
+
+	def choose(self, candidates: List[int], laneCounts: Optional[List[int]]) -> int:
+		# Candidates are in the order they were enqueued, policies let in the first of them unless they decide otherwise
+		return candidates[0]
+
+	def getStats(self, ticks: int) -> dict:
+		# People let in per tick and their waits in ticks
+		return {"admissions": self.admissions, "throughput": self.admissions / ticks if ticks else 0.0,
+				"meanWait": float(np.mean(self.waits)) if self.waits else 0.0,
+				"p95Wait": float(np.percentile(self.waits, 95)) if self.waits else 0.0,
+				"maxWait": max(self.waits, default=0)}
+
+
+class FifoPolicy(SchedulingPolicy):
+	# First in, first out, entry lane intersections enqueued on the same tick in index order
+	name = "fifo"
+
+
+class DirectionBatchPolicy(SchedulingPolicy):
+	# Keeps letting in people coming from the same direction while there are any, up to maxBatch in a row, then serves the
+	# first in the queue. Otherwise first in, first out
+	name = "batch"
+	maxBatch = 4
+
+	def __init__(self, interID: int):
+		SchedulingPolicy.__init__(self, interID)
+		entryLaneIntersections, exitLaneIntersections = Intersection.getLaneIntersections(interID)
+		self.directions = [(intersectionCoord.x - laneCoord.x, intersectionCoord.y - laneCoord.y) for laneCoord, intersectionCoord in (laneIntersection.LED.coordBounds for laneIntersection in entryLaneIntersections)]
+		self.direction = None
+		self.batchSize = 0
+
+	def choose(self, candidates: List[int], laneCounts: Optional[List[int]]) -> int:
+		if self.batchSize < self.maxBatch:
+			for entry in candidates:
+				if self.directions[entry] == self.direction:
+					self.batchSize += 1
+					return entry
+
+		entry = candidates[0]
+		self.direction = self.directions[entry]
+		self.batchSize = 1
+		return entry
+
+
+class LongestQueuePolicy(SchedulingPolicy):
+	# Lets in the person at the end of the lane with the most people on it, the first in the queue on ties
+	name = "longest-queue"
+	usesLanes = True
+
+	def choose(self, candidates: List[int], laneCounts: Optional[List[int]]) -> int:
+		return max(candidates, key=lambda entry: laneCounts[self.entryLaneIDs[entry]])
+
+
+class MaxPressurePolicy(SchedulingPolicy):
+	# Lets in the person at the end of the lane with the highest pressure, the number of people on it minus the mean number of
+	# people on the lanes it leads to through the intersection, the first in the queue on ties. Where people go is not known
+	# to the controller, so every lane transition out of a lane is weighted the same
+	name = "max-pressure"
+	usesLanes = True
+
+	def __init__(self, interID: int):
+		SchedulingPolicy.__init__(self, interID)
+		self.downstreamLaneIDs = []
+		for laneID in self.entryLaneIDs:
+			downstreamLaneIDs = [dstLaneID for dstLaneID in self.exitLaneIDs if (laneID, dstLaneID) in LaneTransition.laneTransitionPaths]
+			self.downstreamLaneIDs.append(downstreamLaneIDs if downstreamLaneIDs else self.exitLaneIDs)
+
+	def choose(self, candidates: List[int], laneCounts: Optional[List[int]]) -> int:
+		def pressure(entry: int) -> float:
+			downstreamLaneIDs = self.downstreamLaneIDs[entry]
+			return laneCounts[self.entryLaneIDs[entry]] - sum(laneCounts[laneID] for laneID in downstreamLaneIDs) / max(len(downstreamLaneIDs), 1)
+		return max(candidates, key=pressure)
+
+
+# Policies by name, as given to MainController and on the command line
+policies = {policy.name: policy for policy in [FifoPolicy, DirectionBatchPolicy, LongestQueuePolicy, MaxPressurePolicy]}
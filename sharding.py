@@ -0,0 +1,29 @@
+from util import *
+from scheduling import policies
+
+# Sharded main controllers split the intersections into groups of neighbouring intersections, one MainController process per
+# group. The camera sends every controller only the cells its intersections read, and the changes of LED states of all of them
+# are merged into those of a single controller, as every LED belongs to the lane intersection of a single intersection. With a
+# core per process, the time of a controller tick stays flat as layouts grow.
+
+def partitionIntersections(numShards: int) -> List[List[int]]:
+	# Groups of about the same number of intersections, in strips ordered by the first cell of every intersection
+	interIDs = sorted(range(len(topology.intersectionCells)), key=lambda interID: topology.decode(topology.intersectionCells[interID][0]))
+	return [sorted(group.tolist()) for group in np.array_split(np.array(interIDs, dtype=np.int64), numShards) if len(group)]
+
+def getShardCells(interIDs: List[int], policy: str = "fifo") -> np.ndarray:
+	# Cells of the intersections and of their entry and exit lane intersections, and of the lanes around them for policies that
+	# look at the number of people on every lane
+	cells = set()
+	laneIDs = set()
+	for interID in interIDs:
+		cells.update(topology.intersectionCells[interID] + topology.entryLaneCells[interID] + topology.exitLaneCells[interID])
+		entryLaneIntersections, exitLaneIntersections = Intersection.getLaneIntersections(interID)
+		laneIDs.update(laneIntersection.lane.laneID for laneIntersection in entryLaneIntersections + exitLaneIntersections)
+	if policies[policy].usesLanes:
+		cells.update(np.flatnonzero(np.isin(topology.laneIDs, sorted(laneIDs))).tolist())
+	return np.array(sorted(cells), dtype=np.int64)
+
+def createShards(numShards: int, policy: str = "fifo") -> List[Tuple[List[int], np.ndarray]]:
+	# Intersection IDs and cells of every shard
+	return [(interIDs, getShardCells(interIDs, policy)) for interIDs in partitionIntersections(numShards)]
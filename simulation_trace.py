@@ -0,0 +1,140 @@
+from util import *
+import struct
+from collections import namedtuple
+
+# Binary trace of a simulation run. The header holds the floormap dimensions, the number of LEDs, flags, the seed, the maximum
+# number of people and the coordBounds of every LED. The seed is only meaningful if the HAS_SEED flag is set. Every simulator
+# step is then stored as a fixed size record header followed by the LED states as a bitset and packed arrays of people
+# positions (after the step), spawns and exits. Values that do not fit their field are rejected when writing.
+
+TRACE_MAGIC = b'MTETRACE'
+TRACE_VERSION = 2
+
+# Flags of the header
+HAS_SEED = 1
+
+headerStruct = struct.Struct('<8sHHHIIqI')
+stepStruct = struct.Struct('<IIIHH')
+peopleDtype = np.dtype([('id', '<u4'), ('x', '<i2'), ('y', '<i2')])
+spawnsDtype = np.dtype([('id', '<u4'), ('srcLocID', '<u2'), ('dstLocID', '<u2')])
+exitsDtype = np.dtype([('id', '<u4'), ('iterations', '<u4')])
+
+TraceStep = namedtuple('TraceStep', ['step', 'numAdvanced', 'LEDStates', 'people', 'spawns', 'exits'])
+
+class TraceWriter():
+	def __init__(self, path: str, floormap: np.ndarray, LEDBounds: List[Tuple[Coord]], seed: Optional[int], maxPeople: int):
+		self.file = open(path, 'wb')
+		self.numLEDs = len(LEDBounds)
+		self.step = 0
+
+		xLim, yLim = floormap.shape
+		coordLim = np.iinfo(np.int16).max
+		if max(xLim, yLim) > coordLim:
+			raise ValueError("Floormaps of a trace are at most {} cells wide, got {}x{}".format(coordLim, xLim, yLim))
+		if len(Location.locCoords) > np.iinfo(np.uint16).max:
+			raise ValueError("Traces hold at most {} locations, got {}".format(np.iinfo(np.uint16).max, len(Location.locCoords)))
+		self.file.write(headerStruct.pack(TRACE_MAGIC, TRACE_VERSION, xLim, yLim, 0 if seed is None else HAS_SEED, len(LEDBounds), 0 if seed is None else seed, maxPeople))
+		self.file.write(np.array([[srcCoord.x, srcCoord.y, dstCoord.x, dstCoord.y] for srcCoord, dstCoord in LEDBounds], dtype='<i2').tobytes())
+
+	def __enter__(self) -> "TraceWriter":
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self.file.close()
+
+	def writeStep(self, numAdvanced: int, LEDStates: List[bool], people: np.ndarray, spawns: np.ndarray, exits: np.ndarray):
+		# LEDStates are in the order of the LEDBounds of the trace
+		if len(LEDStates) != self.numLEDs:
+			raise ValueError("Expected the states of {} LEDs, got {}".format(self.numLEDs, len(LEDStates)))
+		if max(len(spawns), len(exits)) > np.iinfo(np.uint16).max:
+			raise ValueError("Steps of a trace hold at most {} spawns and exits, got {} and {}".format(np.iinfo(np.uint16).max, len(spawns), len(exits)))
+
+		self.file.write(stepStruct.pack(self.step, numAdvanced, len(people), len(spawns), len(exits)))
+		self.file.write(np.packbits(np.asarray(LEDStates, dtype=bool)).tobytes())
+		self.file.write(people.astype(peopleDtype, copy=False).tobytes())
+		self.file.write(spawns.astype(spawnsDtype, copy=False).tobytes())
+		self.file.write(exits.astype(exitsDtype, copy=False).tobytes())
+		self.step += 1
+
+
+class TraceReader():
+	def __init__(self, path: str):
+		self.file = open(path, 'rb')
+
+		magic, version, self.xLim, self.yLim, flags, numLEDs, seed, self.maxPeople = headerStruct.unpack(self.file.read(headerStruct.size))
+		if magic != TRACE_MAGIC:
+			raise ValueError("{} is not a simulation trace".format(path))
+		if version != TRACE_VERSION:
+			raise ValueError("Unsupported trace version {}".format(version))
+
+		self.seed = seed if flags & HAS_SEED else None
+		bounds = np.frombuffer(self.file.read(numLEDs * 4 * 2), dtype='<i2').reshape(numLEDs, 4)
+		self.LEDBounds = [(Coord(int(x1), int(y1)), Coord(int(x2), int(y2))) for x1, y1, x2, y2 in bounds]
+		self.LEDBytes = (numLEDs + 7) // 8
+		self.stepsOffset = self.file.tell()
+		self.stepOffsets = None
+
+	def __enter__(self) -> "TraceReader":
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self.file.close()
+
+	def readStep(self) -> Optional[TraceStep]:
+		header = self.file.read(stepStruct.size)
+		if len(header) < stepStruct.size:
+			return None
+
+		step, numAdvanced, numPeople, numSpawns, numExits = stepStruct.unpack(header)
+		LEDStates = np.unpackbits(np.frombuffer(self.file.read(self.LEDBytes), dtype=np.uint8))[:len(self.LEDBounds)].astype(bool)
+		people = np.frombuffer(self.file.read(numPeople * peopleDtype.itemsize), dtype=peopleDtype)
+		spawns = np.frombuffer(self.file.read(numSpawns * spawnsDtype.itemsize), dtype=spawnsDtype)
+		exits = np.frombuffer(self.file.read(numExits * exitsDtype.itemsize), dtype=exitsDtype)
+		return TraceStep(step, numAdvanced, LEDStates, people, spawns, exits)
+
+	def __iter__(self):
+		self.file.seek(self.stepsOffset)
+		while True:
+			traceStep = self.readStep()
+			if traceStep is None:
+				return
+			yield traceStep
+
+	def indexSteps(self):
+		# Index the offsets of all steps once by only reading their record headers
+		if self.stepOffsets is None:
+			self.stepOffsets = []
+			offset = self.stepsOffset
+			self.file.seek(offset)
+			while True:
+				header = self.file.read(stepStruct.size)
+				if len(header) < stepStruct.size:
+					break
+				_, _, numPeople, numSpawns, numExits = stepStruct.unpack(header)
+				self.stepOffsets.append(offset)
+				offset += stepStruct.size + self.LEDBytes + numPeople * peopleDtype.itemsize + numSpawns * spawnsDtype.itemsize + numExits * exitsDtype.itemsize
+				self.file.seek(offset)
+
+	def checkSteps(self, start: int, end: Optional[int] = None):
+		# Steps from start, up to end if given, must be steps of the trace
+		numSteps = len(self)
+		if 0 <= start < numSteps and (end is None or start < end <= numSteps):
+			return
+		if not numSteps:
+			raise IndexError("The trace has no steps")
+		steps = "Step {} is".format(start) if end is None else "Steps {} to {} are".format(start, end)
+		raise IndexError("{} out of the steps 0 to {} of the trace".format(steps, numSteps - 1))
+
+	def seek(self, step: int):
+		self.checkSteps(step)
+		self.file.seek(self.stepOffsets[step])
+
+	def __len__(self) -> int:
+		self.indexSteps()
+		return len(self.stepOffsets)
@@ -1,241 +1,461 @@
-from typing import List
+from typing import List, Callable
 from util import *
 from multiprocessing import Process, Queue
+from pipeline import QueuePipeline
+from crowd import Crowd
+from renderer import Renderer
+from simulation_trace import TraceWriter, peopleDtype, spawnsDtype, exitsDtype
+from instrumentation import TickTimer, exportTimings
 import numpy as np
 import random
+from collections import Counter, namedtuple
 import pygame
 import os
+import threading
+import time
+
+# State of the last tick in which somebody advanced, as published by the backend for the frontend.
+# people are (prevCoord, coord, dstLocID, isNew) and LEDStates are (coordBounds, is_on)
+Frame = namedtuple('Frame', ['tick', 'people', 'LEDStates', 'peopleCount', 'peopleEntered', 'peopleExited', 'time'])
 
 class Simulator:
-	def __init__(self, floormap: np.ndarray, mainControllerData: Queue, simulatorData: Queue, travelTimeData: Queue, debug: Optional[bool] = False):
+	def __init__(self, floormap: np.ndarray, mainControllerData: Queue, simulatorData: Queue, travelTimeData: Queue, debug: Optional[bool] = False, headless: Optional[bool] = False, pipeline: Optional[Callable] = None, vectorized: Optional[bool] = False, seed: Optional[int] = None, fps: int = 100, tickRate: float = 5, concurrent: bool = False):
 		self.emptyFloormap = floormap.copy()
 		self.mainControllerData = mainControllerData
 		self.simulatorData = simulatorData
 		self.travelTimeData = travelTimeData
 		self.debug = debug
+		self.headless = headless
+
+		# Seeded simulators use their own random number generator, reseeded at the start of every run
+		self.seed = seed
+		self.random = random.Random(seed)
+
+		# Default to exchanging data with the Camera and MainController processes through queues
+		self.pipeline = pipeline if pipeline is not None else QueuePipeline(simulatorData, mainControllerData)
 
 		self.people = []
 		self.peopleEntered = 0
 		self.peopleExited = 0
 
+		# Number of people on each coord, kept up to date as people advance, spawn and exit
+		self.occupancy = Counter()
+
+		# State of every LED of topology.LEDBounds, kept up to date with the changes sent by the main controller, which keeps its
+		# state across runs
+		self.LEDStates = [False] * len(topology.LEDBounds)
+
+		# Locations people spawn at and the locations they can go to from there. A srcLoc inside an intersection needs the whole
+		# intersection to be free
+		self.srcLocIDs = sorted(set(srcLocID for srcLocID, dstLocID in routes.pairs))
+		self.dstLocIDs = {srcLocID: [dstLocID for pairSrcLocID, dstLocID in routes.pairs if pairSrcLocID == srcLocID] for srcLocID in self.srcLocIDs}
+		self.spawnCoords = dict()
+		for srcLocID in self.srcLocIDs:
+			srcCoord = Location.getCoords(srcLocID)[0]
+			intersectionID = Intersection.getIntersectionId(srcCoord)
+			self.spawnCoords[srcLocID] = [srcCoord] + ([] if intersectionID == -1 else sorted(Intersection.getCoords(intersectionID) - {srcCoord}))
+
+		# Vectorized simulators keep people in a struct-of-arrays crowd instead of Person objects
+		if vectorized and not headless:
+			raise ValueError("Vectorized simulation is only available in headless mode")
+		self.crowd = Crowd(floormap, self.random) if vectorized else None
+
+		# Simulators of concurrent controllers send them the lane every person at or in an intersection heads to, and check that
+		# people sharing an intersection never need the same cells
+		if vectorized and concurrent:
+			raise ValueError("Concurrent movements through intersections are only simulated with Person objects")
+		self.concurrent = concurrent
+
+		# The backend steps tickRate times per second (as fast as possible if 0) and the window is redrawn fps times per second
+		self.fps = fps
+		self.tickInterval = 1 / tickRate if tickRate > 0 else 0
+		self.frame = None
+		self.stepRequested = threading.Event()
+
+		# Per stage timings of every tick are only recorded for runs given a timingPath
+		self.timer = None
+
+		# Headless mode runs the backend only, without a window, animation or clock throttling
+		if self.headless:
+			return
+
 		# Initialize pygame
-		pygame.init()
+		self.renderer = Renderer(floormap)
 		self.clock = pygame.time.Clock()
 
-		# Define colors
-		self.black  = (0x00, 0x00, 0x00)
-		self.white  = (0xDD, 0xDD, 0xDD)
-		self.grey   = (0x33, 0x33, 0x33)
-		self.red    = (0xFF, 0x00, 0x00)
-		self.green  = (0x00, 0xFF, 0x00)
-		self.pink   = (0xFF, 0x77, 0x77)
-		self.purple = (0xDD, 0xAF, 0xFF)
-		self.blue   = (0x77, 0x77, 0xFF)
-		self.cyan   = (0x77, 0xFF, 0xFF)
-		self.yellow = (0xFF, 0xF8, 0x60)
-		self.floormapColors = [self.white, self.pink, self.purple, self.cyan, self.blue, self.yellow]
-
-		# Define block dimensions and margins
-		self.blockWidth = 20
-		self.blockHeight = 20
-		self.blockMargin = 3
-
-		# Define point dimensions
-		self.pointRadius = 7
-
-		# Set the dimensions of the screen
-		screenWidth = (self.blockMargin + self.blockWidth) * self.emptyFloormap.shape[0] + self.blockMargin
-		screenHeight = (self.blockMargin + self.blockHeight) * (self.emptyFloormap.shape[1] + 1) + self.blockMargin
-		self.screen = pygame.display.set_mode([screenWidth, screenHeight])
-
 	def __del__(self):
 		# Exit pygame
-		pygame.quit()
-
-	def getPygameCoords(self, x: int, y: int) -> "Coord":
-		return Coord((self.blockMargin + self.blockWidth) * x + self.blockMargin + (self.blockWidth / 2),
-			    	 (self.blockMargin + self.blockHeight) * (y + 1) + self.blockMargin + (self.blockHeight / 2))
-
-	def drawBlock(self, color: Tuple[int], x: int, y: int):
-		pygameCoords = self.getPygameCoords(x, y)
-		blockLocation = (pygameCoords.x - (self.blockWidth / 2),
-    					 pygameCoords.y - (self.blockHeight / 2),
-    					 self.blockWidth,
-    					 self.blockHeight)
-		pygame.draw.rect(self.screen, color, blockLocation)
-
-	def drawPerson(self, color: Tuple[int], x: int, y: int, dstLocID: int):
-		personLocation = self.getPygameCoords(x, y)
-		pygame.draw.circle(self.screen, color, personLocation, self.pointRadius)
-		self.drawText("%d" % dstLocID, 10, self.white, x, y)
-
-	def drawLED(self, color: Tuple[int], coordBounds: Tuple["Coords"], is_vertical: bool):
-		pygameCoords1 = self.getPygameCoords(coordBounds[0].x, coordBounds[0].y)
-		pygameCoords2 = self.getPygameCoords(coordBounds[1].x, coordBounds[1].y)
-		midpoint = Coord((pygameCoords1.x + pygameCoords2.x) / 2, (pygameCoords1.y + pygameCoords2.y) / 2)
-		LEDLocation = [(midpoint.x, midpoint.y - (self.blockHeight / 2)), (midpoint.x, midpoint.y + (self.blockHeight / 2))] if is_vertical else \
-					  [(midpoint.x - (self.blockWidth / 2), midpoint.y), (midpoint.x + (self.blockWidth / 2), midpoint.y)]
-		pygame.draw.lines(self.screen, color, False, LEDLocation, self.blockMargin)
-
-	def drawText(self, text: str, size: int, color: Tuple[int], x: int, y: int, bold: bool=False, anchor: str='center'):
-		text = pygame.font.SysFont('arial', size, bold=bold).render(text, True, color)
-		rect = text.get_rect()
-		center = self.getPygameCoords(x, y)
-		if anchor == 'center':
-			rect.center = center
-		elif anchor == 'left':
-			rect.center = (center.x + (rect.width / 2), center.y)
-		elif anchor == 'right':
-			rect.center = (center.x - (rect.width / 2), center.y)
-		self.screen.blit(text, rect)
+		if not self.headless:
+			pygame.quit()
+
+	def occupy(self, coord: Coord):
+		self.occupancy[coord] += 1
+
+	def vacate(self, coord: Coord):
+		self.occupancy[coord] -= 1
+		if self.occupancy[coord] == 0:
+			del self.occupancy[coord]
+
+	def isOccupied(self, coord: Coord) -> bool:
+		return coord in self.occupancy
+
+	def advancePerson(self, person: "Person"):
+		self.vacate(person.coord)
+		person.advance()
+		self.occupy(person.coord)
+
+	def getMovement(self, person: "Person") -> Tuple[int, int, List[Coord]]:
+		# Intersection a person is in or waits at an entry lane intersection of, -1 if neither, the lane they head to from it, -1
+		# if they stop in it, and the coords of it they still go through
+		pathIdx = person.pathIdx
+		if topology.isIntersectionLists[person.cell]:
+			interID = topology.intersectionIDLists[person.cell]
+		elif pathIdx + 1 < len(person.path) and topology.isIntersectionLists[topology.encode(person.path[pathIdx + 1])]:
+			interID = topology.intersectionIDLists[topology.encode(person.path[pathIdx + 1])]
+			pathIdx += 1
+		else:
+			return -1, -1, []
+
+		end = pathIdx
+		while end < len(person.path) and topology.intersectionIDLists[topology.encode(person.path[end])] == interID:
+			end += 1
+		exitLaneID = topology.laneIDLists[topology.encode(person.path[end])] if end < len(person.path) else -1
+		return interID, exitLaneID, person.path[pathIdx:end]
+
+	def isLetIn(self, person: "Person") -> bool:
+		# Whether the LED in front of a person at an entry lane intersection is off
+		LEDID = topology.getLEDID(person.coord, person.nextCoord())
+		return LEDID == -1 or not self.LEDStates[LEDID]
+
+	def checkConflicts(self):
+		# People in the same intersection must never need the same cells
+		usedCoords = dict()
+		for person in self.people:
+			if topology.isIntersectionLists[person.cell]:
+				interID, exitLaneID, coords = self.getMovement(person)
+				for coord in coords:
+					if usedCoords.setdefault(coord, person) is not person:
+						raise ValueError("Conflicting movements of people {} and {} in intersection {} at {}".format(usedCoords[coord].personID, person.personID, interID, coord))
+
+	def updateLEDs(self, changedLEDs: Union[List[Tuple[int, bool]], np.ndarray]) -> List[Tuple[Coord]]:
+		# Apply the changes of LED states of a tick and return the paths blocked by LEDs that are on. Changes read from a ring
+		# buffer are (LED ID, is_on) records of a structured array, see transport.py
+		for LEDID, is_on in changedLEDs:
+			self.LEDStates[LEDID] = is_on
+		return [coordBounds for coordBounds, is_on in zip(topology.LEDBounds, self.LEDStates) if is_on]
+
+	def spawn(self, maxPeople: int, numPeople: int, isOccupied: Callable[[Coord], bool], blockedPaths: List[Tuple[Coord]]) -> List["Person"]:
+		# TODO: only do this if there is less than a certain number of people?
+		newPeople = []
+		x = numPeople
+		# quadratic probability, 1 when x = 0, 0 when x = 40
+		probability = ((x ** 2) / 1600) - (x / 20) + 1
+		if x < maxPeople: #np.random.rand() < probability:
+			# Generate random srcLoc and dstLoc among the routes of the layout, making sure that there is currently nobody at that srcLoc
+			srcLocID = self.random.choice(self.srcLocIDs)
+			dstLocID = self.random.choice(self.dstLocIDs[srcLocID])
+			if not any(isOccupied(coord) for coord in self.spawnCoords[srcLocID]):
+				newPerson = SmartPerson(Location(srcLocID), Location(dstLocID), self.emptyFloormap, blockedPaths)
+				newPerson.personID = self.peopleEntered
+				newPeople.append(newPerson)
+				self.peopleEntered += 1
+
+		return newPeople
 
 	def averageResults(self, results: dict):
 		for key, value in results.items():
 			results[key] = sum(value)/len(value)
 		return results
 
-	def run(self, maxPeople):
-		iteration = 0
+	def openTrace(self, tracePath: Optional[str], maxPeople: int) -> Optional[TraceWriter]:
+		if tracePath is None:
+			return None
+		return TraceWriter(tracePath, self.emptyFloormap, [LED.coordBounds for LED in Intersection.getLEDs()], self.seed, maxPeople)
+
+	def run(self, maxPeople: int, maxIterations: int = 1000, tracePath: Optional[str] = None, timingPath: Optional[str] = None) -> dict:
+		if self.seed is not None:
+			self.random.seed(self.seed)
+		self.timer = TickTimer('simulator') if timingPath is not None else None
+		if self.crowd is not None:
+			results = self.runVectorized(maxPeople, maxIterations, tracePath)
+			self.exportTimings(timingPath)
+			return results
+
 		results = dict()
 		self.people = []
 		self.peopleEntered = 0
 		self.peopleExited = 0
-		while iteration < 1000: # change to 1000 iteration
-			skipLoop = True
-			for event in pygame.event.get():  # User did something
+		self.occupancy = Counter()
+		self.frame = None
+		trace = self.openTrace(tracePath, maxPeople)
+
+		if self.headless:
+			self.simulate(maxPeople, maxIterations, results, trace)
+		else:
+			self.animate(maxPeople, maxIterations, results, trace)
+
+		if trace is not None:
+			trace.close()
+		self.exportTimings(timingPath)
+
+		results = self.averageResults(results)
+		if self.travelTimeData is not None:
+			self.travelTimeData.put(results)
+		return results
+
+	def exportTimings(self, timingPath: Optional[str]):
+		# Collect the timings of the camera and main controller from the pipeline and write the statistics of every stage
+		if timingPath is None:
+			return
+		timings = [self.timer.getTimings()]
+		if hasattr(self.pipeline, 'getTimings'):
+			timings += self.pipeline.getTimings()
+		exportTimings(timingPath, timings)
+		print("[INFO] Wrote tick timings to {}".format(timingPath))
+
+	def simulate(self, maxPeople: int, maxIterations: int, results: dict, trace: Optional[TraceWriter]):
+		# Only ticks in which somebody advanced count as iterations, with a window they are also spaced tickInterval apart
+		iteration = 0
+		nextTick = time.perf_counter()
+		while iteration < maxIterations:
+			if not self.headless:
+				if self.debug:
+					self.stepRequested.wait()
+				elif nextTick > time.perf_counter():
+					time.sleep(max(nextTick - time.perf_counter(), 0))
+
+			if self.step(maxPeople, results, trace) > 0:
+				iteration += 1
+				self.stepRequested.clear()
+				nextTick = max(nextTick + self.tickInterval, time.perf_counter())
+
+	def step(self, maxPeople: int, results: dict, trace: Optional[TraceWriter]) -> int:
+		if self.timer is not None:
+			self.timer.startTick()
+
+		# Backend
+		# Send simulator data (list of coordinates) through the pipeline and get the LEDs that changed from the main controller
+		if self.concurrent:
+			movements = [(person, self.getMovement(person)) for person in self.people]
+			requests = [(person.cell, exitLaneID) for person, (interID, exitLaneID, coords) in movements if interID != -1]
+			blockedPaths = self.updateLEDs(self.pipeline([person.coord for person in self.people], requests))
+
+			# Intersections people are in or are let into on this tick, more than one of them makes it shared
+			users = Counter(interID for person, (interID, exitLaneID, coords) in movements if interID != -1 and (topology.isIntersectionLists[person.cell] or self.isLetIn(person)))
+			sharedIntersections = set(interID for interID, count in users.items() if count > 1)
+		else:
+			blockedPaths = self.updateLEDs(self.pipeline([person.coord for person in self.people]))
+		blockedLEDs = self.LEDStates
+		if self.timer is not None:
+			self.timer.mark('pipeline')
+
+		# Each person advances if possible
+		advancedPeople = []
+		exitedPeople = []
+		for person in reversed(self.people):	# Note: Iteration is in reverse since a person can be removed during an iteration
+			person.iterations += 1
+			currCoord = person.coord
+			nextCoord = person.nextCoord()
+
+			# Remove person if they have reached their destination, otherwise the person may advance
+			if currCoord == person.dstLoc.dstCoord:
+				if (person.srcLoc.srcCoord, person.dstLoc.dstCoord) in results:
+					results[(person.srcLoc.srcCoord, person.dstLoc.dstCoord)].append(person.iterations)
+				else:
+					results[(person.srcLoc.srcCoord, person.dstLoc.dstCoord)] = [person.iterations]
+				self.vacate(currCoord)
+				person.exited = True
+				exitedPeople.append(person)
+				self.peopleExited += 1
+			else:
+				currIntersection = topology.isIntersectionLists[topology.encode(currCoord)]
+				nextIntersection = topology.isIntersectionLists[topology.encode(nextCoord)]
+				if currIntersection != nextIntersection:
+					# Moves between a lane and an intersection are blocked by the LED on their edge, if any
+					LEDID = topology.getLEDID(currCoord, nextCoord)
+					isBlocked = LEDID != -1 and blockedLEDs[LEDID]
+				if not currIntersection and nextIntersection:
+					if not isBlocked:
+						self.advancePerson(person)
+						advancedPeople.append(person)
+				elif currIntersection and not nextIntersection:
+					if not isBlocked:
+						self.advancePerson(person)
+						advancedPeople.append(person)
+					elif self.concurrent and topology.intersectionIDLists[topology.encode(currCoord)] in sharedIntersections:
+						# Rerouting could cross the cells of the other people in the intersection, so they wait for their exit
+						pass
+					elif self.timer is not None:
+						start = time.perf_counter_ns()
+						person.wait(blockedPaths)
+						self.timer.record('reroute', start)
+					else:
+						person.wait(blockedPaths)
+				else:
+					if not self.isOccupied(nextCoord):
+						self.advancePerson(person)
+						advancedPeople.append(person)
+
+		# Remove people who have reached their destination in a single pass
+		if exitedPeople:
+			self.people = [person for person in self.people if not person.exited]
+		if self.concurrent:
+			self.checkConflicts()
+		if self.timer is not None:
+			self.timer.mark('advance')
+
+		newPeople = self.spawn(maxPeople, len(self.people), self.isOccupied, blockedPaths)
+
+		for person in newPeople:
+			self.occupy(person.coord)
+		if self.timer is not None:
+			self.timer.mark('spawn')
+
+		if trace is not None:
+			people = np.array([(person.personID, person.coord.x, person.coord.y) for person in self.people + newPeople], dtype=peopleDtype)
+			spawns = np.array([(person.personID, person.srcLoc.locID, person.dstLoc.locID) for person in newPeople], dtype=spawnsDtype)
+			exits = np.array([(person.personID, person.iterations) for person in exitedPeople], dtype=exitsDtype)
+			trace.writeStep(len(advancedPeople), self.LEDStates, people, spawns, exits)
+			if self.timer is not None:
+				self.timer.mark('trace')
+
+		# Publish the state of the tick for the frontend, skipping ticks where nobody moved
+		if not self.headless and advancedPeople:
+			if len(self.people) + len(newPeople) != self.peopleEntered - self.peopleExited:
+				raise ValueError("Inconsistency in people statistics")
+
+			advancedPeople = set(advancedPeople)
+			people = [(person.prevCoord() if person in advancedPeople else person.coord, person.coord, person.dstLoc.locID, False) for person in self.people]
+			people += [(person.coord, person.coord, person.dstLoc.locID, True) for person in newPeople]
+			self.frame = Frame(None if self.timer is None else self.timer.tick, people, list(zip(topology.LEDBounds, self.LEDStates)), len(people), self.peopleEntered, self.peopleExited, time.perf_counter())
+			if self.timer is not None:
+				self.timer.mark('publish')
+
+		# Add new people to list of people
+		self.people += newPeople
+
+		# Shuffle list of people to change order of iteration
+		self.random.shuffle(self.people)
+		if self.timer is not None:
+			self.timer.mark('shuffle')
+
+		return len(advancedPeople)
+
+	def animate(self, maxPeople: int, maxIterations: int, results: dict, trace: Optional[TraceWriter]):
+		# The backend steps in its own thread while this thread renders the latest published frame at a fixed frame rate
+		self.stepRequested.clear()
+		errors = []
+		def target():
+			try:
+				self.simulate(maxPeople, maxIterations, results, trace)
+			except Exception as e:
+				errors.append(e)
+		simulation = threading.Thread(target=target, daemon=True)
+		simulation.start()
+
+		drawnFrame, drawnProgress = None, 0
+		while True:
+			# Read the backend state before the frame it publishes, so a frame published in between is never missed
+			finished = not simulation.is_alive()
+			stepping = self.stepRequested.is_set()
+			frame = self.frame
+			progress = self.getProgress(frame)
+
+			# Block until the user does something once the latest frame is fully drawn in debug mode, instead of polling
+			if self.debug and not finished and not stepping and frame is drawnFrame and progress == 1:
+				events = [pygame.event.wait()] + pygame.event.get()
+			else:
+				events = pygame.event.get()
+			for event in events:
 				if event.type == pygame.QUIT:  # If user clicked close
 					pygame.quit()
 					os._exit(1)
 				if event.type == pygame.MOUSEBUTTONDOWN:
-					skipLoop = False
-			if self.debug and skipLoop:
-				continue
-
-
-			# Backend
-			# Enqueue simulator data (list of coordinates)
-			self.simulatorData.put([person.coord for person in self.people])
-
-			# Get LEDs from main controller data
-			LEDs = self.mainControllerData.get()
-
-			blockedPaths = []
-			for LED in LEDs:
-				# Append blocked paths if LED was turned on
-				if LED.is_on:
-					blockedPaths.append(LED.coordBounds)
-
-			# Each person advances if possible
-			advancedPeople = []
-			for person in reversed(self.people):	# Note: Iteration is in reverse since a person can be removed during an iteration
-				person.iterations += 1
-				currCoord = person.coord
-				nextCoord = person.nextCoord()
-
-				# Remove person if they have reached their destination, otherwise the person may advance
-				if currCoord == person.dstLoc.dstCoord:
-					if (person.srcLoc.srcCoord, person.dstLoc.dstCoord) in results:
-						results[(person.srcLoc.srcCoord, person.dstLoc.dstCoord)].append(person.iterations)
-					else:
-						results[(person.srcLoc.srcCoord, person.dstLoc.dstCoord)] = [person.iterations]
-					self.people.remove(person)
-					del person
-					self.peopleExited += 1
-				else:
-					intoIntersection = self.emptyFloormap[currCoord.x, currCoord.y] != 4 and self.emptyFloormap[nextCoord.x, nextCoord.y] == 4
-					outOfIntersection = self.emptyFloormap[currCoord.x, currCoord.y] == 4 and self.emptyFloormap[nextCoord.x, nextCoord.y] != 4
-					if intoIntersection:
-						if (currCoord, nextCoord) not in blockedPaths:
-							person.advance()
-							advancedPeople.append(person)
-					elif outOfIntersection:
-						if (nextCoord, currCoord) not in blockedPaths:
-							person.advance()
-							advancedPeople.append(person)
-						else:
-							person.wait(blockedPaths)
-					else:
-						if not any([person.coord == nextCoord for person in self.people]):
-							person.advance()
-							advancedPeople.append(person)
-
-			# TODO: only do this if there is less than a certain number of people?
-			newPeople = []
-			x = len(self.people)
-			# quadratic probability, 1 when x = 0, 0 when x = 40
-			probability = ((x ** 2) / 1600) - (x / 20) + 1
-			if x < maxPeople: #np.random.rand() < probability:
-				# Generate random srcLoc and dstLoc, making sure that there is currently nobody at that srcLoc
-				srcLocID = random.choice([1, 2, 3, 4, 5, 6, 8])
-				dstLocID = random.choice([1, 2, 3, 4, 5, 6, 7, 8]) if srcLocID != 8 else random.choice([1, 2, 3, 4, 5, 6, 7])
-				if not any([person.coord == Location.getCoords(srcLocID)[0] for person in (self.people + newPeople)]):
-					if srcLocID != 8 or not any ([person.coord == Coord(18, 8) for person in (self.people + newPeople)]):
-						if srcLocID != 6 or not any([person.coord == Coord(12, 17) for person in (self.people + newPeople)]):
-							newPerson = SmartPerson(Location(srcLocID), Location(dstLocID), self.emptyFloormap, blockedPaths)
-							newPeople.append(newPerson)
-							self.peopleEntered += 1
-
-			if len(advancedPeople) == 0:
-				# Add new people to list of people
-				self.people += newPeople
-
-				# Shuffle list of people to change order of iteration
-				random.shuffle(self.people)
-
-				continue
-
-			# Frontend
-			for animationLoop in range(1, 21):
-				# Set the screen background to black
-				self.screen.fill(self.black)
-
-				# Draw the empty floormap
-				for x, y in np.ndindex(self.emptyFloormap.shape):
-					color = self.floormapColors[self.emptyFloormap[x, y] + 1]
-					self.drawBlock(color, x, y)
-
-				# Draw dstLoc texts
-				for i in range(1, 9):
-					dstCoord = Location.getCoords(i)[1]
-					self.drawText("%d" % i, 15, self.grey, dstCoord.x, dstCoord.y, bold=True)
-
-				# Display people statistics
-				if len(self.people) + len(newPeople) != self.peopleEntered - self.peopleExited:
-					raise ValueError("Inconsistency in people statistics")
-				self.drawText("People Count: %d" % (len(self.people) + len(newPeople)), 17, self.white, 0, -1, bold=True, anchor='left')
-				self.drawText("People Entered: %d" % self.peopleEntered, 17, self.white, 9.5, -1, bold=True, anchor='center')
-				self.drawText("People Exited: %d" % self.peopleExited, 17, self.white, 19, -1, bold=True, anchor='right')
-
-				# Draw the LEDs
-				for LED in LEDs:
-					color = self.red if LED.is_on else self.green
-					self.drawLED(color, LED.coordBounds, LED.is_vertical())
-
-				# Draw all previously existing people
-				for person in self.people:
-					if person not in advancedPeople:
-						self.drawPerson(self.grey, person.coord.x, person.coord.y, person.dstLoc.locID)
-					else:
-						oldCoordX, oldCoordY = person.prevCoord()
-						newCoordX, newCoordY = person.coord
-						currCoordX = oldCoordX + ((newCoordX - oldCoordX) * animationLoop / 20)
-						currCoordY = oldCoordY + ((newCoordY - oldCoordY) * animationLoop / 20)
-						self.drawPerson(self.grey, currCoordX, currCoordY, person.dstLoc.locID)
-
-				# Draw new people in last iteration
-				if animationLoop == 20:
-					for person in newPeople:
-						self.drawPerson(self.grey, person.coord.x, person.coord.y, person.dstLoc.locID)
-
-				self.clock.tick(100) # change 40 to 1
-				pygame.display.flip()
-
-			# Add new people to list of people
-			self.people += newPeople
-
-			# Shuffle list of people to change order of iteration
-			random.shuffle(self.people)
-
-			iteration += 1
-
-		self.travelTimeData.put(self.averageResults(results))
+					self.stepRequested.set()
+
+			# Nothing to draw until the first frame, or once the latest frame is fully drawn
+			if frame is not None and (frame is not drawnFrame or drawnProgress < 1):
+				start = time.perf_counter_ns()
+				dirtyRects = self.renderer.drawFrame(self.getSprites(frame, progress), frame.LEDStates, frame.peopleCount, frame.peopleEntered, frame.peopleExited)
+				pygame.display.update(dirtyRects)
+				if self.timer is not None:
+					self.timer.record('draw', start, frame.tick)
+				drawnFrame, drawnProgress = frame, progress
+			elif finished:
+				break
+
+			self.clock.tick(self.fps)
+
+		if errors:
+			raise errors[0]
+
+	def getProgress(self, frame: Optional["Frame"]) -> float:
+		# Fraction of the animation from the previous tick to this frame, based on the time elapsed since it was published
+		if frame is None or self.tickInterval <= 0:
+			return 1
+		return min((time.perf_counter() - frame.time) / self.tickInterval, 1)
+
+	def getSprites(self, frame: "Frame", progress: float) -> List[Tuple[float, float, int]]:
+		# Draw all previously existing people, and new people once the animation is complete
+		sprites = []
+		for prevCoord, coord, dstLocID, isNew in frame.people:
+			if not isNew:
+				sprites.append(Renderer.interpolate(prevCoord, coord, progress, 1) + (dstLocID,))
+			elif progress == 1:
+				sprites.append((coord.x, coord.y, dstLocID))
+		return sprites
+
+	def runVectorized(self, maxPeople: int, maxIterations: int = 1000, tracePath: Optional[str] = None) -> dict:
+		iteration = 0
+		results = dict()
+		self.crowd.clear()
+		self.peopleEntered = 0
+		self.peopleExited = 0
+		trace = self.openTrace(tracePath, maxPeople)
+		while iteration < maxIterations:
+			if self.timer is not None:
+				self.timer.startTick()
+
+			# Send simulator data (list of coordinates) through the pipeline and get the LEDs that changed from the main controller
+			blockedPaths = self.updateLEDs(self.pipeline(self.crowd.coords()))
+			if self.timer is not None:
+				self.timer.mark('pipeline')
+
+			# Everyone advances, waits or exits in bulk
+			exits, numAdvanced = self.crowd.step(blockedPaths, self.LEDStates)
+			for personID, key, iterations in exits:
+				results.setdefault(key, []).append(iterations)
+			self.peopleExited += len(exits)
+			if self.timer is not None:
+				self.timer.mark('advance')
+
+			newPeople = self.spawn(maxPeople, len(self.crowd), self.crowd.isOccupied, blockedPaths)
+			for person in newPeople:
+				self.crowd.add(person)
+			if self.timer is not None:
+				self.timer.mark('spawn')
+
+			if trace is not None:
+				cells = self.crowd.cells()
+				people = np.empty(len(self.crowd), dtype=peopleDtype)
+				people['id'], people['x'], people['y'] = self.crowd.personIDs, cells // self.crowd.yLim, cells % self.crowd.yLim
+				spawns = np.array([(person.personID, person.srcLoc.locID, person.dstLoc.locID) for person in newPeople], dtype=spawnsDtype)
+				trace.writeStep(numAdvanced, self.LEDStates, people, spawns, np.array([(personID, iterations) for personID, key, iterations in exits], dtype=exitsDtype))
+				if self.timer is not None:
+					self.timer.mark('trace')
+
+			# Shuffle people to change order of iteration
+			self.crowd.shuffle()
+			if self.timer is not None:
+				self.timer.mark('shuffle')
+
+			if numAdvanced > 0:
+				iteration += 1
+
+		if trace is not None:
+			trace.close()
+
+		results = self.averageResults(results)
+		if self.travelTimeData is not None:
+			self.travelTimeData.put(results)
+		return results
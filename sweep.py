@@ -0,0 +1,112 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Tuple
+import numpy as np
+from scipy import stats
+from pipeline import SyncPipeline
+from simulator import Simulator
+from travel_time import TravelTime
+from main import getFloormap
+from util import Layout, getLayout, useLayout
+
+def simulate(maxPeople: int, seed: int, iterations: int, vectorized: bool) -> dict:
+	# Each worker runs one independent headless, single process simulation
+	floormap = getFloormap()
+	simulator = Simulator(floormap, None, None, None, headless=True, pipeline=SyncPipeline(floormap), vectorized=vectorized, seed=seed)
+	return simulator.run(maxPeople, iterations)
+
+def confidenceInterval(samples: List[float], confidence: float) -> Tuple[float, float]:
+	# Mean and half width of the Student's t confidence interval of the mean
+	mean = float(np.mean(samples))
+	if len(samples) < 2:
+		return mean, float('inf')
+	halfWidth = stats.t.ppf((1 + confidence) / 2, len(samples) - 1) * np.std(samples, ddof=1) / np.sqrt(len(samples))
+	return mean, float(halfWidth)
+
+def summarize(replications: List[dict], idealTravelTimes: dict, confidence: float) -> dict:
+	responseTimes = [TravelTime.getResponseTime(results, idealTravelTimes) for results in replications if results]
+	responseTime, responseTimeHalfWidth = confidenceInterval(responseTimes, confidence)
+
+	travelTimes = dict()
+	for results in replications:
+		for path, travelTime in results.items():
+			travelTimes.setdefault(path, []).append(travelTime)
+
+	summary = {"replications": len(replications),
+			   "responseTime": {"mean": responseTime, "halfWidth": responseTimeHalfWidth},
+			   "travelTimes": dict()}
+	for path, samples in sorted(travelTimes.items()):
+		mean, halfWidth = confidenceInterval(samples, confidence)
+		summary["travelTimes"]["{} -> {}".format(tuple(path[0]), tuple(path[1]))] = {"ideal": idealTravelTimes[path], "mean": mean, "halfWidth": halfWidth, "samples": len(samples)}
+	return summary
+
+def sweep(numOfPeople: List[int], iterations: int, seed: int, confidence: float, targetWidth: float,
+		  minReplications: int, maxReplications: int, processes: int, vectorized: bool) -> dict:
+	idealTravelTimes = TravelTime.getIdealTravelTimes()
+	replications = {maxPeople: [] for maxPeople in numOfPeople}
+	launched = {maxPeople: 0 for maxPeople in numOfPeople}
+	converged = set()
+
+	futures = dict()
+	with ProcessPoolExecutor(max_workers=processes, initializer=useLayout, initargs=(getLayout(),)) as executor:
+		def launch(maxPeople: int):
+			future = executor.submit(simulate, maxPeople, seed + launched[maxPeople], iterations, vectorized)
+			launched[maxPeople] += 1
+			futures[future] = maxPeople
+
+		# Start the minimum number of replications of every crowd size
+		for replication in range(minReplications):
+			for maxPeople in numOfPeople:
+				launch(maxPeople)
+
+		while futures:
+			done, _ = wait(futures, return_when=FIRST_COMPLETED)
+			for future in done:
+				maxPeople = futures.pop(future)
+				replications[maxPeople].append(future.result())
+
+				# Stop adding replications once the response time confidence interval is narrow enough
+				if len(replications[maxPeople]) >= minReplications:
+					responseTimes = [TravelTime.getResponseTime(results, idealTravelTimes) for results in replications[maxPeople] if results]
+					_, halfWidth = confidenceInterval(responseTimes, confidence)
+					if 2 * halfWidth <= targetWidth:
+						converged.add(maxPeople)
+
+				if maxPeople not in converged and launched[maxPeople] < maxReplications:
+					launch(maxPeople)
+
+	summaries = dict()
+	for maxPeople in numOfPeople:
+		summaries[maxPeople] = summarize(replications[maxPeople], idealTravelTimes, confidence)
+		summaries[maxPeople]["converged"] = maxPeople in converged
+	return summaries
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-p", "--max-people", help="Crowd sizes to sweep", type=int, nargs='+', default=[1, 5, 10, 25, 40, 50, 100])
+	parser.add_argument("-n", "--iterations", help="Number of simulation iterations per replication", type=int, default=1000)
+	parser.add_argument("-s", "--seed", help="Seed of the first replication, replication i uses seed + i", type=int, default=0)
+	parser.add_argument("-c", "--confidence", help="Confidence level of the confidence intervals", type=float, default=0.95)
+	parser.add_argument("-w", "--target-width", help="Stop adding replications once the response time confidence interval is this wide (percentage points)", type=float, default=5.0)
+	parser.add_argument("--min-replications", help="Minimum number of replications per crowd size", type=int, default=3)
+	parser.add_argument("--max-replications", help="Maximum number of replications per crowd size", type=int, default=30)
+	parser.add_argument("-j", "--processes", help="Number of worker processes, defaults to the number of CPUs", type=int, default=None)
+	parser.add_argument("--vectorized", help="Simulate people with the array based crowd", action='store_true')
+	parser.add_argument("-o", "--output", help="Path to an optional JSON file to write the summaries to", type=str, default=None)
+	parser.add_argument("--layout", help="Path to a layout file, defaults to layouts/mte380.json", type=str, default=None)
+	args = parser.parse_args()
+	if args.layout is not None:
+		useLayout(Layout.load(args.layout))
+
+	summaries = sweep(args.max_people, args.iterations, args.seed, args.confidence, args.target_width,
+					  args.min_replications, args.max_replications, args.processes, args.vectorized)
+
+	for maxPeople, summary in summaries.items():
+		print("[INFO] Max people: {}, replications: {}, response time: {:.2f} +/- {:.2f}{}".format(
+			maxPeople, summary["replications"], summary["responseTime"]["mean"], summary["responseTime"]["halfWidth"],
+			"" if summary["converged"] else " (not converged)"))
+
+	if args.output is not None:
+		with open(args.output, 'w') as f:
+			json.dump(summaries, f, indent=4)
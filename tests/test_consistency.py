@@ -0,0 +1,133 @@
+import pytest
+from util import *
+from layout_generator import generateLayout
+from camera import Camera
+from main_controller import MainController
+from pipeline import SyncPipeline
+from simulator import Simulator
+from sharding import createShards
+from simulation_trace import TraceWriter, TraceReader
+from transport import createChannels, closeChannels
+
+# Implementations that must decide the same as the reference ones on seeded runs: the array based crowd and Person objects,
+# the controller kernel and Intersection objects, sharded and single main controllers, and the multiprocess pipelines over
+# queues or ring buffers and the synchronous one.
+
+@pytest.fixture(params=["mte380", "grid3x2"])
+def layout(request) -> Layout:
+	defaultLayout = getLayout()
+	if request.param == "grid3x2":
+		useLayout(generateLayout(3, 2))
+	yield getLayout()
+	useLayout(defaultLayout)
+
+def runTrace(path: str, maxPeople: int = 40, iterations: int = 300, seed: int = 0, pipeline: Optional[Callable] = None, **kwargs) -> Tuple[dict, bytes]:
+	# Results and trace of a seeded headless run
+	floormap = getLayout().floormap.copy()
+	simulator = Simulator(floormap, None, None, None, headless=True, pipeline=pipeline if pipeline is not None else SyncPipeline(floormap), seed=seed, **kwargs)
+	results = simulator.run(maxPeople, iterations, tracePath=str(path))
+	with open(path, 'rb') as f:
+		return results, f.read()
+
+def recordFloormaps(maxPeople: int = 40, iterations: int = 300, seed: int = 0, concurrent: bool = False) -> List[Tuple[np.ndarray, Optional[List[Tuple[int, int]]]]]:
+	# Floormaps and requests the main controller is given on every tick of a seeded run
+	floormap = getLayout().floormap.copy()
+	pipeline = SyncPipeline(floormap, concurrent=concurrent)
+	frames = []
+	def recordingPipeline(listOfCoords: List[Coord], requests: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, bool]]:
+		frames.append((pipeline.camera(listOfCoords).copy(), requests))
+		return pipeline.mainController(frames[-1][0], requests)
+	Simulator(floormap, None, None, None, headless=True, pipeline=recordingPipeline, seed=seed, concurrent=concurrent).run(maxPeople, iterations)
+	return frames
+
+
+def test_vectorized_crowd_matches_objects(layout, tmp_path):
+	results, trace = runTrace(tmp_path / "objects.trace")
+	vectorizedResults, vectorizedTrace = runTrace(tmp_path / "vectorized.trace", vectorized=True)
+	assert results
+	assert vectorizedResults == results
+	assert vectorizedTrace == trace
+
+def test_kernel_matches_object_controller(layout):
+	frames = recordFloormaps()
+	mainController = MainController(None, None)
+	vectorizedController = MainController(None, None, vectorized=True)
+	changes = 0
+	for floormap, requests in frames:
+		changedLEDs = mainController(floormap)
+		assert sorted(vectorizedController(floormap)) == sorted(changedLEDs)
+		changes += len(changedLEDs)
+	assert changes > 0
+
+@pytest.mark.parametrize("numShards", [2, 3])
+@pytest.mark.parametrize("options", [dict(), dict(policy="max-pressure"), dict(concurrent=True), dict(vectorized=True)])
+def test_sharded_controllers_match_single_controller(layout, numShards, options):
+	frames = recordFloormaps(concurrent=options.get("concurrent", False))
+	# LEDs are shared by the controllers of a process, so the single controller decides every tick before the shards do
+	mainController = MainController(None, None, **options)
+	expectedLEDs = [sorted(mainController(floormap, requests)) for floormap, requests in frames]
+	shards = createShards(numShards, options.get("policy", "fifo"))
+	shardControllers = [MainController(None, None, interIDs=interIDs, shardCells=shardCells, **options) for interIDs, shardCells in shards]
+
+	# Shards only see the cells of their shard, like their processes
+	shardFloormaps = [getLayout().floormap.copy() for shard in shards]
+	for (floormap, requests), expected in zip(frames, expectedLEDs):
+		changedLEDs = []
+		for (interIDs, shardCells), shardController, shardFloormap in zip(shards, shardControllers, shardFloormaps):
+			shardFloormap.ravel()[shardCells] = floormap.ravel()[shardCells]
+			changedLEDs += shardController(shardFloormap, requests)
+		assert sorted(changedLEDs) == expected
+
+def test_concurrent_run_has_no_conflicts(layout, tmp_path):
+	# The simulator raises ValueError if people in an intersection need the same cells
+	results, trace = runTrace(tmp_path / "concurrent.trace", pipeline=SyncPipeline(getLayout().floormap.copy(), concurrent=True), concurrent=True)
+	assert results
+
+@pytest.mark.parametrize("transport", ["queue", "shm"])
+@pytest.mark.parametrize("numShards", [1, 3])
+def test_multiprocess_pipeline_matches_sync(tmp_path, transport, numShards):
+	results, trace = runTrace(tmp_path / "sync.trace")
+
+	floormap = getLayout().floormap.copy()
+	shards = createShards(numShards) if numShards > 1 else None
+	simulatorData, cameraData, mainControllerData = createChannels(transport, 40, None if shards is None else [shardCells for interIDs, shardCells in shards])
+	if shards is None:
+		processes = [Camera(floormap, simulatorData, cameraData), MainController(cameraData, mainControllerData)]
+	else:
+		processes = [Camera(floormap, simulatorData, cameraData, shardCells=[shardCells for interIDs, shardCells in shards])]
+		processes += [MainController(cameraData[i], mainControllerData[i], interIDs=interIDs, shardCells=shardCells) for i, (interIDs, shardCells) in enumerate(shards)]
+	for process in processes:
+		process.start()
+	try:
+		simulator = Simulator(floormap, mainControllerData, simulatorData, None, headless=True, seed=0)
+		multiprocessResults = simulator.run(40, 300, tracePath=str(tmp_path / "multiprocess.trace"))
+	finally:
+		for process in processes:
+			process.terminate()
+			process.join()
+		closeChannels(simulatorData, cameraData, mainControllerData)
+
+	assert multiprocessResults == results
+	with open(tmp_path / "multiprocess.trace", 'rb') as f:
+		assert f.read() == trace
+
+@pytest.mark.parametrize("seed", [None, -1, 0, 7])
+def test_trace_header_round_trip(tmp_path, seed):
+	floormap = getLayout().floormap
+	with TraceWriter(str(tmp_path / "run.trace"), floormap, topology.LEDBounds, seed, 40):
+		pass
+	with TraceReader(str(tmp_path / "run.trace")) as trace:
+		assert trace.seed == seed
+		assert (trace.xLim, trace.yLim) == floormap.shape
+		assert trace.LEDBounds == topology.LEDBounds
+
+def test_trace_seek_out_of_range(tmp_path):
+	runTrace(tmp_path / "run.trace", iterations=10)
+	with TraceReader(str(tmp_path / "run.trace")) as trace:
+		trace.seek(len(trace) - 1)
+		assert trace.readStep().step == len(trace) - 1
+		for step in [len(trace), -1]:
+			with pytest.raises(IndexError, match="steps 0 to {}".format(len(trace) - 1)):
+				trace.seek(step)
+		with pytest.raises(IndexError):
+			trace.checkSteps(5, 5)
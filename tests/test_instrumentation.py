@@ -0,0 +1,14 @@
+from instrumentation import exportTimings
+
+def test_transits_of_sharded_main_controllers(tmp_path):
+	# Records are (tick, stage, start, end) in nanoseconds
+	timings = [("simulator", [(0, "pipeline", 0, 10000)]),
+			   ("camera", [(0, "receive", 1000, 2000), (0, "update", 2000, 3000)]),
+			   ("mainController0", [(0, "receive", 3000, 4000), (0, "localControllers", 4000, 5000)]),
+			   ("mainController1", [(0, "receive", 3000, 6000), (0, "localControllers", 6000, 7000)])]
+	summaries = exportTimings(str(tmp_path / "timings.json"), timings)
+	assert summaries["transit.simulator->camera"]["mean"] == 2
+	assert summaries["transit.camera->mainController0"]["mean"] == 1
+	assert summaries["transit.camera->mainController1"]["mean"] == 3
+	assert summaries["transit.mainController1->simulator"]["mean"] == 3
+	assert "transit.camera->mainController" not in summaries
@@ -0,0 +1,26 @@
+import numpy as np
+from transport import GridRing, LEDRing
+
+def test_records_and_pickled_messages():
+	# Empty LED changes are records, timings with the same shape are pickled
+	ring = LEDRing(4)
+	try:
+		ring.putRecord([])
+		ring.put([("camera", [])])
+		ring.putRecord([(3, True), (1, False)])
+		assert len(ring.get()) == 0
+		assert ring.get() == [("camera", [])]
+		assert ring.get().tolist() == [(3, True), (1, False)]
+	finally:
+		ring.unlink()
+
+def test_requests_of_people_in_the_same_cell():
+	# Several people can be in the same intersection cell, so a shard has more requests than cells
+	ring = GridRing(2, 3)
+	try:
+		ring.putRecord((np.array([5, 5], dtype=np.int8), [(7, 0), (7, 1), (7, 2)]))
+		cells, requests = ring.get()
+		assert cells.tolist() == [5, 5]
+		assert requests.tolist() == [[7, 0], [7, 1], [7, 2]]
+	finally:
+		ring.unlink()
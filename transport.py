@@ -0,0 +1,233 @@
+from util import *
+import pickle
+from abc import ABC, abstractmethod
+from multiprocessing import Queue, Semaphore
+from multiprocessing.shared_memory import SharedMemory
+
+# Ring buffers are single producer, single consumer channels between two processes over shared memory, with the put and get
+# of multiprocessing.Queue, which stays the default transport. The messages of every tick are sent with putRecord, written
+# into a slot of the ring as fixed layout binary records instead of being pickled, and read back as NumPy views of the slot,
+# which stay valid until the next get. Messages sent with put, like timings, are pickled across as many slots as they need.
+# Every slot starts with its sequence number, its kind and two counts, and the shared memory with the number of slots
+# written and read.
+
+KIND_RECORD = 0
+KIND_PICKLED = 1
+
+transports = ["queue", "shm"]
+
+class RingBuffer(ABC):
+	# Rings of every kind of record create typed views of their slots and encode and decode their records
+	headerSize = 4 * 8
+
+	def __init__(self, payloadSize: int, numSlots: int = 4):
+		# Slots are kept 8 byte aligned for the views of their records, and hold a few bytes of pickled messages at least
+		self.payloadSize = max(-(-payloadSize // 8) * 8, 64)
+		self.slotSize = self.headerSize + self.payloadSize
+		self.numSlots = numSlots
+		self.sharedMemory = SharedMemory(create=True, size=2 * 8 + numSlots * self.slotSize)
+		# Slots the consumer can read and slots the producer can write
+		self.items = Semaphore(0)
+		self.spaces = Semaphore(numSlots)
+		self.views = None
+		self.isHeld = False
+
+	def __getstate__(self) -> dict:
+		# Views of the shared memory are created again in processes that are not forked
+		state = self.__dict__.copy()
+		state["views"] = None
+		return state
+
+	def getViews(self) -> dict:
+		if self.views is None:
+			buffer = self.sharedMemory.buf
+			self.views = {"counts": np.ndarray(2, dtype=np.int64, buffer=buffer),
+						  "headers": [np.ndarray(4, dtype=np.int64, buffer=buffer, offset=2 * 8 + slot * self.slotSize) for slot in range(self.numSlots)],
+						  "payloads": [np.ndarray(self.payloadSize, dtype=np.uint8, buffer=buffer, offset=2 * 8 + slot * self.slotSize + self.headerSize) for slot in range(self.numSlots)]}
+			self.createViews(self.views["payloads"])
+		return self.views
+
+	@abstractmethod
+	def createViews(self, payloads: List[np.ndarray]):
+		# Typed views of the records of every slot
+		pass
+
+	@abstractmethod
+	def encode(self, message, slot: int) -> Tuple[int, int]:
+		# Write a record into the views of a slot and return the counts of its header
+		pass
+
+	@abstractmethod
+	def decode(self, slot: int, count0: int, count1: int):
+		# Read back the record of a slot from its views and the counts of its header
+		pass
+
+	def acquireSlot(self) -> int:
+		# Wait for a slot the consumer is done with
+		views = self.getViews()
+		self.spaces.acquire()
+		return views["counts"][0] % self.numSlots
+
+	def commitSlot(self, slot: int, kind: int, count0: int, count1: int):
+		counts = self.getViews()["counts"]
+		self.views["headers"][slot][:] = (counts[0], kind, count0, count1)
+		counts[0] += 1
+		self.items.release()
+
+	def readSlot(self) -> Tuple[int, List[int]]:
+		# Wait for the next slot written by the producer
+		views = self.getViews()
+		self.items.acquire()
+		counts = views["counts"]
+		slot = counts[1] % self.numSlots
+		header = views["headers"][slot].tolist()
+		if header[0] != counts[1]:
+			raise RuntimeError("Ring buffer slot {} holds message {} instead of {}".format(slot, header[0], counts[1]))
+		return slot, header
+
+	def releaseSlot(self):
+		self.getViews()["counts"][1] += 1
+		self.spaces.release()
+
+	def putRecord(self, message):
+		slot = self.acquireSlot()
+		count0, count1 = self.encode(message, slot)
+		self.commitSlot(slot, KIND_RECORD, count0, count1)
+
+	def put(self, message):
+		# Pickled messages are split into chunks of a slot
+		data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+		for offset in range(0, len(data), self.payloadSize):
+			chunk = data[offset:offset + self.payloadSize]
+			slot = self.acquireSlot()
+			self.views["payloads"][slot][:len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+			self.commitSlot(slot, KIND_PICKLED, len(data), len(chunk))
+
+	def get(self):
+		# The slot of the previous record is only handed back to the producer now, as its views were in use until then
+		if self.isHeld:
+			self.releaseSlot()
+			self.isHeld = False
+
+		slot, (sequence, kind, count0, count1) = self.readSlot()
+		if kind == KIND_RECORD:
+			self.isHeld = True
+			return self.decode(slot, count0, count1)
+
+		data = bytearray(count0)
+		offset = 0
+		while True:
+			memoryview(data)[offset:offset + count1] = self.views["payloads"][slot][:count1]
+			offset += count1
+			self.releaseSlot()
+			if offset >= count0:
+				return pickle.loads(data)
+			slot, (sequence, kind, count0, count1) = self.readSlot()
+
+	def unlink(self):
+		# Called once by the process that created the ring, after the others are done with it
+		self.views = None
+		self.sharedMemory.close()
+		self.sharedMemory.unlink()
+
+
+class CoordsRing(RingBuffer):
+	# Simulator to camera: people coordinates as rows of int32 (x, y), and the optional (cell, exit lane ID) requests as rows of int32
+	def __init__(self, maxCoords: int, numSlots: int = 4):
+		self.maxCoords = maxCoords
+		RingBuffer.__init__(self, 2 * 2 * 4 * maxCoords, numSlots)
+
+	def createViews(self, payloads: List[np.ndarray]):
+		self.coords = [payload[:2 * 4 * self.maxCoords].view(np.int32).reshape(-1, 2) for payload in payloads]
+		self.requests = [payload[2 * 4 * self.maxCoords:2 * 2 * 4 * self.maxCoords].view(np.int32).reshape(-1, 2) for payload in payloads]
+
+	def encode(self, message: Tuple[List[Coord], Optional[List[Tuple[int, int]]]], slot: int) -> Tuple[int, int]:
+		listOfCoords, requests = message
+		if len(listOfCoords) > self.maxCoords or (requests is not None and len(requests) > self.maxCoords):
+			raise ValueError("{} people do not fit in a ring buffer of {}".format(len(listOfCoords), self.maxCoords))
+		if len(listOfCoords):
+			self.coords[slot][:len(listOfCoords)] = listOfCoords
+		if requests is not None and len(requests):
+			self.requests[slot][:len(requests)] = requests
+		return len(listOfCoords), -1 if requests is None else len(requests)
+
+	def decode(self, slot: int, count0: int, count1: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+		return self.coords[slot][:count0], None if count1 == -1 else self.requests[slot][:count1]
+
+
+class GridRing(RingBuffer):
+	# Camera to main controller: int8 values of the cells of the floormap, or of a shard, and the optional requests as rows of int32.
+	# Several people can be in the same intersection cell, so there are as many requests as people rather than cells
+	def __init__(self, numCells: int, maxRequests: int, numSlots: int = 4):
+		self.numCells = numCells
+		self.maxRequests = maxRequests
+		RingBuffer.__init__(self, -(-numCells // 8) * 8 + 2 * 4 * maxRequests, numSlots)
+
+	def createViews(self, payloads: List[np.ndarray]):
+		offset = -(-self.numCells // 8) * 8
+		self.cells = [payload[:self.numCells].view(np.int8) for payload in payloads]
+		self.requests = [payload[offset:offset + 2 * 4 * self.maxRequests].view(np.int32).reshape(-1, 2) for payload in payloads]
+
+	def encode(self, message: Tuple[np.ndarray, Optional[List[Tuple[int, int]]]], slot: int) -> Tuple[int, int]:
+		cells, requests = message
+		cells = cells.ravel()
+		if requests is not None and len(requests) > self.maxRequests:
+			raise ValueError("{} requests do not fit in a ring buffer of {}".format(len(requests), self.maxRequests))
+		self.cells[slot][:len(cells)] = cells
+		if requests is not None and len(requests):
+			self.requests[slot][:len(requests)] = requests
+		return len(cells), -1 if requests is None else len(requests)
+
+	def decode(self, slot: int, count0: int, count1: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+		return self.cells[slot][:count0], None if count1 == -1 else self.requests[slot][:count1]
+
+
+class LEDRing(RingBuffer):
+	# Main controller to simulator: changes of LED states as (int32 LED ID, bool is_on) records. Timings are lists of
+	# (process, records) and are pickled
+	LEDDtype = np.dtype([("LEDID", np.int32), ("is_on", np.bool_)])
+
+	def __init__(self, numLEDs: int, numSlots: int = 4):
+		self.numLEDs = numLEDs
+		RingBuffer.__init__(self, self.LEDDtype.itemsize * numLEDs, numSlots)
+
+	def createViews(self, payloads: List[np.ndarray]):
+		self.changedLEDs = [payload[:self.LEDDtype.itemsize * self.numLEDs].view(self.LEDDtype) for payload in payloads]
+
+	def encode(self, message: List[Tuple[int, bool]], slot: int) -> Tuple[int, int]:
+		if message:
+			self.changedLEDs[slot][:len(message)] = message
+		return len(message), 0
+
+	def decode(self, slot: int, count0: int, count1: int) -> np.ndarray:
+		return self.changedLEDs[slot][:count0]
+
+
+def createChannels(transport: str, maxPeople: int, shardCells: Optional[List[np.ndarray]] = None) -> Tuple[Union[Queue, RingBuffer], Union[Queue, RingBuffer, List], Union[Queue, RingBuffer, List]]:
+	# Simulator to camera, camera to main controller and main controller to simulator channels of the transport, the last two
+	# with one channel per shard for sharded main controllers. Simulators have at most maxPeople people, and a request for each
+	if transport not in transports:
+		raise ValueError("Unknown transport {}, expected one of {}".format(transport, ", ".join(transports)))
+	if transport == "queue":
+		if shardCells is None:
+			return Queue(), Queue(), Queue()
+		return Queue(), [Queue() for cells in shardCells], [Queue() for cells in shardCells]
+
+	if shardCells is None:
+		return CoordsRing(maxPeople), GridRing(topology.numCells, maxPeople), LEDRing(len(topology.LEDBounds))
+	return CoordsRing(maxPeople), [GridRing(len(cells), maxPeople) for cells in shardCells], [LEDRing(len(topology.LEDBounds)) for cells in shardCells]
+
+def putRecord(channel: Union[Queue, RingBuffer], message):
+	# Messages of a tick are written as binary records by ring buffers, queues pickle them like any other message
+	if isinstance(channel, RingBuffer):
+		channel.putRecord(message)
+	else:
+		channel.put(message)
+
+def closeChannels(*channels):
+	# Free the shared memory of ring buffers, queues need nothing. The processes reading and writing them must have been
+	# stopped and joined first, as their views of the shared memory go away with it
+	for channel in channels:
+		for ring in channel if isinstance(channel, list) else [channel]:
+			if isinstance(ring, RingBuffer):
+				ring.unlink()
@@ -2,7 +2,7 @@ import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
 from multiprocessing import Process, Queue
-from util import Coord, Location
+from util import Coord, Location, Person, getLayout
 from heapq import heappop, heappush
 
 # DC shortest pathfinder class
@@ -11,13 +11,8 @@ class Pathfinder():
     def __init__(self, grid: np.ndarray):
         self.grid = grid
         self.xLim, self.yLim = np.shape(grid)
-        self.illegalMoves = {Coord(2,  0): Coord(3,  0), Coord(3,  0): Coord(2,  0),
-                             Coord(0,  2): Coord(0,  3), Coord(0,  3): Coord(0,  2),
-                             Coord(1,  2): Coord(1,  3), Coord(1,  3): Coord(1,  2),
-                             Coord(2,  2): Coord(2,  3), Coord(2,  3): Coord(2,  2),
-                             Coord(0, 17): Coord(0, 18), Coord(0, 18): Coord(0, 17),
-                             Coord(1, 17): Coord(1, 18), Coord(1, 18): Coord(1, 17),
-                             Coord(2, 17): Coord(2, 18), Coord(2, 18): Coord(2, 17)}
+        # moves between neighbouring cells that are walled off in the layout
+        self.illegalMoves = getLayout().illegalMoves
 
     # checks validity of desired move
     def isMoveValid(self, visited: set, cell: Coord, neighbour: Coord) -> bool:
@@ -78,50 +73,43 @@ class Pathfinder():
                                       currCost + 1, neighbour))
 
 class TravelTime(Process):
-    def __init__(self, travelTimeData: Queue):
+    def __init__(self, travelTimeData: Queue, headless: bool = False):
         Process.__init__(self)
         self.travelTimeData = travelTimeData
-        self.idealTravelTimes = dict()
-
-        # initialization of ideal grid, with original unrestricted travel space
-        grid = [[ 0,  0,  0,  0, -1, -1,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0, -1, -1,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0, -1, -1,  0,  0,  0, -1, -1, -1,  0,  0,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0, -1, -1,  0, -1, -1, -1, -1, -1, -1, -1,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0, -1, -1, -1, -1, -1, -1, -1, -1,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0, -1, -1,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0],
-    			[ 0,  0,  0,  0, -1, -1,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0, -1, -1,  0]]
-
-        floormap = np.array(grid).transpose(1, 0)
-        shortestPathfinder = Pathfinder(floormap)
-        exitPoints = [Location.getCoords(i)[0] for i in range(1, 9)]
-        entryPoints = [Location.getCoords(i)[1] for i in range(1, 9)]
-
-        for exitPoint in exitPoints:
-            if exitPoint == None:
-                continue
-            else:
-                for entryPoint in entryPoints:
-                    self.idealTravelTimes[(exitPoint, entryPoint)] = shortestPathfinder.search(exitPoint, entryPoint)
-        del self.idealTravelTimes[(Coord(19, 8), Coord(19, 8))]
+        # headless runs only print the response time, without plotting the travel times
+        self.headless = headless
+        self.idealTravelTimes = self.getIdealTravelTimes()
 
         for path, time in self.idealTravelTimes.items():
             print(f"{path}: {time}")
 
+    @staticmethod
+    def getIdealFloormap() -> np.ndarray:
+        # ideal grid of the layout, with original unrestricted travel space
+        return getLayout().idealFloormap.copy()
+
+    @staticmethod
+    def getIdealTravelTimes() -> dict:
+        idealTravelTimes = dict()
+
+        shortestPathfinder = Pathfinder(TravelTime.getIdealFloormap())
+
+        # every pair of locations people can travel between in the layout
+        for srcLocID, dstLocID in sorted(Person.personPaths):
+            exitPoint = Location.getCoords(srcLocID)[0]
+            entryPoint = Location.getCoords(dstLocID)[1]
+            idealTravelTimes[(exitPoint, entryPoint)] = shortestPathfinder.search(exitPoint, entryPoint)
+
+        return idealTravelTimes
+
+    @staticmethod
+    def getResponseTime(simulatedTravelTimes: dict, idealTravelTimes: dict) -> float:
+        # percentage of the average simulated travel time over the average ideal travel time of the same paths
+        idealTimes = [idealTravelTimes[state] for state in simulatedTravelTimes]
+        idealTimeAvg = sum(idealTimes) / len(idealTimes)
+        simTimeAvg = sum(simulatedTravelTimes.values()) / len(simulatedTravelTimes)
+        return simTimeAvg / idealTimeAvg * 100
+
     def autolabel(self, rects, ax):
         """Attach a text label above each bar in *rects*, displaying its height."""
         for rect in rects:
@@ -135,15 +123,22 @@ class TravelTime(Process):
     def run(self):
         while True:
             simulatedTravelTimes = self.travelTimeData.get()
+            # None is sent once the simulation is done
+            if simulatedTravelTimes is None:
+                break
+            if not simulatedTravelTimes:
+                print("Response time: no one reached their destination")
+                continue
+
             idealTimes = []
             labels, simTimes = simulatedTravelTimes.keys(), simulatedTravelTimes.values()
             for state in labels:
                 idealTimes.append(self.idealTravelTimes[state])
 
             # finding percentage difference btwn sim and ideal times
-            idealTimeAvg = sum(idealTimes) / len(idealTimes)
-            simTimeAvg = sum(simTimes) / len(simTimes)
-            print("Response time: ", simTimeAvg / idealTimeAvg * 100)
+            print("Response time: ", self.getResponseTime(simulatedTravelTimes, self.idealTravelTimes))
+            if self.headless:
+                continue
 
             x = np.arange(len(labels))
             width = 0.35  # the width of the bars
@@ -1,106 +1,189 @@
-from typing import List, Tuple, Set, Optional
-import queue
-from collections import namedtuple
+from typing import List, Tuple, Set, Dict, Optional, Callable, Union
+import json
+import os
+from collections import namedtuple, deque, OrderedDict
 import numpy as np
 import time
 
 Coord = namedtuple('Coord', ['x', 'y'])
 
+# Layout of the MTE380 venue, used unless another layout is loaded
+defaultLayoutPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts", "mte380.json")
+
+class Layout():
+	# Static description of a venue, as stored in a layout file: the floormap seen by the camera and the unrestricted floormap of
+	# the ideal travel times, the locations people enter and exit through, the lanes, the lane transitions and intersections between
+	# them, and the routes people take between locations. Files store coords as [x, y] and floormaps as rows, and locations are
+	# numbered from 1 in file order.
+	def __init__(self, name: str, floormap: np.ndarray, idealFloormap: np.ndarray, locations: List[Tuple[Optional[Coord], Coord]], lanes: List[List[Coord]],
+				 laneTransitions: dict, intersections: List[Tuple[Set[Coord], List[Tuple[Tuple[Coord], int]], List[Tuple[Tuple[Coord], int]]]],
+				 routes: dict, blockedUntilExited: Set[Tuple[int, int]], illegalMoves: dict):
+		self.name = name
+		self.floormap = floormap
+		self.idealFloormap = idealFloormap
+		self.locations = locations						# (srcCoord, dstCoord) of every location, srcCoord is None for exit only locations
+		self.lanes = lanes								# Coords of every lane, in walking order
+		self.laneTransitions = laneTransitions			# Path of every (srcLaneID, dstLaneID) through the intersection between them
+		self.intersections = intersections				# Coords, entry (LED coordBounds, laneID) and exit (LED coordBounds, laneID) of every intersection
+		self.routes = routes							# (laneIDs, prefix, suffix) of every (srcLocID, dstLocID), None for the shortest path
+		self.blockedUntilExited = blockedUntilExited	# (dstLocID, intersection ID) pairs, see SmartPerson.findPath
+		self.illegalMoves = illegalMoves				# Moves between neighbouring coords that are walled off, for the ideal travel times
+
+	@staticmethod
+	def load(path: str) -> "Layout":
+		with open(path) as f:
+			layout = Layout.fromDict(json.load(f))
+		layout.validate()
+		return layout
+
+	def save(self, path: str):
+		# Top level lists are written one item per line, so layout files stay readable and diffable
+		items = []
+		for key, value in self.toDict().items():
+			if isinstance(value, list) and value:
+				value = "[\n" + ",\n".join("\t\t" + json.dumps(item) for item in value) + "\n\t]"
+			else:
+				value = json.dumps(value)
+			items.append('\t"{}": {}'.format(key, value))
+		with open(path, 'w') as f:
+			f.write("{\n" + ",\n".join(items) + "\n}\n")
+
+	@staticmethod
+	def fromDict(data: dict) -> "Layout":
+		def toCoords(coords: List[List[int]]) -> List[Coord]:
+			return [Coord(*coord) for coord in coords]
+
+		floormap = np.array(data["floormap"], dtype=np.int64).transpose(1, 0)
+		idealFloormap = np.array(data["idealFloormap"], dtype=np.int64).transpose(1, 0) if data.get("idealFloormap") is not None else np.where(floormap != -1, 0, -1)
+		locations = [(None if location["src"] is None else Coord(*location["src"]), Coord(*location["dst"])) for location in data["locations"]]
+		lanes = [toCoords(lane) for lane in data["lanes"]]
+		laneTransitions = {(laneTransition["src"], laneTransition["dst"]): toCoords(laneTransition["path"]) for laneTransition in data.get("laneTransitions", [])}
+		intersections = [(set(toCoords(intersection["coords"])),
+						  [(tuple(toCoords(laneIntersection["LED"])), laneIntersection["lane"]) for laneIntersection in intersection["entry"]],
+						  [(tuple(toCoords(laneIntersection["LED"])), laneIntersection["lane"]) for laneIntersection in intersection["exit"]]) for intersection in data["intersections"]]
+
+		# Without explicit routes, people take the shortest path between every srcLoc and every dstLoc at another coord
+		if data.get("routes") is not None:
+			routes = {(route["src"], route["dst"]): (route["lanes"], toCoords(route.get("prefix", [])), toCoords(route.get("suffix", []))) for route in data["routes"]}
+		else:
+			routes = {(srcLocID, dstLocID): None for srcLocID, (srcCoord, _) in enumerate(locations, 1) for dstLocID, (_, dstCoord) in enumerate(locations, 1)
+					  if srcCoord is not None and srcCoord != dstCoord}
+
+		blockedUntilExited = set(tuple(pair) for pair in data.get("blockedUntilExited", []))
+		illegalMoves = {Coord(*srcCoord): Coord(*dstCoord) for srcCoord, dstCoord in data.get("illegalMoves", [])}
+		return Layout(data.get("name", ""), floormap, idealFloormap, locations, lanes, laneTransitions, intersections, routes, blockedUntilExited, illegalMoves)
+
+	def toDict(self) -> dict:
+		def fromCoords(coords: List[Coord]) -> List[List[int]]:
+			return [[int(coord.x), int(coord.y)] for coord in coords]
+
+		data = dict()
+		data["name"] = self.name
+		data["floormap"] = self.floormap.transpose(1, 0).tolist()
+		data["idealFloormap"] = self.idealFloormap.transpose(1, 0).tolist()
+		data["locations"] = [{"src": None if srcCoord is None else fromCoords([srcCoord])[0], "dst": fromCoords([dstCoord])[0]} for srcCoord, dstCoord in self.locations]
+		data["lanes"] = [fromCoords(lane) for lane in self.lanes]
+		data["laneTransitions"] = [{"src": srcLaneID, "dst": dstLaneID, "path": fromCoords(path)} for (srcLaneID, dstLaneID), path in self.laneTransitions.items()]
+		data["intersections"] = [{"coords": fromCoords(sorted(coords)),
+								  "entry": [{"lane": laneID, "LED": fromCoords(coordBounds)} for coordBounds, laneID in entry],
+								  "exit": [{"lane": laneID, "LED": fromCoords(coordBounds)} for coordBounds, laneID in exit]} for coords, entry, exit in self.intersections]
+		if any(route is not None for route in self.routes.values()):
+			data["routes"] = [{"src": srcLocID, "dst": dstLocID, "lanes": laneIDs, "prefix": fromCoords(prefix), "suffix": fromCoords(suffix)}
+							  for (srcLocID, dstLocID), (laneIDs, prefix, suffix) in self.routes.items()]
+		data["blockedUntilExited"] = [list(pair) for pair in sorted(self.blockedUntilExited)]
+		data["illegalMoves"] = [fromCoords([srcCoord, dstCoord]) for srcCoord, dstCoord in self.illegalMoves.items()]
+		return data
+
+	def validate(self):
+		# Raise a ValueError for the first inconsistency found, before anything is built from the layout
+		width, height = self.floormap.shape
+		def check(condition: bool, message: str, *args):
+			if not condition:
+				raise ValueError("Invalid layout {}: ".format(self.name) + message.format(*args))
+		def inBounds(coord: Coord) -> bool:
+			return 0 <= coord.x < width and 0 <= coord.y < height
+		def isAdjacent(coord1: Coord, coord2: Coord) -> bool:
+			return abs(coord1.x - coord2.x) + abs(coord1.y - coord2.y) == 1
+
+		check(self.floormap.ndim == 2 and self.idealFloormap.shape == self.floormap.shape, "floormap and idealFloormap must be grids of the same shape")
+		check(bool(np.all((self.floormap >= -1) & (self.floormap <= 4))), "floormap values must be -1 (wall), 0 to 3 (lane) or 4 (intersection)")
+
+		laneCoords = dict()
+		check(len(self.lanes) > 0, "there are no lanes")
+		for laneID, lane in enumerate(self.lanes):
+			check(len(lane) > 0, "lane {} is empty", laneID)
+			for i, coord in enumerate(lane):
+				check(inBounds(coord), "lane {} coord {} is out of bounds", laneID, coord)
+				check(0 <= self.floormap[coord] <= 3, "lane {} coord {} is not a lane on the floormap", laneID, coord)
+				check(coord not in laneCoords, "lanes {} and {} share coord {}", laneCoords.get(coord), laneID, coord)
+				check(i == 0 or isAdjacent(lane[i - 1], coord), "lane {} is not contiguous at {}", laneID, coord)
+				laneCoords[coord] = laneID
+
+		intersectionIDs = dict()
+		check(len(self.intersections) > 0, "there are no intersections")
+		for interID, (coords, entry, exit) in enumerate(self.intersections):
+			check(len(coords) > 0, "intersection {} is empty", interID)
+			for coord in coords:
+				check(inBounds(coord), "intersection {} coord {} is out of bounds", interID, coord)
+				check(self.floormap[coord] == 4, "intersection {} coord {} is not an intersection on the floormap", interID, coord)
+				check(coord not in intersectionIDs, "intersections {} and {} share coord {}", intersectionIDs.get(coord), interID, coord)
+				intersectionIDs[coord] = interID
+			for laneIntersections, isEntry in [(entry, True), (exit, False)]:
+				for (laneCoord, intersectionCoord), laneID in laneIntersections:
+					check(0 <= laneID < len(self.lanes), "intersection {} references unknown lane {}", interID, laneID)
+					check(laneCoord == self.lanes[laneID][-1 if isEntry else 0], "the LED of lane {} must be at its {} next to intersection {}", laneID, "end" if isEntry else "start", interID)
+					check(intersectionCoord in coords and isAdjacent(laneCoord, intersectionCoord), "the LED of lane {} must lead into intersection {}", laneID, interID)
+		check(set(intersectionIDs) == set(Coord(*coord) for coord in np.argwhere(self.floormap == 4).tolist()), "floormap intersections do not match the intersections")
+
+		for (srcLaneID, dstLaneID), path in self.laneTransitions.items():
+			check(0 <= srcLaneID < len(self.lanes) and 0 <= dstLaneID < len(self.lanes), "lane transition {} references an unknown lane", (srcLaneID, dstLaneID))
+			check(len(path) > 0 and all(coord in intersectionIDs for coord in path), "lane transition {} must go through an intersection", (srcLaneID, dstLaneID))
+			path = [self.lanes[srcLaneID][-1]] + path + [self.lanes[dstLaneID][0]]
+			check(all(isAdjacent(path[i], path[i + 1]) for i in range(len(path) - 1)), "lane transition {} is not contiguous", (srcLaneID, dstLaneID))
+
+		check(len(self.locations) > 0, "there are no locations")
+		for locID, (srcCoord, dstCoord) in enumerate(self.locations, 1):
+			for coord in [dstCoord] if srcCoord is None else [srcCoord, dstCoord]:
+				check(coord in laneCoords or coord in intersectionIDs, "location {} coord {} is not on a lane or in an intersection", locID, coord)
+
+		for (srcLocID, dstLocID), route in self.routes.items():
+			check(1 <= srcLocID <= len(self.locations) and 1 <= dstLocID <= len(self.locations), "route {} references an unknown location", (srcLocID, dstLocID))
+			check(self.locations[srcLocID - 1][0] is not None, "route {} starts at exit only location {}", (srcLocID, dstLocID), srcLocID)
+			if route is not None:
+				laneIDs, prefix, suffix = route
+				check(len(laneIDs) > 0 and all(0 <= laneID < len(self.lanes) for laneID in laneIDs), "route {} references an unknown lane", (srcLocID, dstLocID))
+				check(all((laneIDs[i], laneIDs[i + 1]) in self.laneTransitions for i in range(len(laneIDs) - 1)), "route {} uses a missing lane transition", (srcLocID, dstLocID))
+
+		for dstLocID, interID in self.blockedUntilExited:
+			check(1 <= dstLocID <= len(self.locations) and 0 <= interID < len(self.intersections), "blockedUntilExited {} references an unknown location or intersection", (dstLocID, interID))
+
 class Location():
+	# (srcCoord, dstCoord) of every location, locIDs start at 1 and the srcCoord of exit only locations is None, set by useLayout
+	locCoords = []
+
+	__slots__ = ('locID', 'srcCoord', 'dstCoord')
+
 	def __init__(self, locID: int):
 		self.locID = locID
 		self.srcCoord, self.dstCoord = self.getCoords(self.locID)
 
 	@staticmethod
 	def getCoords(locID: int) -> "Coord":
-		locCoords = [(Coord(2, 20), Coord(1, 20)),		# Location 1
-					 (Coord(1, 0), Coord(2, 0)),		# Location 2
-					 (Coord(0, 13), Coord(0, 11)),		# Location 3
-					 (Coord(15, 20), Coord(7, 20)),		# Location 4
-					 (Coord(7, 0), Coord(15, 0)),		# Location 5
-					 (Coord(12, 16), Coord(8, 5)),		# Location 6
-					 (None, Coord(19, 0)),				# Location 7
-					 (Coord(19, 8), Coord(19, 8))]		# Location 8
-		return locCoords[locID - 1]
+		return Location.locCoords[locID - 1]
 
 class Person():
-	# Start with empty dict
+	# Lanes of the route of every (srcLocID, dstLocID), with the coords walked before the first and after the last lane, or None
+	# if people take the shortest path in shortestPaths, both set by useLayout
 	personPaths = dict()
+	shortestPaths = dict()
 
-	# From Loc 1
-	personPaths[(1, 1)] = [7, 8]
-	personPaths[(1, 2)] = [7, 30, 31, 22, 12, 1]
-	personPaths[(1, 3)] = [7, 30, 10]
-	personPaths[(1, 4)] = [7, 19, 6]
-	personPaths[(1, 5)] = [7, 30, 31, 22, 23, 3]
-	personPaths[(1, 6)] = [7, 30, 31]							# Special Case 1
-	personPaths[(1, 7)] = [7, 30, 31, 22, 23, 24, 4]
-	personPaths[(1, 8)] = [7, 19, 18, 17, 16]					# Special Case 2
-
-	# From Loc 2
-	personPaths[(2, 1)] = [0, 11, 21, 20, 8]
-	personPaths[(2, 2)] = [0, 1]
-	personPaths[(2, 3)] = [0, 11, 21, 10]
-	personPaths[(2, 4)] = [0, 11, 21, 20, 19, 6]
-	personPaths[(2, 5)] = [0, 11, 22, 23, 3]
-	personPaths[(2, 6)] = [0, 11]								# Special Case 3
-	personPaths[(2, 7)] = [0, 11, 22, 23, 24, 4]
-	personPaths[(2, 8)] = [0, 11, 22, 23, 24, 25]				# Special Case 4
-
-	# From Loc 3
-	personPaths[(3, 1)] = [9, 20, 8]
-	personPaths[(3, 2)] = [9, 31, 22, 12, 1]
-	personPaths[(3, 3)] = [9, 10]
-	personPaths[(3, 4)] = [9, 20, 19, 6]
-	personPaths[(3, 5)] = [9, 31, 22, 23, 3]
-	personPaths[(3, 6)] = [9, 31]								# Special Case 1
-	personPaths[(3, 7)] = [9, 31, 22, 23, 24, 4]
-	personPaths[(3, 8)] = [9, 20, 19, 18, 17, 16]				# Special Case 2
-
-	# From Loc 4
-	personPaths[(4, 1)] = [5, 27, 28, 29, 8]
-	personPaths[(4, 2)] = [5, 27, 28, 29, 30, 31, 22, 12, 1]
-	personPaths[(4, 3)] = [5, 27, 28, 29, 30, 10]
-	personPaths[(4, 4)] = [5, 27, 28, 6]
-	personPaths[(4, 5)] = [5, 27, 28, 29, 30, 31, 22, 23, 3]
-	personPaths[(4, 6)] = [5, 27, 28, 29, 30, 31]				# Special Case 1
-	personPaths[(4, 7)] = [5, 27, 28, 29, 30, 31, 22, 23, 24, 4]
-	personPaths[(4, 8)] = [5, 16]								# Special Case 2
-
-	# From Loc 5
-	personPaths[(5, 1)] = [2, 12, 11, 21, 20, 8]
-	personPaths[(5, 2)] = [2, 12, 1]
-	personPaths[(5, 3)] = [2, 12, 11, 21, 10]
-	personPaths[(5, 4)] = [2, 12, 11, 21, 20, 19, 6]
-	personPaths[(5, 5)] = [2, 23, 3]
-	personPaths[(5, 6)] = [2, 12, 11]							# Special Case 3
-	personPaths[(5, 7)] = [2, 23, 24, 4]
-	personPaths[(5, 8)] = [2, 23, 24, 25]						# Special Case 4
-
-	# From Loc 6
-	personPaths[(6, 1)] = [28, 29, 8]							# Special Case 5
-	personPaths[(6, 2)] = [28, 29, 30, 31, 22, 12, 1]			# Special Case 5
-	personPaths[(6, 3)] = [28, 29, 30, 10]						# Special Case 5
-	personPaths[(6, 4)] = [28, 6]								# Special Case 5
-	personPaths[(6, 5)] = [28, 29, 30, 31, 22, 23, 3]			# Special Case 5
-	personPaths[(6, 6)] = [28, 29, 30, 31]						# Special Case 1 and 5
-	personPaths[(6, 7)] = [28, 29, 30, 31, 22, 23, 24, 4]		# Special Case 5
-	personPaths[(6, 8)] = [17, 16]								# Special Case 2 and 6
-
-	# From Loc 8
-	personPaths[(8, 1)] = [26, 27, 28, 29, 8]					# Special Case 7
-	personPaths[(8, 2)] = [15, 14, 13, 12, 1]					# Special Case 8
-	personPaths[(8, 3)] = [26, 27, 28, 29, 30, 10]				# Special Case 7
-	personPaths[(8, 4)] = [26, 27, 28, 6]						# Special Case 7
-	personPaths[(8, 5)] = [15, 14, 3]							# Special Case 8
-	personPaths[(8, 6)] = [15, 14, 13, 12, 11]					# Special Case 3 and 8
-	personPaths[(8, 7)] = [15, 4]								# Special Case 8
+	__slots__ = ('srcLoc', 'dstLoc', 'coord', 'path', 'pathIdx', 'iterations', 'exited', 'personID')
 
 	def __init__(self, srcLoc: Location, dstLoc: Location, smart: bool=False):
-		if srcLoc.locID == 7:
-			raise ValueError("Location 7 is exit only")
-		if srcLoc.locID == dstLoc.locID == 8:
-			raise ValueError("Location 8 cannot be a srcLoc and dstLoc for the same person")
+		if srcLoc.srcCoord is None:
+			raise ValueError("Location {} is exit only".format(srcLoc.locID))
+		if (srcLoc.locID, dstLoc.locID) not in Person.personPaths:
+			raise ValueError("Location {} cannot be a srcLoc and Location {} a dstLoc for the same person".format(srcLoc.locID, dstLoc.locID))
 
 		self.srcLoc = srcLoc
 		self.dstLoc = dstLoc
@@ -109,44 +192,33 @@ class Person():
 		self.path = self.getPath()
 		self.pathIdx = 0
 		self.iterations = 0
+		self.exited = False
+		self.personID = -1
 
-	def getPath(self) -> List["Coord"]:
-		personPath = self.personPaths[(self.srcLoc.locID, self.dstLoc.locID)]
-		coordsPath = []
+	def getPath(self) -> Tuple["Coord"]:
+		# Routes are built once and shared by everyone with the same srcLoc and dstLoc
+		return routes.getRoute(self.srcLoc.locID, self.dstLoc.locID)
+
+	@staticmethod
+	def buildPath(srcLocID: int, dstLocID: int) -> List["Coord"]:
+		srcLoc = Location(srcLocID)
+		dstLoc = Location(dstLocID)
+		if Person.personPaths[(srcLocID, dstLocID)] is None:
+			return Person.shortestPaths[(srcLocID, dstLocID)]
+
+		personPath, prefix, suffix = Person.personPaths[(srcLocID, dstLocID)]
+		coordsPath = list(prefix)
 		for i, laneID in enumerate(personPath):
 			currLaneID = laneID
 			nextLaneID = personPath[i + 1] if i < len(personPath) - 1 else None
 			coordsPath += Lane.getPath(currLaneID) + ([] if nextLaneID is None else LaneTransition.getPath(currLaneID, nextLaneID))
+		coordsPath += suffix
 
-		specialCase1 = [(1, 6), (3, 6), (4, 6), (6, 6)]
-		specialCase2 = [(1, 8), (3, 8), (4, 8), (6, 8)]
-		specialCase3 = [(2, 6), (5, 6), (8, 6)]
-		specialCase4 = [(2, 8), (5, 8)]
-		specialCase5 = [(6, 1), (6, 2), (6, 3), (6, 4), (6, 5), (6, 6), (6, 7)]
-		specialCase6 = [(6, 8)]
-		specialCase7 = [(8, 1), (8, 3), (8, 4)]
-		specialCase8 = [(8, 2), (8, 5), (8, 6), (8, 7)]
-
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase1:
-			coordsPath = coordsPath + [Coord(6, 5), Coord(7, 5), Coord(8, 5)]
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase2:
-			coordsPath = coordsPath + [Coord(19, 8)]
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase3:
-			coordsPath = coordsPath + [Coord(5, 5), Coord(6, 5), Coord(7, 5), Coord(8, 5)]
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase4:
-			coordsPath = coordsPath + [Coord(18, 8), Coord(19, 8)]
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase5:
-			coordsPath = [Coord(12, 16)] + coordsPath
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase6:
-			coordsPath = [Coord(12, 16), Coord(12, 17)] + coordsPath
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase7:
-			coordsPath = [Coord(19, 8), Coord(18, 8)] + coordsPath
-		if (self.srcLoc.locID, self.dstLoc.locID) in specialCase8:
-			coordsPath = [Coord(19, 8)] + coordsPath
-
-		if coordsPath[0] != self.srcLoc.srcCoord:
+		if any(abs(coordsPath[i].x - coordsPath[i + 1].x) + abs(coordsPath[i].y - coordsPath[i + 1].y) != 1 for i in range(len(coordsPath) - 1)):
+			raise ValueError("Path from Location {} to Location {} is not contiguous".format(srcLocID, dstLocID))
+		if coordsPath[0] != srcLoc.srcCoord:
 			raise ValueError("Path does not start at srcLoc")
-		if coordsPath[-1] != self.dstLoc.dstCoord:
+		if coordsPath[-1] != dstLoc.dstCoord:
 			raise ValueError("Path does not end at dstLoc")
 		return coordsPath
 
@@ -175,8 +247,17 @@ class Person():
 		self.coord = self.nextCoord()
 		self.pathIdx += 1
 
+	@property
+	def cell(self) -> int:
+		return topology.encode(self.coord)
+
 
 class SmartPerson(Person):
+	# (dstLocID, intersection ID) pairs whose reroutes avoid blocked paths until they leave the intersection, set by useLayout
+	blockedUntilExited = set()
+
+	__slots__ = ('_floormap', '_blockedCount', '_blockedCountLim')
+
 	def __init__(self, srcLoc: Location, dstLoc: Location, floormap: np.ndarray, blockedPaths: List[Coord]):
 		super().__init__(srcLoc, dstLoc, smart=True)
 
@@ -185,127 +266,122 @@ class SmartPerson(Person):
 		self._blockedCountLim = 3
 
 		blockedCoords = [blockedPath[0] for blockedPath in blockedPaths]
-		self.calculatePath(blockedPaths)
 
-	def calculatePath(self, blockedPaths: List[Tuple[Coord]]):
-		class Node:
-			def __init__(self, coord: Coord, predecessor: "Node"=None):
-				self.coord = coord
-				self.predecessor = predecessor
-
-			def getNeighbors(self, srcNode: "Node", floormap: np.ndarray, blockedPaths: List[Tuple[Coord]], dstLocID: int):
-				x_lim, y_lim = np.shape(floormap)
-
-				def _is_valid_coord(coord: Coord):
-					if coord.x < 0 or coord.x >= x_lim or coord.y < 0 or coord.y >= y_lim:
-						return False
-
-					currLaneID = Lane.getLaneID(self.coord)
-					currLanePath = Lane.getPath(currLaneID)
-					currIntersectionID = Intersection.getIntersectionId(self.coord)
-					currIntersectionCoords = Intersection.getCoords(currIntersectionID)
-					currEntryLaneIntersection = Intersection.getLaneIntersection(self.coord, isEntry=True)
-
-					newLaneID = Lane.getLaneID(coord)
-					newIntersectionID = Intersection.getIntersectionId(coord)
-					newExitLaneIntersection = Intersection.getLaneIntersection(coord, isEntry=False)
-
-					# if is on a lane and not at the end of the lane, only allow next coord on lane
-					if currLaneID != -1 and self.coord != currLanePath[-1]:
-						return coord == currLanePath[currLanePath.index(self.coord) + 1]
-
-					# if is at the end of a lane, allow going into an intersection
-					elif currLaneID != -1 and self.coord == currLanePath[-1]:
-						# The lane intersection are always the unit outside the intersection
-						# while the LED bounds has first element overlapping with the lane intersection coord, and the second element
-						# inside the intersection
-						if newIntersectionID != -1 and currEntryLaneIntersection is not None:
-							return (self.coord, coord) == currEntryLaneIntersection.LED.coordBounds
-						else:
-							return False
-
-					else:
-						# if is inside an intersection, allow either move inside the intersection, or go out to a lane
-						if currIntersectionID != -1:
-							if newLaneID != -1 and newExitLaneIntersection is not None:
-								isExit = (coord, self.coord) == newExitLaneIntersection.LED.coordBounds
-							else:
-								isExit = False
-
-							isValidIntersectionCoord = coord in currIntersectionCoords or isExit
-							return isValidIntersectionCoord
-
-						else:
-							raise ValueError("Error, curr coord {} is neither on a lane or in an intersection!".format(self.coord))
-
-
-				neighborCoords = [Coord(self.coord.x + 1, self.coord.y), Coord(self.coord.x, self.coord.y + 1),
-							 	  Coord(self.coord.x - 1, self.coord.y), Coord(self.coord.x, self.coord.y - 1)]
-
-				neighbors = []
-				for neighborCoord in neighborCoords:
-					if _is_valid_coord(neighborCoord):
-						neighbor = Node(neighborCoord, self)
-
-						isValidNeighbor = True
-						inIntersection = Intersection.getIntersectionId(srcNode.coord) != -1
-						if inIntersection:
-							if dstLocID != 2 and dstLocID != 6:
-								isValidNeighbor = (neighbor.coord, self.coord) not in blockedPaths if Intersection.getIntersectionId(srcNode.coord) == Intersection.getIntersectionId(self.coord) else True
-							else:
-								if dstLocID == 2 and Intersection.getIntersectionId(srcNode.coord) == 1 or dstLocID == 6 and Intersection.getIntersectionId(srcNode.coord) == 10:
-									pathExitedIntersection = False
-									tempNode = self
-									while tempNode is not None:
-										if Intersection.getIntersectionId(tempNode.coord) != Intersection.getIntersectionId(srcNode.coord):
-											pathExitedIntersection = True
-											break
-										tempNode = tempNode.predecessor
-
-									isValidNeighbor = (neighbor.coord, self.coord) not in blockedPaths if not pathExitedIntersection else True
-								else:
-									isValidNeighbor = (neighbor.coord, self.coord) not in blockedPaths if Intersection.getIntersectionId(srcNode.coord) == Intersection.getIntersectionId(self.coord) else True
-
-						if isValidNeighbor:
-							neighbors.append(neighbor)
-
-				return neighbors
-
-		# Do BFS
-		openedList = queue.Queue()
-		closedList = queue.Queue()
-
-		srcNode = Node(self.coord)
-		dstNode = Node(self.dstLoc.dstCoord)
-
-		openedList.put(srcNode)
-
-		while not openedList.empty():
-			currNode = openedList.get()
-			closedList.put(currNode)
-
-			if currNode.coord == dstNode.coord:
-				break
+		# Paths from a srcLoc on a lane do not depend on blocked paths, so they are shared from a route table
+		if (srcLoc.locID, dstLoc.locID) in smartRoutes:
+			self.path = smartRoutes.getRoute(srcLoc.locID, dstLoc.locID)
+		else:
+			self.calculatePath(blockedPaths)
 
-			neighbors = currNode.getNeighbors(srcNode, self._floormap, blockedPaths, self.dstLoc.locID)
-			for neighbor in neighbors:
-				# Ignore repeated state transitions
-				if not any((currNode.coord, neighbor.coord) == (node.predecessor.coord, node.coord) for node in list(closedList.queue)[1:] + list(openedList.queue)):
-					openedList.put(neighbor)
+	def calculatePath(self, blockedPaths: List[Tuple[Coord]]):
+		path = rerouteCache.findPath(self.coord, self.dstLoc, self._floormap, blockedPaths)
 
 		# If new path not found stay with old path
-		if currNode.coord != dstNode.coord:
+		if path is None:
 			self._blockedCount = 0
 			return
 
-		path = queue.LifoQueue()
-		while currNode is not None:
-			path.put(currNode)
-			currNode = currNode.predecessor
-
-		self.path = [node.coord for node in reversed(path.queue)]
+		self.path = path
 		self.pathIdx = 0
 
+	@staticmethod
+	def findPath(coord: Coord, dstLoc: Location, floormap: np.ndarray, blockedPaths: List[Tuple[Coord]]) -> Optional[List[Coord]]:
+		# BFS over (cell, predecessor cell) states, each state is only ever queued once. Nodes are kept in flat lists indexed by
+		# their order of discovery, holding their cell, their predecessor and whether their path has left the intersection of
+		# the srcLoc coord, if any
+		srcCell = topology.encode(coord)
+		dstCell = topology.encode(dstLoc.dstCoord)
+		if not topology.contains(coord) or topology.successorCellLists[srcCell] is None:
+			raise ValueError("Error, curr coord {} is neither on a lane or in an intersection!".format(coord))
+
+		intersectionIDs = topology.intersectionIDLists
+		successorCellLists = topology.successorCellLists
+		numCells = topology.numCells
+		srcIntersectionID = intersectionIDs[srcCell]
+
+		# Blocked paths only matter when starting in an intersection: from the srcLoc coord's intersection out onto a lane,
+		# except for the (dstLocID, intersection ID) pairs of blockedUntilExited, where they matter until the path leaves it
+		blockedEdges = set(topology.encodeEdge(intersectionCoord, laneCoord) for laneCoord, intersectionCoord in blockedPaths) if srcIntersectionID != -1 else set()
+		untilExited = (dstLoc.locID, srcIntersectionID) in SmartPerson.blockedUntilExited
+
+		cells = [srcCell]
+		predecessors = [-1]
+		exited = [False]
+		queued = set()
+		openedList = deque([0])
+		node = None
+		while openedList:
+			node = openedList.popleft()
+			cell = cells[node]
+			if cell == dstCell:
+				break
+
+			if untilExited:
+				checkBlocked = not exited[node]
+			else:
+				checkBlocked = intersectionIDs[cell] == srcIntersectionID
+			for nextCell in successorCellLists[cell]:
+				edge = cell * numCells + nextCell
+				if edge in queued or checkBlocked and edge in blockedEdges:
+					continue
+
+				queued.add(edge)
+				cells.append(nextCell)
+				predecessors.append(node)
+				exited.append(exited[node] or intersectionIDs[nextCell] != srcIntersectionID)
+				openedList.append(len(cells) - 1)
+
+		if cells[node] != dstCell:
+			return None
+
+		path = []
+		while node != -1:
+			path.append(topology.coordLists[cells[node]])
+			node = predecessors[node]
+		path.reverse()
+		return path
+
+	@staticmethod
+	def findPaths(coord: Coord, dstLocs: List[Location]) -> List[Optional[List[Coord]]]:
+		# Paths to many dstLocs without blocked paths, with a single BFS over the same states as findPath. The first node
+		# reaching a cell is the one findPath stops at, so the paths are the ones findPath finds
+		srcCell = topology.encode(coord)
+		successorCellLists = topology.successorCellLists
+		numCells = topology.numCells
+
+		cells = [srcCell]
+		predecessors = [-1]
+		firstNodes = {srcCell: 0}
+		queued = set()
+		node = 0
+		while node < len(cells):
+			cell = cells[node]
+			for nextCell in successorCellLists[cell]:
+				edge = cell * numCells + nextCell
+				if edge in queued:
+					continue
+
+				queued.add(edge)
+				cells.append(nextCell)
+				predecessors.append(node)
+				firstNodes.setdefault(nextCell, len(cells) - 1)
+			node += 1
+
+		paths = []
+		for dstLoc in dstLocs:
+			node = firstNodes.get(topology.encode(dstLoc.dstCoord), -1)
+			if node == -1:
+				paths.append(None)
+				continue
+
+			path = []
+			while node != -1:
+				path.append(topology.coordLists[cells[node]])
+				node = predecessors[node]
+			path.reverse()
+			paths.append(path)
+		return paths
+
 	def wait(self, blockedPaths: List[Tuple[Coord]]):
 		self._blockedCount += 1
 
@@ -316,41 +392,23 @@ class SmartPerson(Person):
 		super().advance()
 
 class Lane():
-	lanePaths = [
-					 [Coord(1, 0), Coord(1, 1), Coord(1, 2), Coord(2, 2), Coord(3, 2), Coord(3, 3), Coord(4, 3)],																											# Lane 0
-					 [Coord(4, 2), Coord(4, 1), Coord(3, 1), Coord(2, 1), Coord(2, 0)],																																		# Lane 1
-					 [Coord(7, 0), Coord(8, 0), Coord(8, 1)],																																								# Lane 2
-					 [Coord(15, 0)],																																														# Lane 3
-					 [Coord(18, 2), Coord(19, 2), Coord(19, 1), Coord(19, 0)],																																				# Lane 4
-					 [Coord(15, 20), Coord(15, 19)],																																										# Lane 5
-					 [Coord(7, 18), Coord(7, 19), Coord(7, 20)],																																							# Lane 6
-					 [Coord(2, 20), Coord(2, 19), Coord(3, 19), Coord(4, 19), Coord(4, 18), Coord(5, 18), Coord(5, 17), Coord(5, 16)],																						# Lane 7
-					 [Coord(4, 15), Coord(4, 16), Coord(4, 17), Coord(3, 17), Coord(3, 18), Coord(2, 18), Coord(1, 18), Coord(1, 19), Coord(1, 20)],																		# Lane 8
-					 [Coord(0, 13), Coord(1, 13), Coord(2, 13), Coord(2, 12), Coord(3, 12)],																																# Lane 9
-					 [Coord(3, 11), Coord(2, 11), Coord(1, 11), Coord(0, 11)],																																				# Lane 10
-					 [Coord(5, 4)],																																															# Lane 11
-					 [Coord(7, 2), Coord(6, 2)],																																											# Lane 12
-					 [Coord(13, 1), Coord(12, 1), Coord(11, 1), Coord(10, 1), Coord(9, 1), Coord(9, 2)],																													# Lane 13
-					 [Coord(16, 2), Coord(15, 2)],																																											# Lane 14
-					 [Coord(19, 7), Coord(19, 6), Coord(19, 5), Coord(19, 4), Coord(18, 4), Coord(18, 3)],																													# Lane 15
-					 [Coord(16, 18), Coord(17, 18), Coord(17, 17), Coord(18, 17), Coord(18, 16), Coord(19, 16), Coord(19, 15), Coord(19, 14), Coord(19, 13), Coord(19, 12), Coord(19, 11), Coord(19, 10), Coord(19, 9)],	# Lane 16
-					 [Coord(12, 18), Coord(13, 18), Coord(14, 18)],																																							# Lane 17
-					 [Coord(9, 17), Coord(10, 17), Coord(11, 17)],																																							# Lane 18
-					 [Coord(6, 15), Coord(6, 16), Coord(7, 16)],																																							# Lane 19
-					 [Coord(4, 13), Coord(4, 14)],																																											# Lane 20
-					 [Coord(5, 6), Coord(5, 7), Coord(4, 7), Coord(4, 8), Coord(4, 9), Coord(4, 10)],																														# Lane 21
-					 [Coord(7, 5), Coord(8, 5), Coord(8, 4)],																																								# Lane 22
-					 [Coord(9, 3), Coord(10, 3), Coord(10, 2), Coord(11, 2), Coord(12, 2), Coord(13, 2)],																													# Lane 23
-					 [Coord(14, 3), Coord(15, 3)],																																											# Lane 24
-					 [Coord(16, 4), Coord(17, 4), Coord(17, 5), Coord(18, 5), Coord(18, 6), Coord(18, 7)],																													# Lane 25
-					 [Coord(18, 9), Coord(18, 10), Coord(18, 11), Coord(18, 12), Coord(18, 13), Coord(18, 14), Coord(18, 15), Coord(17, 15), Coord(17, 16), Coord(16, 16), Coord(16, 17)],									# Lane 26
-					 [Coord(14, 17), Coord(13, 17), Coord(13, 16)],																																							# Lane 27
-					 [Coord(11, 16), Coord(10, 16), Coord(9, 16)],																																							# Lane 28
-					 [Coord(8, 15), Coord(7, 15), Coord(7, 14)],																																							# Lane 29
-					 [Coord(6, 13), Coord(5, 13)],																																											# Lane 30
-					 [Coord(5, 10), Coord(5, 9), Coord(5, 8), Coord(6, 8), Coord(6, 7), Coord(6, 6)]]																														# Lane 31
-
-	lanePathsSets = [set(l) for l in lanePaths]
+	# Coords of every lane, in the direction people walk them, set by Lane.load
+	lanePaths = []
+
+	__slots__ = ('laneID', 'path')
+
+	@staticmethod
+	def load(lanePaths: List[List[Coord]]):
+		Lane.lanePaths = lanePaths
+		Lane.lanePathsSets = [set(l) for l in lanePaths]
+
+		# Lane ID of every coord, -1 off lanes, so lookups do not scan every lane. Also kept as nested lists for fast scalar lookups
+		laneIDGrid = np.full(np.max([coord for lanePath in lanePaths for coord in lanePath], axis=0) + 1, -1, dtype=np.int64)
+		for laneID in reversed(range(len(lanePaths))):
+			for coord in lanePaths[laneID]:
+				laneIDGrid[coord.x, coord.y] = laneID
+		Lane.laneIDGrid = laneIDGrid
+		Lane.laneIDLists = laneIDGrid.tolist()
 
 	def __init__(self, laneID: int):
 		self.laneID = laneID
@@ -362,14 +420,18 @@ class Lane():
 
 	@staticmethod
 	def getLaneID(coord: Coord) -> int:
-		for i, lane in enumerate(Lane.lanePathsSets):
-			if coord in lane:
-				return i
+		if 0 <= coord.x < len(Lane.laneIDLists) and 0 <= coord.y < len(Lane.laneIDLists[0]):
+			return Lane.laneIDLists[coord.x][coord.y]
 
 		return -1
 
 
 class LaneTransition():
+	# Paths through intersections between the end of a lane and the start of the next, keyed by (srcLaneID, dstLaneID), set by useLayout
+	laneTransitionPaths = dict()
+
+	__slots__ = ('srcLaneID', 'dstLaneID', 'path')
+
 	def __init__(self, srcLaneID: Lane, dstLaneID: Lane):
 		self.srcLaneID = srcLaneID
 		self.dstLaneID = dstLaneID
@@ -377,99 +439,12 @@ class LaneTransition():
 
 	@staticmethod
 	def getPath(srcLaneID: int, dstLaneID: int) -> List["Coord"]:
-		# Start with empty dict
-		laneTransitionPaths = dict()
-
-		# Lane transitions at interserction 0
-		laneTransitionPaths[(0, 1)] = [Coord(5, 3), Coord(5, 2)]
-		laneTransitionPaths[(0, 11)] = [Coord(5, 3)]
-		laneTransitionPaths[(12, 1)] = [Coord(5, 2)]
-		laneTransitionPaths[(12, 11)] = [Coord(5, 2), Coord(5, 3)]
-
-		# Lane transitions at intersection 1
-		laneTransitionPaths[(2, 12)] = [Coord(8, 2)]
-		laneTransitionPaths[(2, 23)] = [Coord(8, 2), Coord(8, 3)]
-		laneTransitionPaths[(13, 12)] = [Coord(8, 2)]
-		laneTransitionPaths[(13, 23)] = [Coord(8, 2), Coord(8, 3)]
-		laneTransitionPaths[(22, 12)] = [Coord(8, 3), Coord(8, 2)]
-		laneTransitionPaths[(22, 23)] = [Coord(8, 3)]
-
-		# Lane transitions at intersection 2
-		laneTransitionPaths[(14, 3)] = [Coord(15, 1)]
-		laneTransitionPaths[(14, 13)] = [Coord(15, 1), Coord(14, 1)]
-		laneTransitionPaths[(14, 24)] = [Coord(15, 1), Coord(14, 1), Coord(14, 2)]
-		laneTransitionPaths[(23, 3)] = [Coord(14,2), Coord(14, 1), Coord(15, 1)]
-		laneTransitionPaths[(23, 13)] = [Coord(14, 2), Coord(14, 1)]
-		laneTransitionPaths[(23, 24)] = [Coord(14, 2)]
-
-		# Lane transitions at intersection 3
-		laneTransitionPaths[(15, 4)] = [Coord(17, 3), Coord(17, 2)]
-		laneTransitionPaths[(15, 14)] = [Coord(17, 3), Coord(17, 2)]
-		laneTransitionPaths[(15, 25)] = [Coord(17, 3), Coord(16, 3)]
-		laneTransitionPaths[(24, 4)] = [Coord(16, 3), Coord(17, 3), Coord(17, 2)]
-		laneTransitionPaths[(24, 14)] = [Coord(16, 3), Coord(17, 3), Coord(17, 2)]
-		laneTransitionPaths[(24, 25)] = [Coord(16, 3)]
-
-		# Lane transitions at intersection 4
-		laneTransitionPaths[(16, 15)] = [Coord(19, 8)]
-		laneTransitionPaths[(16, 26)] = [Coord(19, 8), Coord(18, 8)]
-		laneTransitionPaths[(25, 15)] = [Coord(18, 8), Coord(19, 8)]
-		laneTransitionPaths[(25, 26)] = [Coord(18, 8)]
-
-		# Lane transitions at intersection 5
-		laneTransitionPaths[(5, 16)] = [Coord(15, 18)]
-		laneTransitionPaths[(5, 27)] = [Coord(15, 18), Coord(15, 17)]
-		laneTransitionPaths[(17, 16)] = [Coord(15, 18)]
-		laneTransitionPaths[(17, 27)] = [Coord(15, 18), Coord(15, 17)]
-		laneTransitionPaths[(26, 16)] = [Coord(15, 17), Coord(15, 18)]
-		laneTransitionPaths[(26, 27)] = [Coord(15, 17)]
-
-		# Lane transitions at intersection 6
-		laneTransitionPaths[(18, 17)] = [Coord(12, 17)]
-		laneTransitionPaths[(18, 28)] = [Coord(12, 17), Coord(12, 16)]
-		laneTransitionPaths[(27, 17)] = [Coord(12, 16), Coord(12, 17)]
-		laneTransitionPaths[(27, 28)] = [Coord(12, 16)]
-
-		# Lane transitions at intersection 7
-		laneTransitionPaths[(19, 6)] = [Coord(7, 17)]
-		laneTransitionPaths[(19, 18)] = [Coord(7, 17), Coord(8, 17)]
-		laneTransitionPaths[(19, 29)] = [Coord(7, 17), Coord(8, 17), Coord(8, 16)]
-		laneTransitionPaths[(28, 6)] = [Coord(8, 16), Coord(8, 17), Coord(7, 17)]
-		laneTransitionPaths[(28, 18)] = [Coord(8, 16), Coord(8, 17)]
-		laneTransitionPaths[(28, 29)] = [Coord(8, 16)]
-
-		# Lane transitions at intersection 8
-		laneTransitionPaths[(7, 8)] = [Coord(5, 15)]
-		laneTransitionPaths[(7, 19)] = [Coord(5, 15)]
-		laneTransitionPaths[(7, 30)] = [Coord(5, 15), Coord(5, 14), Coord(6, 14)]
-		laneTransitionPaths[(20, 8)] = [Coord(5, 14), Coord(5, 15)]
-		laneTransitionPaths[(20, 19)] = [Coord(5, 14), Coord(5, 15)]
-		laneTransitionPaths[(20, 30)] = [Coord(5, 14), Coord(6, 14)]
-		laneTransitionPaths[(29, 8)] = [Coord(6, 14), Coord(5, 14), Coord(5, 15)]
-		laneTransitionPaths[(29, 19)] = [Coord(6, 14), Coord(5, 14), Coord(5, 15)]
-		laneTransitionPaths[(29, 30)] = [Coord(6, 14)]
-
-		# Lane transitions at intersection 9
-		laneTransitionPaths[(9, 10)] = [Coord(4, 12), Coord(4, 11)]
-		laneTransitionPaths[(9, 20)] = [Coord(4, 12)]
-		laneTransitionPaths[(9, 31)] = [Coord(4, 12), Coord(5, 12), Coord(5, 11)]
-		laneTransitionPaths[(21, 10)] = [Coord(4, 11)]
-		laneTransitionPaths[(21, 20)] = [Coord(4, 11), Coord(4, 12)]
-		laneTransitionPaths[(21, 31)] = [Coord(4, 11), Coord(5, 11)]
-		laneTransitionPaths[(30, 10)] = [Coord(5, 12), Coord(5, 11), Coord(4, 11)]
-		laneTransitionPaths[(30, 20)] = [Coord(5, 12), Coord(4, 12)]
-		laneTransitionPaths[(30, 31)] = [Coord(5, 12), Coord(5, 11)]
-
-		# Lane transitions at intersection 10
-		laneTransitionPaths[(11, 21)] = [Coord(5, 5)]
-		laneTransitionPaths[(11, 22)] = [Coord(5, 5), Coord(6, 5)]
-		laneTransitionPaths[(31, 21)] = [Coord(6, 5), Coord(5, 5)]
-		laneTransitionPaths[(31, 22)] = [Coord(6, 5)]
-
-		return laneTransitionPaths[(srcLaneID, dstLaneID)]
+		return LaneTransition.laneTransitionPaths[(srcLaneID, dstLaneID)]
 
 
 class LED():
+	__slots__ = ('coordBounds', 'is_on')
+
 	def __init__(self, coordBounds: Tuple[Coord]):
 		if len(coordBounds) != 2:
 			raise ValueError("LED must be bounded by only two coordinates")
@@ -492,8 +467,19 @@ class LED():
 	def is_vertical(self) -> bool:
 		return abs(self.coordBounds[0].x - self.coordBounds[1].x) == 1
 
+	@property
+	def LEDID(self) -> int:
+		# Index of the LED in topology.LEDBounds, -1 if it is not an LED of the layout
+		return topology.LEDIDs.get(self.coordBounds, -1)
+
+	@property
+	def cells(self) -> Tuple[int, int]:
+		return topology.encode(self.coordBounds[0]), topology.encode(self.coordBounds[1])
+
 
 class LocalController():
+	__slots__ = ('LEDs',)
+
 	def __init__(self, LEDs: Set["LED"]):
 		self.LEDs = LEDs
 
@@ -521,73 +507,52 @@ class LocalController():
 
 
 class LaneIntersection():
+	__slots__ = ('coord', 'LED', 'lane')
+
 	def __init__(self, coord: Coord, LED: LED, lane: Lane):
 		self.coord = coord
 		self.LED = LED
 		self.lane = lane 	# TODO: what can this be used for?
 
+	@property
+	def cell(self) -> int:
+		return topology.encode(self.coord)
+
 
 class Intersection():
-	intersectionCoords = [
-		set({Coord(5, 2), Coord(5, 3)}),										 #intersection 0
-		set({Coord(8, 2), Coord(8, 3)}),										 #intersection 1
-		set({Coord(14, 1), Coord(14, 2), Coord(15, 1)}),						 #intersection 2
-		set({Coord(17, 2), Coord(17, 3), Coord(16, 3)}),						 #intersection 3
-		set({Coord(18, 8), Coord(19, 8)}),										 #intersection 4
-		set({Coord(15, 17), Coord(15, 18)}),									 #intersection 5
-		set({Coord(12, 16), Coord(12, 17)}),									 #intersection 6
-		set({Coord(7, 17), Coord(8, 17), Coord(8, 16)}),						 #intersection 7
-		set({Coord(5, 14), Coord(6, 14), Coord(5, 15)}),						 #intersection 8
-		set({Coord(4, 11), Coord(5, 11), Coord(5, 12), Coord(4, 12)}),			 #intersection 9
-		set({Coord(5, 5), Coord(6, 5)}),										 #intersection 10
-	]
-
-	laneIntersections = [
-		#intersection 0
-		([LaneIntersection(Coord(4, 3), LED((Coord(4, 3), Coord(5, 3))), Lane(0)), LaneIntersection(Coord(6, 2), LED((Coord(6, 2), Coord(5, 2))), Lane(12))],
-		 [LaneIntersection(Coord(4, 2), LED((Coord(4, 2), Coord(5, 2))), Lane(1)), LaneIntersection(Coord(5, 4), LED((Coord(5, 4), Coord(5, 3))), Lane(11))]),
-
-		#intersection 1
-		([LaneIntersection(Coord(8, 1), LED((Coord(8, 1), Coord(8, 2))), Lane(2)), LaneIntersection(Coord(9, 2), LED((Coord(9, 2), Coord(8, 2))), Lane(13)), LaneIntersection(Coord(8, 4), LED((Coord(8, 4), Coord(8, 3))), Lane(22))],
-		 [LaneIntersection(Coord(7, 2), LED((Coord(7, 2), Coord(8, 2))), Lane(12)), LaneIntersection(Coord(9, 3), LED((Coord(9, 3), Coord(8, 3))), Lane(23))]),
-
-		#intersection 2
-		([LaneIntersection(Coord(13, 2), LED((Coord(13, 2), Coord(14, 2))), Lane(23)), LaneIntersection(Coord(15, 2), LED((Coord(15, 2), Coord(15, 1))), Lane(14))],
-		 [LaneIntersection(Coord(15, 0), LED((Coord(15, 0), Coord(15, 1))), Lane(3)), LaneIntersection(Coord(13, 1), LED((Coord(13, 1), Coord(14, 1))), Lane(13)), LaneIntersection(Coord(14, 3), LED((Coord(14, 3), Coord(14, 2))), Lane(24))]),
-
-		#intersection 3
-		([LaneIntersection(Coord(18, 3), LED((Coord(18, 3), Coord(17, 3))), Lane(15)), LaneIntersection(Coord(15, 3), LED((Coord(15, 3), Coord(16, 3))), Lane(24))],
-		 [LaneIntersection(Coord(16, 2), LED((Coord(16, 2), Coord(17, 2))), Lane(14)), LaneIntersection(Coord(18, 2), LED((Coord(18, 2), Coord(17, 2))), Lane(4)), LaneIntersection(Coord(16, 4), LED((Coord(16, 4), Coord(16, 3))), Lane(25))]),
-
-		#intersection 4
-		([LaneIntersection(Coord(18, 7), LED((Coord(18, 7), Coord(18, 8))), Lane(25)), LaneIntersection(Coord(19, 9), LED((Coord(19, 9), Coord(19, 8))), Lane(16))],
-		 [LaneIntersection(Coord(19, 7), LED((Coord(19, 7), Coord(19, 8))), Lane(15)), LaneIntersection(Coord(18, 9), LED((Coord(18, 9), Coord(18, 8))), Lane(26))]),
-
-		#intersection 5
-		([LaneIntersection(Coord(16, 17), LED((Coord(16, 17), Coord(15, 17))), Lane(26)), LaneIntersection(Coord(14, 18), LED((Coord(14, 18), Coord(15, 18))), Lane(17)), LaneIntersection(Coord(15, 19), LED((Coord(15, 19), Coord(15, 18))), Lane(5))],
-		 [LaneIntersection(Coord(14, 17), LED((Coord(14, 17), Coord(15, 17))), Lane(27)), LaneIntersection(Coord(16, 18), LED((Coord(16, 18), Coord(15, 18))), Lane(16))]),
-
-		#intersection 6
-		([LaneIntersection(Coord(13, 16), LED((Coord(13, 16), Coord(12, 16))), Lane(27)), LaneIntersection(Coord(11, 17), LED((Coord(11, 17), Coord(12, 17))), Lane(18))],
-		 [LaneIntersection(Coord(11, 16), LED((Coord(11, 16), Coord(12, 16))), Lane(28)), LaneIntersection(Coord(12, 18), LED((Coord(12, 18), Coord(12, 17))), Lane(17))]),
-
-		#intersection 7
-		([LaneIntersection(Coord(9, 16), LED((Coord(9, 16), Coord(8, 16))), Lane(28)), LaneIntersection(Coord(7, 16), LED((Coord(7, 16), Coord(7, 17))), Lane(19))],
-		 [LaneIntersection(Coord(8, 15), LED((Coord(8, 15), Coord(8, 16))), Lane(29)), LaneIntersection(Coord(7, 18), LED((Coord(7, 18), Coord(7, 17))), Lane(6)), LaneIntersection(Coord(9, 17), LED((Coord(9, 17), Coord(8, 17))), Lane(18))]),
-
-		#intersection 8
-		([LaneIntersection(Coord(4, 14), LED((Coord(4, 14), Coord(5, 14))), Lane(20)), LaneIntersection(Coord(7, 14), LED((Coord(7, 14), Coord(6, 14))), Lane(29)), LaneIntersection(Coord(5, 16), LED((Coord(5, 16), Coord(5, 15))), Lane(7))],
-		 [LaneIntersection(Coord(6, 13), LED((Coord(6, 13), Coord(6, 14))), Lane(30)), LaneIntersection(Coord(4, 15), LED((Coord(4, 15), Coord(5, 15))), Lane(8)), LaneIntersection(Coord(6, 15), LED((Coord(6, 15), Coord(5, 15))), Lane(19))]),
-
-		#intersection 9
-		([LaneIntersection(Coord(4, 10), LED((Coord(4, 10), Coord(4, 11))), Lane(21)), LaneIntersection(Coord(3, 12), LED((Coord(3, 12), Coord(4, 12))), Lane(9)), LaneIntersection(Coord(5, 13), LED((Coord(5, 13), Coord(5, 12))), Lane(30))],
-		 [LaneIntersection(Coord(5, 10), LED((Coord(5, 10), Coord(5, 11))), Lane(31)), LaneIntersection(Coord(3, 11), LED((Coord(3, 11), Coord(4, 11))), Lane(10)), LaneIntersection(Coord(4, 13), LED((Coord(4, 13), Coord(4, 12))), Lane(20))]),
-
-		#intersection 10
-		([LaneIntersection(Coord(5, 4), LED((Coord(5, 4), Coord(5, 5))), Lane(11)), LaneIntersection(Coord(6, 6), LED((Coord(6, 6), Coord(6, 5))), Lane(31))],
-		 [LaneIntersection(Coord(5, 6), LED((Coord(5, 6), Coord(5, 5))), Lane(21)), LaneIntersection(Coord(7, 5), LED((Coord(7, 5), Coord(6, 5))), Lane(22))]),
-	]
+	# Coords of every intersection, and the entry and exit lane intersections of every intersection, set by Intersection.load
+	intersectionCoords = []
+	laneIntersections = []
 
+	@staticmethod
+	def load(intersectionCoords: List[Set[Coord]], laneIntersections: List[Tuple[List["LaneIntersection"], List["LaneIntersection"]]]):
+		Intersection.intersectionCoords = intersectionCoords
+		Intersection.laneIntersections = laneIntersections
+
+		# Intersection ID of every coord, -1 outside intersections, and index of the entry and exit lane intersection at every coord
+		# in entryLaneIntersections and exitLaneIntersections, -1 if there is none. The first match wins, like a scan would
+		intersectionIDGrid = np.full(np.max([coord for coords in intersectionCoords for coord in coords], axis=0) + 1, -1, dtype=np.int64)
+		for interID in reversed(range(len(intersectionCoords))):
+			for coord in intersectionCoords[interID]:
+				intersectionIDGrid[coord.x, coord.y] = interID
+		Intersection.intersectionIDGrid = intersectionIDGrid
+		Intersection.intersectionIDLists = intersectionIDGrid.tolist()
+
+		entryLaneIntersections = [laneIntersection for entryLaneIntersections, exitLaneIntersections in laneIntersections for laneIntersection in entryLaneIntersections]
+		exitLaneIntersections = [laneIntersection for entryLaneIntersections, exitLaneIntersections in laneIntersections for laneIntersection in exitLaneIntersections]
+		laneIntersectionGridShape = np.max([laneIntersection.coord for laneIntersection in entryLaneIntersections + exitLaneIntersections], axis=0) + 1
+		entryLaneIntersectionGrid = np.full(laneIntersectionGridShape, -1, dtype=np.int64)
+		exitLaneIntersectionGrid = np.full(laneIntersectionGridShape, -1, dtype=np.int64)
+		for i in reversed(range(len(entryLaneIntersections))):
+			entryLaneIntersectionGrid[entryLaneIntersections[i].coord] = i
+		for i in reversed(range(len(exitLaneIntersections))):
+			exitLaneIntersectionGrid[exitLaneIntersections[i].coord] = i
+		Intersection.entryLaneIntersections = entryLaneIntersections
+		Intersection.exitLaneIntersections = exitLaneIntersections
+		Intersection.entryLaneIntersectionGrid = entryLaneIntersectionGrid
+		Intersection.exitLaneIntersectionGrid = exitLaneIntersectionGrid
+		Intersection.entryLaneIntersectionLists = entryLaneIntersectionGrid.tolist()
+		Intersection.exitLaneIntersectionLists = exitLaneIntersectionGrid.tolist()
 
 	def __init__(self, interID: int):
 		self.interID = interID
@@ -595,7 +560,6 @@ class Intersection():
 		self.lane_intersections = self.entry_lane_intersections + self.exit_lane_intersections
 		self.local_controller = self.getLocalController()
 		self.coords = self.getCoords(interID)
-		self.queue = queue.Queue()
 
 	@staticmethod
 	def getCoords(interID: int) -> Set["Coord"]:
@@ -603,27 +567,26 @@ class Intersection():
 
 	@staticmethod
 	def getIntersectionId(coord: Coord) -> int:
-		for i, coords in enumerate(Intersection.intersectionCoords):
-			if coord in coords:
-				return i
+		if 0 <= coord.x < len(Intersection.intersectionIDLists) and 0 <= coord.y < len(Intersection.intersectionIDLists[0]):
+			return Intersection.intersectionIDLists[coord.x][coord.y]
 
 		return -1
 
+	@staticmethod
+	def getLEDs() -> List["LED"]:
+		return [laneIntersection.LED for entryLaneIntersections, exitLaneIntersections in Intersection.laneIntersections for laneIntersection in entryLaneIntersections + exitLaneIntersections]
+
 	@staticmethod
 	def getLaneIntersections(interID: int) -> Tuple[List["LaneIntersection"], List["LaneIntersection"]]:
 		return Intersection.laneIntersections[interID]
 
 	@staticmethod
 	def getLaneIntersection(coord: Coord, isEntry: bool) -> LaneIntersection:
-		for entryLaneIntersections, exitLaneIntersections in Intersection.laneIntersections:
-			if isEntry:
-				for laneIntersection in entryLaneIntersections:
-					if laneIntersection.coord == coord:
-						return laneIntersection
-			else:
-				for laneIntersection in exitLaneIntersections:
-					if laneIntersection.coord == coord:
-						return laneIntersection
+		indices = Intersection.entryLaneIntersectionLists if isEntry else Intersection.exitLaneIntersectionLists
+		if 0 <= coord.x < len(indices) and 0 <= coord.y < len(indices[0]):
+			i = indices[coord.x][coord.y]
+			if i != -1:
+				return (Intersection.entryLaneIntersections if isEntry else Intersection.exitLaneIntersections)[i]
 
 		return None
 
@@ -643,3 +606,237 @@ class Intersection():
 				return True
 
 		return False
+
+
+class Topology():
+	# Static layout of lanes, lane transitions and intersections compiled once into integer cells (x * height + y).
+	# Holds the lane and intersection of every cell, the directed moves allowed out of every cell, the LED on every
+	# edge between a lane and an intersection, and the cells of every intersection and of its entry and exit lanes.
+	# It is compiled again in place whenever another layout is used, so references to it stay valid.
+	def compile(self, shape: Tuple[int, int]):
+		self.width, self.height = shape
+		self.numCells = self.width * self.height
+
+		self.laneIDs = np.full(self.numCells, -1, dtype=np.int64)
+		self.lanePositions = np.full(self.numCells, -1, dtype=np.int64)
+		for laneID in reversed(range(len(Lane.lanePaths))):
+			for position, coord in enumerate(Lane.lanePaths[laneID]):
+				self.laneIDs[self.encode(coord)] = laneID
+				self.lanePositions[self.encode(coord)] = position
+
+		self.intersectionIDs = np.full(self.numCells, -1, dtype=np.int64)
+		for interID in reversed(range(len(Intersection.intersectionCoords))):
+			for coord in Intersection.intersectionCoords[interID]:
+				self.intersectionIDs[self.encode(coord)] = interID
+		self.isIntersection = self.intersectionIDs != -1
+
+		# LEDs are numbered in the order of Intersection.getLEDs, both directions of their edge map to them
+		self.LEDBounds = [LED.coordBounds for LED in Intersection.getLEDs()]
+		self.LEDIDs = {coordBounds: i for i, coordBounds in enumerate(self.LEDBounds)}
+		self.LEDIntersectionIDs = [Intersection.getIntersectionId(intersectionCoord) for laneCoord, intersectionCoord in self.LEDBounds]
+		self.edgeLEDIDs = dict()
+		for i, (laneCoord, intersectionCoord) in enumerate(self.LEDBounds):
+			self.edgeLEDIDs[self.encodeEdge(laneCoord, intersectionCoord)] = i
+			self.edgeLEDIDs[self.encodeEdge(intersectionCoord, laneCoord)] = i
+
+		# Cells of every intersection, and of its entry and exit lane intersections in the order of Intersection.getLaneIntersections
+		self.intersectionCells = [sorted(self.encode(coord) for coord in coords) for coords in Intersection.intersectionCoords]
+		self.entryLaneCells = [[self.encode(laneIntersection.coord) for laneIntersection in entryLaneIntersections] for entryLaneIntersections, exitLaneIntersections in Intersection.laneIntersections]
+		self.exitLaneCells = [[self.encode(laneIntersection.coord) for laneIntersection in exitLaneIntersections] for entryLaneIntersections, exitLaneIntersections in Intersection.laneIntersections]
+
+		# Intersections whose LEDs depend on every cell, i.e. the intersection the cell is in or whose entry or exit lane intersection it is
+		self.cellIntersectionIDs = [[] for cell in range(self.numCells)]
+		for interID in range(len(Intersection.intersectionCoords)):
+			for cell in set(self.intersectionCells[interID] + self.entryLaneCells[interID] + self.exitLaneCells[interID]):
+				self.cellIntersectionIDs[cell].append(interID)
+
+		# Moves allowed out of every cell, in the order (x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)
+		self.successors = [None] * self.numCells
+		for cell in np.flatnonzero((self.laneIDs != -1) | self.isIntersection):
+			self.successors[cell] = self.findSuccessors(self.decode(cell))
+		self.successorOffsets = np.cumsum([0] + [0 if successors is None else len(successors) for successors in self.successors])
+		self.successorCells = np.array([self.encode(coord) for successors in self.successors if successors is not None for coord in successors], dtype=np.int64)
+		self.successorCellLists = [None if successors is None else [self.encode(coord) for coord in successors] for successors in self.successors]
+		self.coordLists = [self.decode(cell) for cell in range(self.numCells)]
+
+		# Nested lists are faster than NumPy arrays for single lookups
+		self.laneIDLists = self.laneIDs.tolist()
+		self.intersectionIDLists = self.intersectionIDs.tolist()
+		self.isIntersectionLists = self.isIntersection.tolist()
+
+	def encode(self, coord: Coord) -> int:
+		return coord.x * self.height + coord.y
+
+	def decode(self, cell: int) -> Coord:
+		return Coord(*divmod(int(cell), self.height))
+
+	def encodeEdge(self, srcCoord: Coord, dstCoord: Coord) -> int:
+		return self.encode(srcCoord) * self.numCells + self.encode(dstCoord)
+
+	def contains(self, coord: Coord) -> bool:
+		return 0 <= coord.x < self.width and 0 <= coord.y < self.height
+
+	def findSuccessors(self, coord: Coord) -> List[Coord]:
+		laneID = Lane.getLaneID(coord)
+		successors = []
+		for nextCoord in [Coord(coord.x + 1, coord.y), Coord(coord.x, coord.y + 1), Coord(coord.x - 1, coord.y), Coord(coord.x, coord.y - 1)]:
+			if not self.contains(nextCoord):
+				continue
+
+			# Along a lane, only the next coord of the lane
+			if laneID != -1 and coord != Lane.getPath(laneID)[-1]:
+				isValid = nextCoord == Lane.getPath(laneID)[Lane.getPath(laneID).index(coord) + 1]
+			# From the end of a lane, into the intersection through the LED of its entry lane intersection
+			elif laneID != -1:
+				entryLaneIntersection = Intersection.getLaneIntersection(coord, isEntry=True)
+				isValid = Intersection.getIntersectionId(nextCoord) != -1 and entryLaneIntersection is not None and (coord, nextCoord) == entryLaneIntersection.LED.coordBounds
+			# Inside an intersection, within the intersection or out onto a lane through the LED of an exit lane intersection
+			else:
+				exitLaneIntersection = Intersection.getLaneIntersection(nextCoord, isEntry=False)
+				isExit = Lane.getLaneID(nextCoord) != -1 and exitLaneIntersection is not None and (nextCoord, coord) == exitLaneIntersection.LED.coordBounds
+				isValid = nextCoord in Intersection.getCoords(Intersection.getIntersectionId(coord)) or isExit
+
+			if isValid:
+				successors.append(nextCoord)
+		return successors
+
+	def getSuccessors(self, coord: Coord) -> List[Coord]:
+		successors = self.successors[self.encode(coord)] if self.contains(coord) else None
+		if successors is None:
+			raise ValueError("Error, curr coord {} is neither on a lane or in an intersection!".format(coord))
+		return successors
+
+	def getLEDID(self, srcCoord: Coord, dstCoord: Coord) -> int:
+		# LED on the edge between two coords, in either direction, -1 if there is none
+		return self.edgeLEDIDs.get(self.encodeEdge(srcCoord, dstCoord), -1)
+
+
+# The topology of the layout, compiled when a layout is used
+topology = Topology()
+
+
+class RouteTable():
+	# Routes of pairs of locations materialized once into a single flat array of cells, with the offset and length of every
+	# route in it. Routes are also kept as immutable tuples of coords, which people reference instead of building their own.
+	# Like the topology, the table is built again in place whenever another layout is used.
+	def build(self, findRoute: Callable[[int, int], Optional[List[Coord]]], pairs: List[Tuple[int, int]]):
+		self.pairs = []
+		self.routes = []
+		for srcLocID, dstLocID in pairs:
+			route = findRoute(srcLocID, dstLocID)
+			if route is not None:
+				self.pairs.append((srcLocID, dstLocID))
+				self.routes.append(tuple(route))
+		self.routeIDs = {pair: i for i, pair in enumerate(self.pairs)}
+
+		self.lengths = np.array([len(route) for route in self.routes], dtype=np.int64)
+		self.offsets = np.cumsum(self.lengths) - self.lengths
+		self.cells = np.array([topology.encode(coord) for route in self.routes for coord in route], dtype=np.int64)
+
+	def __contains__(self, pair: Tuple[int, int]) -> bool:
+		return pair in self.routeIDs
+
+	def getRouteID(self, srcLocID: int, dstLocID: int) -> int:
+		return self.routeIDs[(srcLocID, dstLocID)]
+
+	def getRoute(self, srcLocID: int, dstLocID: int) -> Tuple[Coord]:
+		return self.routes[self.routeIDs[(srcLocID, dstLocID)]]
+
+	def getCells(self, routeID: int) -> np.ndarray:
+		return self.cells[self.offsets[routeID]:self.offsets[routeID] + self.lengths[routeID]]
+
+
+# Routes of every pair of locations, and the paths smart people take from srcLocs on a lane, built when a layout is used
+routes = RouteTable()
+smartRoutes = RouteTable()
+
+
+class RerouteCache():
+	# Bounded cache of the paths found by SmartPerson.findPath, evicting the least recently used. Paths only depend on the
+	# coord, the dstLoc and the blocked paths out of the coord's intersection (see findPath), so those LEDs are the key
+	def __init__(self, maxSize: int=4096):
+		self.maxSize = maxSize
+		self.paths = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def clear(self):
+		self.paths.clear()
+		self.hits = 0
+		self.misses = 0
+
+	def getKey(self, coord: Coord, dstLoc: Location, blockedPaths: List[Tuple[Coord]]) -> Tuple[Coord, int, int]:
+		intersectionID = Intersection.getIntersectionId(coord)
+		blockedLEDs = 0
+		if intersectionID != -1:
+			for coordBounds in blockedPaths:
+				LEDID = topology.LEDIDs[coordBounds]
+				if topology.LEDIntersectionIDs[LEDID] == intersectionID:
+					blockedLEDs |= 1 << LEDID
+		return coord, dstLoc.locID, blockedLEDs
+
+	def findPath(self, coord: Coord, dstLoc: Location, floormap: np.ndarray, blockedPaths: List[Tuple[Coord]]) -> Optional[Tuple[Coord]]:
+		key = self.getKey(coord, dstLoc, blockedPaths)
+		if key in self.paths:
+			self.hits += 1
+			self.paths.move_to_end(key)
+			return self.paths[key]
+
+		self.misses += 1
+		path = SmartPerson.findPath(coord, dstLoc, floormap, blockedPaths)
+		# Paths are shared by everyone who reroutes the same way, so they are stored as immutable tuples
+		path = None if path is None else tuple(path)
+		self.paths[key] = path
+		if len(self.paths) > self.maxSize:
+			self.paths.popitem(last=False)
+		return path
+
+	def getStats(self) -> dict:
+		lookups = self.hits + self.misses
+		return {"hits": self.hits, "misses": self.misses, "hitRate": self.hits / lookups if lookups else 0.0, "size": len(self.paths), "maxSize": self.maxSize}
+
+
+# Paths found when people reroute, shared across people and ticks
+rerouteCache = RerouteCache()
+
+
+# The layout in use, see useLayout
+activeLayout = None
+
+def getLayout() -> Layout:
+	return activeLayout
+
+def useLayout(layout: Layout):
+	# Build the locations, lanes, intersections, topology and routes of a layout. Processes forked afterwards inherit them,
+	# others call useLayout with the layout they were given
+	global activeLayout
+	if layout is activeLayout:
+		return
+
+	Location.locCoords = layout.locations
+	Lane.load(layout.lanes)
+	LaneTransition.laneTransitionPaths = layout.laneTransitions
+	Intersection.load([set(coords) for coords, entry, exit in layout.intersections],
+					  [([LaneIntersection(coordBounds[0], LED(coordBounds), Lane(laneID)) for coordBounds, laneID in entry],
+						[LaneIntersection(coordBounds[0], LED(coordBounds), Lane(laneID)) for coordBounds, laneID in exit]) for coords, entry, exit in layout.intersections])
+	Person.personPaths = layout.routes
+	SmartPerson.blockedUntilExited = layout.blockedUntilExited
+
+	topology.compile(layout.floormap.shape)
+
+	# Routes that are not given by the layout are shortest paths, which smart people from a srcLoc on a lane take too.
+	# They are searched from every srcLoc at once
+	Person.shortestPaths = dict()
+	for srcLocID in sorted(set(srcLocID for (srcLocID, dstLocID), route in layout.routes.items() if route is None)):
+		dstLocIDs = sorted(dstLocID for (pairSrcLocID, dstLocID), route in layout.routes.items() if pairSrcLocID == srcLocID and route is None)
+		for dstLocID, path in zip(dstLocIDs, SmartPerson.findPaths(Location(srcLocID).srcCoord, [Location(dstLocID) for dstLocID in dstLocIDs])):
+			Person.shortestPaths[(srcLocID, dstLocID)] = path
+
+	routes.build(Person.buildPath, sorted(Person.personPaths))
+	smartRoutes.build(lambda srcLocID, dstLocID: Person.shortestPaths[(srcLocID, dstLocID)] if Person.personPaths[(srcLocID, dstLocID)] is None else SmartPerson.findPath(Location(srcLocID).srcCoord, Location(dstLocID), None, []),
+					  [(srcLocID, dstLocID) for srcLocID, dstLocID in sorted(Person.personPaths) if not topology.isIntersectionLists[topology.encode(Location(srcLocID).srcCoord)]])
+	rerouteCache.clear()
+	activeLayout = layout
+
+
+useLayout(Layout.load(defaultLayoutPath))